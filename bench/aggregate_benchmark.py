@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Compares a control tick that updates several subsystems as separate frames,
+# one exchange each, against a single aggregate frame answered by a single
+# aggregate reply: bytes on the wire both ways, the time they take at a fixed
+# baud rate, the writes (and flushes) made, and the CPU time to encode the
+# requests into the transmit buffer, write them to /dev/null and decode the
+# replies.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.aggregate_benchmark [--subsystems N] [--baudrate BAUD] [--count N]
+#
+
+import os
+import time
+import argparse
+
+from uart import schema
+from uart.payload import Payload, Aggregate
+
+BITS_PER_BYTE = 10 # 8N1: a start bit, eight data bits and a stop bit
+
+def tick(subsystems):
+    '''
+    Returns the requests of one control tick: motor setpoints, then a mix of
+    other commands in the generic float32 and fixed point layouts.
+    '''
+    requests = [ Payload("MO", 25.0, 25.0, 25.0, 25.0) ]
+    for i in range(1, subsystems):
+        if i % 2:
+            requests.append(Payload("S{}".format(i % 10), 0.5, -0.5, 90.0, 0.0, layout=schema.GENERIC_FIXED))
+        else:
+            requests.append(Payload("L{}".format(i % 10), 1.0, 0.0, 0.0, 255.0))
+    return requests
+
+def measure(requests, replies, count):
+    '''
+    Times encoding and writing the requests, then decoding the replies, once
+    per frame: returns microseconds per tick.
+    '''
+    tx_buffer = bytearray(Aggregate.MAX_PACKET_SIZE)
+    tx_view = memoryview(tx_buffer)
+    fd = os.open(os.devnull, os.O_WRONLY)
+    try:
+        start = time.perf_counter()
+        for _ in range(count):
+            for request in requests:
+                os.write(fd, tx_view[:request.pack_into(tx_buffer, 0)])
+            for reply in replies:
+                Payload.unpack_from(reply, 0)
+        return (time.perf_counter() - start) / count * 1e6
+    finally:
+        os.close(fd)
+
+def main():
+    parser = argparse.ArgumentParser(description='aggregate frames against one frame per subsystem')
+    parser.add_argument('--subsystems', type=int, default=4, help='payloads sent per control tick')
+    parser.add_argument('--baudrate', type=int, default=1_000_000)
+    parser.add_argument('--count', type=int, default=20000)
+    args = parser.parse_args()
+    requests = tick(args.subsystems)
+    separate = (requests, [ Payload("AK", seq=i).to_bytes() for i in range(len(requests)) ])
+    aggregate = Aggregate(requests, seq=1)
+    combined = ([ aggregate ], [ Aggregate([ Payload("AK") ] * len(requests), seq=1).to_bytes() ])
+    print('{} payloads per tick at {} baud:'.format(len(requests), args.baudrate))
+    for label, (tx, rx) in (('separate', separate), ('aggregate', combined)):
+        tx_bytes = sum(request.packet_size for request in tx)
+        rx_bytes = sum(len(reply) for reply in rx)
+        wire_ms = (tx_bytes + rx_bytes) * BITS_PER_BYTE / args.baudrate * 1000
+        micros = measure(tx, rx, args.count)
+        print('  {:<10} {:3d} bytes out {:3d} back  {:5.3f}ms on the wire  {:2d} writes and flushes  {:5.1f}µs CPU'.format(
+                label, tx_bytes, rx_bytes, wire_ms, len(tx), micros))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Compares decoding a capture of frames one Payload at a time against the
+# batch Payload.unpack_many(), with and without NumPy, and encoding with
+# Payload.pack_many(). The per-object path is timed over a sample of the
+# capture and extrapolated.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.batch_decode_benchmark [--frames N] [--sample N]
+#
+
+import time
+import argparse
+
+from uart.payload import Payload
+
+PACKET_SIZE = Payload("GO", 0.0, 0.0, 0.0, 0.0).packet_size
+
+def main():
+    parser = argparse.ArgumentParser(description='batch Payload decode benchmark')
+    parser.add_argument('--frames', type=int, default=1_000_000)
+    parser.add_argument('--sample', type=int, default=100_000, help='frames decoded by the per-object path')
+    args = parser.parse_args()
+    rows = [("GO", float(i % 200) - 100.0, float(i % 50), -10.0, -20.0, i % 256) for i in range(args.frames)]
+
+    start = time.perf_counter()
+    capture = Payload.pack_many(rows)
+    print('pack_many (numpy):      {:8.3f} s for {} frames'.format(time.perf_counter() - start, args.frames))
+    start = time.perf_counter()
+    Payload.pack_many(rows[:args.sample], use_numpy=False)
+    elapsed = (time.perf_counter() - start) * args.frames / args.sample
+    print('pack_many (struct):     {:8.3f} s (extrapolated)'.format(elapsed))
+
+    start = time.perf_counter()
+    for offset in range(0, args.sample * PACKET_SIZE, PACKET_SIZE):
+        Payload.from_bytes(capture[offset:offset + PACKET_SIZE])
+    elapsed = (time.perf_counter() - start) * args.frames / args.sample
+    print('per-object from_bytes:  {:8.3f} s (extrapolated)'.format(elapsed))
+
+    for label, use_numpy in (('unpack_many (numpy): ', True), ('unpack_many (struct):', False)):
+        start = time.perf_counter()
+        columns = Payload.unpack_many(capture, use_numpy=use_numpy)
+        elapsed = time.perf_counter() - start
+        if len(columns['seq']) != args.frames:
+            raise RuntimeError('decoded {} of {} frames'.format(len(columns['seq']), args.frames))
+        print('{}   {:8.3f} s'.format(label, elapsed))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Measures the bytes per frame saved by delta frames on a control trace, for
+# float32 and int16 fixed point setpoints, and checks that the receiver
+# reconstructs every frame it accepts exactly, including when frames are
+# lost on the way, and when the trace is interleaved for several addresses
+# (unaddressed, and two slaves on a bus, each a little apart) and decoded by
+# one receiver, so that each delta has to be taken against its own address's
+# keyframe.
+#
+# The trace is read from a CSV file of cmd,pfwd,sfwd,paft,saft rows if one is
+# given, otherwise a 50Hz drive is generated: pull away, cruise, a turn, a
+# stop and idle, with setpoints at 0.01 resolution, as a joystick would send
+# them; followed by the counter used by UARTMaster.run().
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.delta_benchmark [--trace FILE] [--keyframe-interval N] [--loss P]
+#
+
+import csv
+import random
+import argparse
+
+from uart import schema
+from uart.delta import DeltaState
+from uart.payload import Payload
+
+def drive_trace():
+    rows = []
+    def hold(setpoints, frames):
+        rows.extend([('MO', *setpoints)] * frames)
+    def ramp(start, end, frames):
+        for i in range(1, frames + 1):
+            rows.append(('MO', *(round(a + (b - a) * i / frames, 2) for a, b in zip(start, end))))
+    idle, cruise, turn = (0.0, 0.0, 0.0, 0.0), (60.0, 60.0, 60.0, 60.0), (35.0, 80.0, 35.0, 80.0)
+    hold(idle, 100)
+    ramp(idle, cruise, 100)
+    hold(cruise, 500)
+    ramp(cruise, turn, 25)
+    hold(turn, 150)
+    ramp(turn, cruise, 25)
+    hold(cruise, 400)
+    ramp(cruise, idle, 75)
+    hold(idle, 250)
+    # the counter sent by UARTMaster.run()
+    rows.extend(('GO', float(i), float(i), -10.0, -20.0) for i in range(1, 301))
+    return rows
+
+def load_trace(path):
+    with open(path, newline='') as f:
+        return [ (row[0], *map(float, row[1:5])) for row in csv.reader(f) if row and not row[0].startswith('#') ]
+
+def interleave(rows, addrs):
+    '''
+    Returns (address, row) for each row for each of the addresses in turn,
+    the setpoints for each further address a little apart.
+    '''
+    return [ (addr, (row[0], *(value + i for value in row[1:]))) for row in rows for i, addr in enumerate(addrs) ]
+
+def measure(rows, layout, keyframe_interval, loss, seed=1, addrs=(None,)):
+    '''
+    Returns (full bytes, delta bytes, frames accepted, frames rejected).
+    '''
+    rnd = random.Random(seed)
+    tx_delta, rx_delta = DeltaState(keyframe_interval), DeltaState(keyframe_interval)
+    buf = bytearray(Payload.MAX_PACKET_SIZE)
+    full_bytes = delta_bytes = accepted = rejected = 0
+    for seq, (addr, row) in enumerate(interleave(rows, addrs)):
+        payload = Payload(*row, seq=seq % Payload.SEQ_MODULUS, layout=layout, addr=addr)
+        full = payload.to_bytes()
+        full_bytes += len(full)
+        count = payload.pack_into(buf, 0, tx_delta)
+        delta_bytes += count
+        if rnd.random() < loss:
+            continue
+        try:
+            received = Payload.from_bytes(bytes(buf[:count]), rx_delta)
+        except ValueError:
+            rejected += 1 # a delta whose keyframe was lost
+            continue
+        expected = Payload.from_bytes(full)
+        if (received.cmd, received.values, received.addr) != (expected.cmd, expected.values, expected.addr):
+            raise RuntimeError('frame {} decoded as {}, expected {}'.format(seq, received, expected))
+        accepted += 1
+    return full_bytes, delta_bytes, accepted, rejected
+
+def main():
+    parser = argparse.ArgumentParser(description='delta frame byte savings')
+    parser.add_argument('--trace', help='CSV of cmd,pfwd,sfwd,paft,saft rows')
+    parser.add_argument('--keyframe-interval', type=int, default=50)
+    parser.add_argument('--loss', type=float, default=0.05, help='fraction of frames lost in the loss run')
+    args = parser.parse_args()
+    rows = load_trace(args.trace) if args.trace else drive_trace()
+    print('{} frames, keyframe at least every {}:'.format(len(rows), args.keyframe_interval))
+    for label, layout in (('float32', schema.GENERIC), ('int16 fixed', schema.GENERIC_FIXED)):
+        full, delta, _, _ = measure(rows, layout, args.keyframe_interval, 0.0)
+        print('  {:<12} full {:5.2f} bytes/frame   delta {:5.2f} bytes/frame   saving {:4.1f}%'.format(
+                label, full / len(rows), delta / len(rows), 100.0 * (full - delta) / full))
+        _, _, accepted, rejected = measure(rows, layout, args.keyframe_interval, args.loss)
+        print('  {:<12} with {:.0%} loss: {} frames decoded exactly, {} deltas rejected for a lost keyframe'.format(
+                '', args.loss, accepted, rejected))
+        addrs = (None, 1, 2)
+        full, delta, accepted, rejected = measure(rows, layout, args.keyframe_interval, 0.0, addrs=addrs)
+        if rejected:
+            raise RuntimeError('{} deltas rejected with no frames lost, among addresses {}.'.format(rejected, addrs))
+        print('  {:<12} addresses {}: {} frames decoded exactly, full {:5.2f} bytes/frame   delta {:5.2f} bytes/frame'.format(
+                '', ', '.join(str(addr) for addr in addrs), accepted, full / accepted, delta / accepted))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Measures the slave's command dispatch (upy/uart_slave_base.py), running its
+# own code on CPython against the pyb shim (sim/pyb_shim.py):
+#
+#     dispatch   the time to dispatch a request to its handler, by the
+#                slave's table of handlers and by an if/elif chain (a search
+#                of the commands in order) for the last of them, as the
+#                number of commands grows
+#     deferred   the reply latency of a quick command sent just behind a
+#                slow one, with the slow command's handler awaited in turn
+#                and registered as deferred, and the handler stats of each
+#
+# CPython's figures are far from the board's: they compare the two ways
+# rather than predict the board's.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.dispatch_benchmark [--count N] [--slow-ms MS]
+#
+
+import time
+import string
+import asyncio
+import argparse
+
+from uart.payload import Payload as MasterPayload
+from sim import pyb_shim
+from core.logger import Level
+
+pyb_shim.install()
+
+UartSlaveBase = pyb_shim.import_upy('uart_slave_base').UartSlaveBase
+Payload = pyb_shim.import_upy('payload').Payload
+
+class ChainSlave(UartSlaveBase):
+    '''
+    Dispatches by testing each command in the order registered, as an
+    if/elif chain on the command would.
+    '''
+    def __init__(self, *args, **kwargs):
+        self._chain = [] # before the slave registers its own commands
+        UartSlaveBase.__init__(self, *args, **kwargs)
+
+    def register(self, cmd, handler, deferred=False):
+        UartSlaveBase.register(self, cmd, handler, deferred)
+        cmd = cmd.encode('ascii')
+        self._chain.append((cmd, self._handlers[cmd]))
+
+    async def _dispatch(self, payload):
+        # timed as the table's are, so that only the lookup differs
+        for cmd, entry in self._chain:
+            if payload.cmd == cmd:
+                start = time.ticks_us()
+                reply = await entry.handler(payload)
+                elapsed = time.ticks_diff(time.ticks_us(), start)
+                entry.count += 1
+                entry.total_us += elapsed
+                if elapsed > entry.max_us:
+                    entry.max_us = elapsed
+                return self._ack if reply is None else reply
+        self._unhandled += 1
+        return self._ack
+
+def commands(count):
+    '''
+    Returns count two-character command codes.
+    '''
+    letters = string.ascii_uppercase
+    return [ letters[i // 26] + letters[i % 26] for i in range(count) ]
+
+async def acknowledge(payload):
+    return None
+
+def drive(coro):
+    '''
+    Runs a coroutine that never suspends, returning its result.
+    '''
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError('coroutine suspended.')
+
+def dispatch_time(slave, payload, count):
+    '''
+    Returns the mean ns to dispatch the Payload.
+    '''
+    for _ in range(1000):
+        drive(slave._dispatch(payload))
+    start = time.perf_counter_ns()
+    for _ in range(count):
+        drive(slave._dispatch(payload))
+    return (time.perf_counter_ns() - start) / count
+
+async def deferred_latency(deferred, slow_ms, count):
+    '''
+    Feeds a slow request followed at once by a quick one, count times, and
+    returns the quick replies' mean latency in µs and the slave's handler stats.
+    '''
+    slave = UartSlaveBase('slave', rx_irq=True)
+    slave._log.level = Level.WARN
+    uart = slave._uart
+    uart.capture = True
+    async def slow(payload):
+        await asyncio.sleep(slow_ms / 1000)
+    slave.register('SL', slow, deferred=deferred)
+    slave.register('GO', acknowledge)
+    server = asyncio.create_task(slave.run())
+    await asyncio.sleep(0.01)
+    total_ns = 0
+    for i in range(count):
+        seq = (2 * i) % 256
+        fed_ns = time.perf_counter_ns()
+        uart.feed(Payload("SL", 0.0, 0.0, 0.0, 0.0, seq=seq).to_bytes())
+        uart.feed(Payload("GO", 0.0, 0.0, 0.0, 0.0, seq=seq + 1).to_bytes())
+        while True:
+            written = uart.take_written()
+            if written and any(reply.seq == seq + 1 for reply in replies(written)):
+                total_ns += time.perf_counter_ns() - fed_ns
+                break
+            await asyncio.sleep(0.0001)
+        # let the slow reply go before the next pair
+        await asyncio.sleep(2 * slow_ms / 1000)
+        uart.take_written()
+    server.cancel()
+    return total_ns / count / 1000, slave.handler_stats()
+
+def replies(written):
+    '''
+    Returns the replies decoded from the bytes written.
+    '''
+    result = []
+    while written:
+        reply = MasterPayload.from_bytes(written[:MasterPayload.frame_length(written)])
+        written = written[reply.packet_size:]
+        result.append(reply)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='slave command dispatch')
+    parser.add_argument('--count', type=int, default=100_000, help='dispatches per measurement')
+    parser.add_argument('--slow-ms', type=float, default=20.0, help='the slow handler\'s duration')
+    args = parser.parse_args()
+    print('dispatch of the last of N commands, mean ns:')
+    print('  {:>4} {:>10} {:>10}'.format('N', 'table', 'if/elif'))
+    for n in (1, 10, 50, 200):
+        times = []
+        for cls in (UartSlaveBase, ChainSlave):
+            slave = cls('slave')
+            slave._log.level = Level.WARN
+            codes = commands(n)
+            for cmd in codes:
+                slave.register(cmd, acknowledge)
+            times.append(dispatch_time(slave, Payload(codes[-1], 0.0, 0.0, 0.0, 0.0), args.count))
+        print('  {:>4} {:10.0f} {:10.0f}'.format(n, *times))
+    print('quick reply behind a {:g}ms handler, mean latency:'.format(args.slow_ms))
+    for label, deferred in (('awaited', False), ('deferred', True)):
+        latency_us, stats = asyncio.run(deferred_latency(deferred, args.slow_ms, 50))
+        slow = stats['handlers']['SL']
+        print('  {:<9} {:9.0f}µs   SL: {} calls, avg {}µs, max {}µs'.format(label, latency_us,
+                slow['count'], slow['avg_us'], slow['max_us']))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
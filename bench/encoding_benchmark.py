@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Verifies the generic encodings (float32, float16 and int16 fixed point) by
+# round-tripping a sweep of setpoints across ±100 through both the master's
+# Payload (uart/) and the slave's (upy/, imported here under CPython),
+# checking that they encode every value identically and that the error of
+# each decoded value is within its bound: a relative 2**-11 for float16, half
+# a step (0.5 / scale) for fixed point. Then that a value out of range of a
+# fixed point format raises a ValueError naming its field, whichever way it's
+# encoded. Any failure raises, for a non-zero exit. Then reports the frame
+# size of each and the transaction rate it allows at a fixed baud rate.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.encoding_benchmark [--step S] [--baudrate BAUD]
+#
+
+import os
+import sys
+import argparse
+
+from uart import schema
+from uart.payload import Payload, Aggregate
+
+BITS_PER_BYTE = 10 # 8N1: a start bit, eight data bits and a stop bit
+
+def error_bound(layout, value):
+    '''
+    Returns the largest round-trip error allowed for a value.
+    '''
+    if layout is schema.GENERIC:
+        return abs(value) * 2**-24                   # float32: half a unit in the last of 24 bits
+    if layout is schema.GENERIC_HALF:
+        return max(abs(value) * 2**-11, 2**-25)      # float16: 11 bits, subnormal below 2**-14
+    return 0.5 / layout.scales[0] + abs(value) * 1e-15 # fixed point: half a step, plus float rounding
+
+def load_slave_payload():
+    '''
+    Imports upy/payload.py with its own schema and crc8_table, as on the slave.
+    '''
+    upy = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'upy')
+    sys.path.insert(0, upy)
+    try:
+        import payload
+    finally:
+        sys.path.remove(upy)
+    return payload
+
+def verify(step):
+    slave = load_slave_payload()
+    count = int(round(200 / step))
+    values = [ -100.0 + i * step for i in range(count + 1) ] + [ 0.0, 0.004, -0.005, 0.015, 99.995 ]
+    for layout in (schema.GENERIC, schema.GENERIC_HALF, schema.GENERIC_FIXED):
+        slave_layout = slave.schema.for_type(layout.type_id)
+        worst = 0.0
+        for value in values:
+            packet = Payload("MO", value, -value, value / 2, -value / 2, layout=layout).to_bytes()
+            slave_packet = slave.Payload("MO", value, -value, value / 2, -value / 2, layout=slave_layout).to_bytes()
+            if packet != slave_packet:
+                raise ValueError('master and slave encode {} differently as type {}.'.format(value, layout.type_id))
+            for decoded in (Payload.from_bytes(packet), slave.Payload.from_bytes(packet)):
+                for sent, received in zip((value, -value, value / 2, -value / 2), decoded.values):
+                    error = abs(received - sent)
+                    if error > error_bound(layout, sent):
+                        raise ValueError('{} sent as type {} was received as {}, an error of {:g}.'.format(
+                                sent, layout.type_id, received, error))
+                    worst = max(worst, error)
+        print('  type {}  {:<6} max error {:.6f} over {} values in ±100'.format(
+                layout.type_id, layout.format[5:], worst, len(values) * 4))
+    verify_range(slave)
+    print('verified: errors within bounds, master and slave encode identically, out of range values refused.')
+
+def verify_range(slave):
+    '''
+    Checks that a value out of range of the fixed point format raises a
+    ValueError naming its field, on every path that encodes it.
+    '''
+    layout = schema.GENERIC_FIXED
+    slave_layout = slave.schema.for_type(layout.type_id)
+    too_large = (layout.limits[1][1] + 1) / layout.scales[1]
+    ways = {
+        'Payload.to_bytes()':        lambda: Payload("MO", 0.0, too_large, 0.0, 0.0, layout=layout).to_bytes(),
+        'Aggregate.to_bytes()':      lambda: Aggregate([ Payload("MO", 0.0, too_large, 0.0, 0.0, layout=layout) ]).to_bytes(),
+        'pack_many(), NumPy':        lambda: Payload.pack_many([ ("MO", 0.0, too_large, 0.0, 0.0) ], layout=layout),
+        'pack_many(), struct':       lambda: Payload.pack_many([ ("MO", 0.0, too_large, 0.0, 0.0) ], layout=layout, use_numpy=False),
+        'slave Payload.to_bytes()':  lambda: slave.Payload("MO", 0.0, too_large, 0.0, 0.0, layout=slave_layout).to_bytes(),
+        'slave Aggregate.to_bytes()': lambda: slave.Aggregate([ slave.Payload("MO", 0.0, too_large, 0.0, 0.0,
+                layout=slave_layout) ]).to_bytes(),
+    }
+    for way, encode in ways.items():
+        try:
+            encode()
+        except ValueError as e:
+            if layout.fields[1] not in str(e):
+                raise ValueError('{} refused {} without naming its field: {}'.format(way, too_large, e))
+            continue
+        except Exception as e:
+            raise ValueError('{} refused {} with a {}, not a ValueError: {}'.format(way, too_large, type(e).__name__, e))
+        raise ValueError('{} encoded {}, out of range of the fixed point format.'.format(way, too_large))
+
+def main():
+    parser = argparse.ArgumentParser(description='generic encoding round trip and frame sizes')
+    parser.add_argument('--step', type=float, default=0.001, help='setpoint sweep step')
+    parser.add_argument('--baudrate', type=int, default=1_000_000)
+    args = parser.parse_args()
+    verify(args.step)
+    reply_size = Payload("AK").packet_size
+    print('frame sizes, and transactions/s at {} baud with a {} byte "AK" reply:'.format(args.baudrate, reply_size))
+    for layout in (schema.GENERIC, schema.GENERIC_HALF, schema.GENERIC_FIXED):
+        size = Payload("MO", 0.0, 0.0, 0.0, 0.0, layout=layout).packet_size
+        print('  type {}  {:<6} {:3d} bytes   {:6.0f} tx/s'.format(layout.type_id, layout.format[5:], size,
+                args.baudrate / BITS_PER_BYTE / (size + reply_size)))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# A latency and throughput benchmark suite driving UARTMaster, sweeping baud
+# rates, payload mixes and the sync and async UART managers, the latter also
+# through UARTMaster's awaitable methods ('await'). For each run it
+# reports per-transaction latency percentiles and a histogram, transactions/s,
+# bytes/s on the wire (both ways) and the master's CPU seconds per transaction.
+#
+# By default each baud rate is run against the simulated slave (sim/), in a
+# child process so that its CPU time isn't counted against the master's. With
+# --port the suite runs against a real slave or a loopback responder on that
+# port instead, which must be set to each baud rate swept.
+#
+# Results can be written to a JSON file, and compared against an earlier one,
+# flagging any run whose p50 or p99 latency has risen, or whose transactions/s
+# has fallen, by more than the threshold; the exit status is then 1.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.latency_suite [--baudrates 115200,1000000] [--mixes generic,telemetry]
+#             [--managers sync,async,await] [--count N] [--json FILE] [--compare FILE] [--threshold PCT]
+#
+
+import sys
+import json
+import asyncio
+import time
+import argparse
+import platform
+from datetime import datetime as dt
+
+from uart import schema
+from uart.payload import Payload, Aggregate
+from uart.uart_master import UARTMaster
+from sim.uart_slave import spawn
+from core.logger import Level
+
+BAUDRATES = (115200, 460800, 921600, 1_000_000)
+PERCENTILES = (50, 90, 99, 99.9)
+
+# each mix is a cycle of transactions, each a Payload or a list sent as one aggregate
+MIXES = {
+    'generic':   [ Payload("GO", 1.0, 1.0, -10.0, -20.0) ],
+    'fixed':     [ Payload("GO", 1.0, 1.0, -10.0, -20.0, layout=schema.GENERIC_FIXED) ],
+    'telemetry': [ Payload("TM", *(float(i) for i in range(16))) ],
+    'mixed':     [ Payload("GO", 1.0, 1.0, -10.0, -20.0),
+                   Payload("LT", 1.0, 0.0, 0.0, 255.0, layout=schema.GENERIC_FIXED),
+                   Payload("TM", *(float(i) for i in range(16))) ],
+    'aggregate': [ [ Payload("GO", 1.0, 1.0, -10.0, -20.0),
+                     Payload("LT", 1.0, 0.0, 0.0, 255.0, layout=schema.GENERIC_FIXED),
+                     Payload("TM", *(float(i) for i in range(16))) ] ],
+}
+
+def percentile(ordered, p):
+    '''
+    Returns the p-th percentile of a sorted list, by the nearest rank.
+    '''
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+def histogram(ordered_us):
+    '''
+    Returns [upper bound µs, count] for each non-empty power of two bucket.
+    '''
+    buckets = {}
+    for value in ordered_us:
+        bound = 1 << max(0, int(value) - 1).bit_length()
+        buckets[bound] = buckets.get(bound, 0) + 1
+    return [ [bound, buckets[bound]] for bound in sorted(buckets) ]
+
+def exchange(master, transaction):
+    '''
+    Runs one transaction, returning (bytes sent and received, True if answered).
+    '''
+    if isinstance(transaction, list):
+        replies = master.send_receive_many(transaction)
+        request_size = Aggregate(transaction).packet_size
+        reply_size = Aggregate(replies).packet_size
+        return request_size + reply_size, UARTMaster.ERROR_PAYLOAD not in replies
+    reply = master.send_receive_payload(transaction)
+    return transaction.packet_size + reply.packet_size, reply is not UARTMaster.ERROR_PAYLOAD
+
+async def exchange_async(master, transaction):
+    '''
+    Runs one transaction with the awaitable methods, as exchange().
+    '''
+    if isinstance(transaction, list):
+        replies = await master.send_receive_many_async(transaction)
+        request_size = Aggregate(transaction).packet_size
+        reply_size = Aggregate(replies).packet_size
+        return request_size + reply_size, UARTMaster.ERROR_PAYLOAD not in replies
+    reply = await master.send_receive_payload_async(transaction)
+    return transaction.packet_size + reply.packet_size, reply is not UARTMaster.ERROR_PAYLOAD
+
+async def measure_async(master, transactions, count, warmup):
+    '''
+    As measure(), on the caller's event loop with the awaitable methods.
+    '''
+    for i in range(warmup):
+        await exchange_async(master, transactions[i % len(transactions)])
+    latencies = []
+    total_bytes = errors = 0
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for i in range(count):
+        begin = time.perf_counter()
+        size, answered = await exchange_async(master, transactions[i % len(transactions)])
+        latencies.append(time.perf_counter() - begin)
+        total_bytes += size
+        errors += not answered
+    return latencies, total_bytes, errors, time.perf_counter() - start, time.process_time() - cpu_start
+
+def measure(master, transactions, count, warmup):
+    '''
+    Returns (latencies, bytes, errors, elapsed seconds, CPU seconds) of count
+    transactions, following warmup ones.
+    '''
+    for i in range(warmup):
+        exchange(master, transactions[i % len(transactions)])
+    latencies = []
+    total_bytes = errors = 0
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for i in range(count):
+        begin = time.perf_counter()
+        size, answered = exchange(master, transactions[i % len(transactions)])
+        latencies.append(time.perf_counter() - begin)
+        total_bytes += size
+        errors += not answered
+    return latencies, total_bytes, errors, time.perf_counter() - start, time.process_time() - cpu_start
+
+def run(port, baudrate, mix, manager, count, warmup):
+    master = UARTMaster(port=port, baudrate=baudrate, use_async=manager != 'sync')
+    master._log.level = Level.WARN
+    master.uart._log.level = Level.WARN
+    try:
+        if manager == 'await':
+            latencies, total_bytes, errors, elapsed, cpu = asyncio.run(measure_async(master, MIXES[mix], count, warmup))
+        else:
+            latencies, total_bytes, errors, elapsed, cpu = measure(master, MIXES[mix], count, warmup)
+    finally:
+        master.uart.close()
+    ordered_us = sorted(latency * 1e6 for latency in latencies)
+    return {
+        'manager':    manager,
+        'baudrate':   baudrate,
+        'mix':        mix,
+        'count':      count,
+        'errors':     errors,
+        'latency_us': dict([ ('p{:g}'.format(p), round(percentile(ordered_us, p), 1)) for p in PERCENTILES ]
+                            + [ ('mean', round(sum(ordered_us) / count, 1)), ('max', round(ordered_us[-1], 1)) ]),
+        'histogram_us': histogram(ordered_us),
+        'tx_per_s':   round(count / elapsed, 1),
+        'bytes_per_s': round(total_bytes / elapsed, 1),
+        'cpu_s_per_tx': cpu / count,
+    }
+
+def key(result):
+    return '{manager}/{baudrate}/{mix}'.format(**result)
+
+def compare(results, baseline, threshold):
+    '''
+    Prints the change of each run from the baseline, returning the number of
+    regressions beyond the threshold (a percentage).
+    '''
+    previous = { key(result): result for result in baseline['results'] }
+    regressions = 0
+    print('compared with {}:'.format(baseline['meta']['date']))
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        changes = {
+            'p50': 100.0 * (result['latency_us']['p50'] / before['latency_us']['p50'] - 1),
+            'p99': 100.0 * (result['latency_us']['p99'] / before['latency_us']['p99'] - 1),
+            'tx/s': 100.0 * (result['tx_per_s'] / before['tx_per_s'] - 1),
+        }
+        regressed = [ name for name, change in changes.items() if (-change if name == 'tx/s' else change) > threshold ]
+        regressions += bool(regressed)
+        print('  {:<28} p50 {:+6.1f}%  p99 {:+6.1f}%  tx/s {:+6.1f}%  {}'.format(key(result),
+                changes['p50'], changes['p99'], changes['tx/s'], 'REGRESSED: ' + ', '.join(regressed) if regressed else ''))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='UARTMaster latency and throughput suite')
+    parser.add_argument('--baudrates', default=','.join(str(baudrate) for baudrate in BAUDRATES))
+    parser.add_argument('--mixes', default=','.join(MIXES), help='of: ' + ', '.join(MIXES))
+    parser.add_argument('--managers', default='sync,async,await', help='of: sync, async, await')
+    parser.add_argument('--count', type=int, default=1000, help='transactions per run')
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--port', help='a real slave or loopback responder, rather than the simulated slave')
+    parser.add_argument('--turnaround-us', type=float, default=50.0, help="the simulated slave's reply latency")
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='a previous JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='regression threshold, percent')
+    args = parser.parse_args()
+    results = []
+    print('{:<6} {:>8} {:<10} {:>8} {:>8} {:>8} {:>8} {:>8} {:>9} {:>8} {:>4}'.format('mgr', 'baud', 'mix',
+            'p50 µs', 'p90 µs', 'p99 µs', 'max µs', 'tx/s', 'bytes/s', 'CPU µs', 'err'))
+    for baudrate in [ int(baudrate) for baudrate in args.baudrates.split(',') ]:
+        child, port = (None, args.port) if args.port else spawn(baudrate, args.turnaround_us)
+        try:
+            for manager in args.managers.split(','):
+                for mix in args.mixes.split(','):
+                    result = run(port, baudrate, mix, manager, args.count, args.warmup)
+                    latency = result['latency_us']
+                    print('{manager:<6} {baudrate:>8} {mix:<10}'.format(**result)
+                            + ' {:8.0f} {:8.0f} {:8.0f} {:8.0f} {:8.0f} {:9.0f} {:8.1f} {:4d}'.format(latency['p50'], latency['p90'],
+                            latency['p99'], latency['max'], result['tx_per_s'], result['bytes_per_s'],
+                            result['cpu_s_per_tx'] * 1e6, result['errors']))
+                    results.append(result)
+        finally:
+            if child is not None:
+                child.stdin.close()
+                child.wait()
+    meta = { 'date': dt.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+            'machine': platform.machine(), 'port': args.port or 'simulated', 'count': args.count,
+            'turnaround_us': None if args.port else args.turnaround_us }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({ 'meta': meta, 'results': results }, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.threshold):
+                sys.exit(1)
+
+if __name__ == "__main__":
+    main()
+
+#EOF
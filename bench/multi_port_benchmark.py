@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Drives N simulated slaves, each on its own port and in its own process: with
+# a thread per port running the sync UARTMaster, busy-waiting or blocking in
+# poll(), or the async UARTMaster (with its own event loop thread), and with
+# one MultiPortManager running rounds of a transaction on every port at once
+# from the calling thread. Reports transactions/s across all ports and the
+# master's CPU time per transaction.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.multi_port_benchmark [--ports 1,2,4] [--count N] [--baudrate BAUD]
+#
+
+import time
+import argparse
+from threading import Thread
+
+from uart.payload import Payload
+from uart.uart_master import UARTMaster
+from uart.multi_port_manager import MultiPortManager
+from sim.uart_slave import spawn
+from core.logger import Level
+
+def request(i):
+    return Payload("GO", float(i), 1.0, -10.0, -20.0)
+
+def threaded(ports, baudrate, count, use_async, busy_wait=False):
+    masters = []
+    for port in ports:
+        master = UARTMaster(port=port, baudrate=baudrate, use_async=use_async)
+        if busy_wait:
+            master.uart._busy_wait = True # not otherwise exposed by UARTMaster
+        master._log.level = Level.WARN
+        master.uart._log.level = Level.WARN
+        masters.append(master)
+    errors = [0] * len(masters)
+    def drive(index, master):
+        for i in range(count):
+            errors[index] += master.send_receive_payload(request(i)) is UARTMaster.ERROR_PAYLOAD
+    threads = [ Thread(target=drive, args=(index, master)) for index, master in enumerate(masters) ]
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    for master in masters:
+        master.uart.close()
+    return elapsed, cpu, sum(errors)
+
+def multiplexed(ports, baudrate, count):
+    manager = MultiPortManager(baudrate=baudrate)
+    manager._log.level = Level.WARN
+    for index, port in enumerate(ports):
+        manager.add('mcu{}'.format(index), port)
+    errors = 0
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for i in range(count):
+        replies = manager.send_receive_all({ name: request(i) for name in manager.names })
+        errors += sum(reply is UARTMaster.ERROR_PAYLOAD for reply in replies.values())
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    manager.close()
+    return elapsed, cpu, errors
+
+def main():
+    parser = argparse.ArgumentParser(description='several ports from one thread')
+    parser.add_argument('--ports', default='1,2,4', help='numbers of ports to drive')
+    parser.add_argument('--count', type=int, default=1000, help='transactions per port')
+    parser.add_argument('--baudrate', type=int, default=1_000_000)
+    args = parser.parse_args()
+    for n in [ int(n) for n in args.ports.split(',') ]:
+        slaves = [ spawn(args.baudrate) for _ in range(n) ]
+        ports = [ port for _, port in slaves ]
+        try:
+            print('{} port{}, {} transactions each:'.format(n, '' if n == 1 else 's', args.count))
+            for name, run in (('busy-wait, thread/port', lambda: threaded(ports, args.baudrate, args.count, False, True)),
+                              ('sync, thread per port', lambda: threaded(ports, args.baudrate, args.count, False)),
+                              ('async, thread per port', lambda: threaded(ports, args.baudrate, args.count, True)),
+                              ('MultiPortManager', lambda: multiplexed(ports, args.baudrate, args.count))):
+                elapsed, cpu, errors = run()
+                total = n * args.count
+                print('  {:<24} {:7.0f} tx/s   CPU {:6.1f}µs/tx   {:3d} errors'.format(name, total / elapsed, cpu / total * 1e6, errors))
+        finally:
+            for child, _ in slaves:
+                child.stdin.close()
+                child.wait()
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Measures memory allocated per transaction, using tracemalloc, by the
+# previous encode/decode path against pack_into()/unpack_from() with a reused
+# transmit buffer. A transaction here is encoding a request and writing it to
+# /dev/null, then decoding a reply from a receive buffer.
+#
+# The previous path encoded with struct.pack and bytes concatenation, did so
+# twice per send (UARTMaster.send_payload() discarded its own copy), let
+# Serial.write() copy the bytes again, and decoded from a sliced copy of the
+# receive buffer.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.payload_alloc_benchmark [--count N]
+#
+
+import os
+import time
+import struct
+import argparse
+import tracemalloc
+
+from uart.payload import Payload
+
+def legacy_to_bytes(payload):
+    packed = struct.pack(payload.schema.format, payload.seq, payload.schema.type_id, payload.cmd, *payload.values)
+    crc = Payload.calculate_crc8(packed)
+    return Payload.SYNC_HEADER + packed + bytes([crc])
+
+def legacy_transaction(fd, request, rx_buffer):
+    legacy_to_bytes(request)                  # discarded by UARTMaster.send_payload()
+    packet = legacy_to_bytes(request)         # encoded again by the UART manager
+    os.write(fd, bytes(packet))               # Serial.write() copies its argument
+    size = Payload.frame_length(rx_buffer)
+    reply = Payload.from_bytes(bytes(rx_buffer[0:size]))
+    rx_buffer = rx_buffer[size:] + rx_buffer[:size] # consume by slicing
+    return reply, rx_buffer
+
+def current_transaction(fd, request, rx_buffer, tx_buffer, tx_view):
+    count = request.pack_into(tx_buffer, 0)
+    os.write(fd, tx_view[:count])
+    reply = Payload.unpack_from(rx_buffer, 0)
+    return reply, rx_buffer
+
+def measure(label, transaction, count):
+    # warm up, so one-time allocations (caches, interned objects) are not counted
+    for _ in range(100):
+        transaction()
+    tracemalloc.start()
+    peak_total = 0
+    before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    for _ in range(count):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        transaction()
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    elapsed = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print('  {:<8} peak {:6.1f} bytes/tx allocated   {:6.1f} bytes/tx retained   ({:.2f} µs/tx traced)'.format(
+            label, peak_total / count, retained / count, elapsed * 1e6 / count))
+
+def main():
+    parser = argparse.ArgumentParser(description='Payload allocations per transaction')
+    parser.add_argument('--count', type=int, default=20_000)
+    args = parser.parse_args()
+    fd = os.open(os.devnull, os.O_WRONLY)
+    request = Payload("GO", 10.0, 20.0, -10.0, -20.0, seq=1)
+    reply = Payload("AK", seq=1).to_bytes()
+
+    state = { 'rx': bytearray(reply * 4) }
+    def legacy():
+        _, state['rx'] = legacy_transaction(fd, request, state['rx'])
+
+    rx_buffer = bytearray(reply * 4)
+    tx_buffer = bytearray(Payload.MAX_PACKET_SIZE)
+    tx_view   = memoryview(tx_buffer)
+    def current():
+        current_transaction(fd, request, rx_buffer, tx_buffer, tx_view)
+
+    print('{} transactions:'.format(args.count))
+    measure('before', legacy, args.count)
+    measure('after', current, args.count)
+    os.close(fd)
+
+if __name__ == "__main__":
+    main()
+
+#EOF
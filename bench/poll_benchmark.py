@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Polls addressed slaves on one simulated bus (in its own process) with the
+# PollScheduler, the first slave weighted to be polled twice per cycle, and
+# reports the cycle time and each slave's replies: with every node alive, then
+# with one more address that never answers, polled every cycle (as if never
+# marked down), then with the scheduler marking it down.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.poll_benchmark [--slaves N] [--cycles N] [--timeout-ms MS] [--baudrate BAUD]
+#
+
+import argparse
+
+from uart.payload import Payload
+from uart.uart_master import UARTMaster
+from uart.poll_scheduler import PollScheduler
+from sim.uart_slave import spawn
+from core.logger import Level
+
+def run(port, args, addresses, max_failures):
+    master = UARTMaster(port=port, baudrate=args.baudrate)
+    master._log.level = Level.CRITICAL
+    master.uart._log.level = Level.CRITICAL
+    poller = PollScheduler(master, timeout_ms=args.timeout_ms, max_failures=max_failures)
+    poller._log.level = Level.CRITICAL
+    for address in addresses:
+        poller.add(address, Payload("GO", float(address), 1.0, -10.0, -20.0), weight=2 if address == 1 else 1)
+    try:
+        for _ in range(args.cycles):
+            poller.cycle()
+    finally:
+        master.uart.close()
+    return poller.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description='addressed slaves polled on one bus')
+    parser.add_argument('--slaves', type=int, default=3)
+    parser.add_argument('--cycles', type=int, default=500)
+    parser.add_argument('--timeout-ms', type=float, default=5.0)
+    parser.add_argument('--baudrate', type=int, default=1_000_000)
+    args = parser.parse_args()
+    live = list(range(1, args.slaves + 1))
+    dead = args.slaves + 1
+    child, port = spawn(args.baudrate, addresses=live)
+    try:
+        print('{} slaves at {} baud (slave 1 weighted 2), {}ms timeout, {} cycles:'.format(args.slaves, args.baudrate,
+                args.timeout_ms, args.cycles))
+        for name, addresses, max_failures in (('all alive', live, 3),
+                                              ('dead node, never down', live + [dead], args.cycles + 1),
+                                              ('dead node, marked down', live + [dead], 3)):
+            stats = run(port, args, addresses, max_failures)
+            cycle = stats['cycle_time']
+            replies = '  '.join('{}:{}/{}'.format(address, slave['replies'], slave['polls']) for address, slave in stats['slaves'].items())
+            print('  {:<24} cycle p50 {:7.0f}µs  p99 {:7.0f}µs  max {:7.0f}µs  {:5.0f} cycles/s   replies/polls {}'.format(name,
+                    cycle['p50_us'], cycle['p99_us'], cycle['max_us'], 1e6 / cycle['mean_us'], replies))
+    finally:
+        child.stdin.close()
+        child.wait()
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Measures how steadily a control loop keeps its rate: a naive loop that
+# sleeps one period after each iteration, against the RateScheduler sleeping
+# only (spin 0) and sleeping then spinning, reporting the rate achieved, the
+# jitter of each tick's start against its deadline on the ideal grid, and
+# overruns. Each iteration is a transaction with the simulated slave (in its
+# own process), with occasional slow ones (--stall-every) to exercise the
+# overrun policy. The naive loop's jitter grows without bound as it drifts.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.rate_benchmark [--rates 200,500] [--seconds S] [--overrun skip|catch_up] [--max-catch-up N] [--stall-every N]
+#
+
+import time
+import argparse
+
+from uart.payload import Payload
+from uart.stats import Histogram
+from uart.rate_scheduler import RateScheduler
+from uart.uart_master import UARTMaster
+from sim.uart_slave import spawn
+from core.logger import Level
+
+def naive(rate_hz, ticks, work):
+    '''
+    Sleeps a period after each iteration, as a loop without a scheduler would:
+    returns (elapsed seconds, jitter Histogram against the ideal grid).
+    '''
+    period = 1.0 / rate_hz
+    jitter = Histogram()
+    start = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        time.sleep(period)
+        jitter.add(max(0, int((time.perf_counter() - (start + tick * period)) * 1e9)))
+        work(tick)
+    return time.perf_counter() - start, jitter
+
+def scheduled(rate_hz, ticks, work, overrun, spin_us, max_catch_up):
+    scheduler = RateScheduler(rate_hz, overrun, spin_us=spin_us, max_catch_up=max_catch_up)
+    scheduler.start()
+    start = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        scheduler.wait()
+        work(tick)
+    return time.perf_counter() - start, scheduler.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description='fixed rate control loop jitter')
+    parser.add_argument('--rates', default='200,500')
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--overrun', default='skip', choices=RateScheduler.OVERRUN_POLICIES)
+    parser.add_argument('--max-catch-up', type=int, default=1, help="the most missed ticks run back to back by 'catch_up'")
+    parser.add_argument('--stall-every', type=int, default=250, help='make every Nth iteration overrun (0 for none)')
+    parser.add_argument('--baudrate', type=int, default=1_000_000)
+    args = parser.parse_args()
+    child, port = spawn(args.baudrate)
+    master = UARTMaster(port=port, baudrate=args.baudrate)
+    master._log.level = Level.WARN
+    payload = Payload("GO", 1.0, 1.0, -10.0, -20.0)
+    try:
+        for rate_hz in [ int(rate) for rate in args.rates.split(',') ]:
+            def work(tick):
+                master.send_receive_payload(payload)
+                if args.stall_every and tick % args.stall_every == 0:
+                    time.sleep(2.5 / rate_hz) # a slow iteration, overrunning two periods
+            ticks = int(rate_hz * args.seconds)
+            print('{}Hz, {} ticks, a stall every {}:'.format(rate_hz, ticks, args.stall_every or 'never'))
+            elapsed, jitter = naive(rate_hz, ticks, work)
+            print('  {:<22} {:6.1f}Hz   jitter p50 {:8.1f}µs  p99 {:8.1f}µs  max {:8.1f}µs'.format('sleep per iteration',
+                    ticks / elapsed, jitter.percentile(50) / 1000, jitter.percentile(99) / 1000, jitter.max / 1000))
+            for spin_us in (0, 300):
+                elapsed, stats = scheduled(rate_hz, ticks, work, args.overrun, spin_us, args.max_catch_up)
+                jitter = stats['jitter']
+                print('  {:<22} {:6.1f}Hz   jitter p50 {:8.1f}µs  p99 {:8.1f}µs  max {:8.1f}µs   {} overruns, {} skipped, {} late'.format(
+                        'scheduler, spin {}µs'.format(spin_us), ticks / elapsed, jitter['p50_us'], jitter['p99_us'],
+                        jitter['max_us'], stats['overruns'], stats['skipped'], stats['late']))
+    finally:
+        master.uart.close()
+        child.stdin.close()
+        child.wait()
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Measures recovery from corruption on the line. A stream of frames, a share
+# of them carrying the sync header pattern 'zz' (0x7A7A) inside their float
+# data, is corrupted by a FaultInjector with one kind of fault at a time (bit
+# flips, dropped bytes, inserted garbage, truncated frames or stray sync
+# headers whose type is that of a long layout) and fed in UART-sized reads
+# through each framer:
+#
+#     master   RxBuffer, as used by both UART managers
+#     slave    the slicing loop of UartSlaveBase.receive_packet(), as ported
+#              here with the slave's own Payload (upy/)
+#
+# For each it reports frames lost per fault, false frames accepted (a corrupt
+# frame that passed its CRC8), time to recover (from a fault until the end of
+# the next intact frame decoded, at the baud rate), and the CPU time spent per
+# fault beyond that of decoding the intact frames. The last is the difference
+# between each faulted run and a clean run alongside it, scaled to the frames
+# intact, over --repeat pairs: its median and, after the ±, half the spread
+# between its quartiles. At the default rate of faults the cost of a fault is
+# not much more than the timing noise of a run, so a figure within its spread
+# of zero (or a negative one) means that the faults cost nothing measurable,
+# not that they saved time; more --repeat pairs narrow the spread.
+#
+# With --link, transactions are then run end to end over the simulated link
+# with the same faults on the line in both directions, reporting the requests
+# lost and the time each costs over a clean run, which is governed by the
+# reply timeout. There a stray header before a request or reply is the case
+# that matters: nothing follows the frame behind it until the next exchange,
+# so were the framer to wait for the stray's length it would be lost.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.resync_benchmark [--rate P] [--frames N] [--chunk BYTES] [--baudrate BAUD] [--link]
+#
+
+import os
+import sys
+import time
+import statistics
+import struct
+import random
+import argparse
+
+from uart.payload import Payload
+from uart.rx_buffer import RxBuffer
+from uart.uart_master import UARTMaster
+from sim.faults import FaultInjector
+from sim.link import SimulatedLink
+from sim.uart_slave import SimUartSlave
+from core.logger import Level
+
+# a float whose first two bytes are the sync header
+HEADER_FLOAT = struct.unpack('<f', Payload.SYNC_HEADER + b'\x0b\x43')[0]
+
+def load_slave_payload():
+    '''
+    Imports upy/payload.py with its own schema and crc8_table, as on the slave.
+    '''
+    upy = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'upy')
+    sys.path.insert(0, upy)
+    try:
+        import payload
+    finally:
+        sys.path.remove(upy)
+    return payload.Payload
+
+def make_frames(count, header_share, seed):
+    '''
+    Returns the frames, each carrying its index as pfwd.
+    '''
+    rnd = random.Random(seed)
+    frames = []
+    for i in range(count):
+        sfwd = HEADER_FLOAT if rnd.random() < header_share else rnd.uniform(-100.0, 100.0)
+        frames.append(Payload("MO", float(i), sfwd, rnd.uniform(-100.0, 100.0), -10.0, seq=i % 256).to_bytes())
+    return frames
+
+class MasterFramer:
+    def __init__(self):
+        self._rx_buffer = RxBuffer()
+
+    def feed(self, data):
+        self._rx_buffer.write(data)
+        frames = []
+        while (payload := self._rx_buffer.next_frame()) is not None:
+            frames.append(payload)
+        return frames
+
+class SlaveFramer:
+    '''
+    The framing of UartSlaveBase.receive_packet(), without the UART: a
+    bytearray grown by concatenation and consumed by slicing.
+    '''
+    def __init__(self):
+        self._payload = load_slave_payload()
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        Payload = self._payload
+        self._buffer += data
+        frames = []
+        while True:
+            if self._buffer.startswith(Payload.SYNC_HEADER):
+                if len(self._buffer) <= Payload.TYPE_INDEX:
+                    return frames
+                try:
+                    packet_size = Payload.frame_length(self._buffer)
+                    if packet_size is None or len(self._buffer) < packet_size:
+                        return frames
+                    frames.append(Payload.from_bytes(self._buffer[:packet_size]))
+                    self._buffer = self._buffer[packet_size:]
+                except Exception:
+                    self._buffer = self._buffer[1:]
+            else:
+                idx = self._buffer.find(Payload.SYNC_HEADER)
+                if idx == -1:
+                    if len(self._buffer) > len(Payload.SYNC_HEADER):
+                        self._buffer = self._buffer[-(len(Payload.SYNC_HEADER) - 1):]
+                    return frames
+                self._buffer = self._buffer[idx:]
+
+def corrupt(frames, faults):
+    stream = bytearray()
+    for frame in frames:
+        stream += faults(frame) if faults is not None else frame
+    return bytes(stream)
+
+def run_framer(framer_class, frames, stream, chunk):
+    '''
+    Feeds the stream through a new framer, returning (intact frames, false
+    frames, the offset in the stream at which each intact frame completed,
+    the CPU seconds taken).
+    '''
+    framer = framer_class()
+    intact, false, completed = [], 0, []
+    cpu_start = time.process_time()
+    for offset in range(0, len(stream), chunk):
+        for payload in framer.feed(stream[offset:offset + chunk]):
+            index = int(payload.values[0]) if payload.values[0] == int(payload.values[0]) else -1
+            if 0 <= index < len(frames) and frames[index] == Payload(payload.cmd, *payload.values, seq=payload.seq).to_bytes():
+                intact.append(index)
+                completed.append(min(offset + chunk, len(stream)))
+            else:
+                false += 1
+    return intact, false, completed, time.process_time() - cpu_start
+
+def cpu_per_fault(framer_class, frames, clean, stream, chunk, repeat, faults):
+    '''
+    Returns the median and half the interquartile range of the CPU µs per
+    fault beyond that of the intact frames, over repeat pairs of a faulted
+    and a clean run, as well as the faulted run's results.
+    '''
+    costs = []
+    for _ in range(repeat):
+        _, _, _, clean_cpu = run_framer(framer_class, frames, clean, chunk)
+        intact, false, completed, cpu = run_framer(framer_class, frames, stream, chunk)
+        costs.append((cpu - clean_cpu * len(intact) / len(frames)) / faults * 1e6)
+    if repeat < 2:
+        return costs[0], 0.0, intact, false, completed
+    q1, median, q3 = statistics.quantiles(costs, n=4)
+    return median, (q3 - q1) / 2, intact, false, completed
+
+def recovery_times(events, completed):
+    '''
+    Returns the bytes from each fault to the completion of the next intact frame.
+    '''
+    times = []
+    i = 0
+    for offset, _ in events:
+        while i < len(completed) and completed[i] <= offset:
+            i += 1
+        if i < len(completed):
+            times.append(completed[i] - offset)
+    return times
+
+def offline(args):
+    frames = make_frames(args.frames, args.header_share, args.seed)
+    byte_us = 10 / args.baudrate * 1e6
+    print('{} frames, {:.0%} carrying the sync header in their data, {}-byte reads; fault rate {}:'.format(
+            args.frames, args.header_share, args.chunk, args.rate))
+    print('  {:<7} {:<9} {:>7} {:>10} {:>7} {:>12} {:>12} {:>16}'.format('framer', 'fault', 'faults',
+            'lost/fault', 'false', 'recover p50', 'recover max', 'CPU/fault'))
+    clean = corrupt(frames, None)
+    for name, framer_class in (('master', MasterFramer), ('slave', SlaveFramer)):
+        for kind in FaultInjector.KINDS:
+            rate = args.rate * (len(frames[0]) if kind in ('truncate', 'stray') else 1) # these are per frame
+            faults = FaultInjector(seed=args.seed, **{ kind: rate })
+            stream = corrupt(frames, faults)
+            if not faults.total:
+                continue
+            cost, spread, intact, false, completed = cpu_per_fault(framer_class, frames, clean, stream, args.chunk,
+                    args.repeat, faults.total)
+            recover = sorted(recovery_times(faults.events, completed))
+            print('  {:<7} {:<9} {:7d} {:10.2f} {:7d} {:10.0f}µs {:10.0f}µs {:>16}'.format(name, kind, faults.total,
+                    (len(frames) - len(intact)) / faults.total, false,
+                    recover[len(recover) // 2] * byte_us if recover else 0, recover[-1] * byte_us if recover else 0,
+                    '{:+.1f}±{:.1f}µs'.format(cost, spread)))
+
+def end_to_end(args):
+    count = min(args.frames, 2000)
+    print('end to end over the simulated link at {} baud, {}ms reply timeout, fault rate {} each way:'.format(
+            args.baudrate, args.reply_timeout_ms, args.rate))
+    clean_elapsed = None
+    for kind in (None,) + FaultInjector.KINDS:
+        rate = args.rate * (23 if kind in ('truncate', 'stray') else 1)
+        faults = FaultInjector(seed=args.seed, **({} if kind is None else { kind: rate }))
+        reply_faults = FaultInjector(seed=args.seed + 1, **({} if kind is None else { kind: rate }))
+        link = SimulatedLink(baudrate=args.baudrate, turnaround_us=50, faults=faults, reply_faults=reply_faults)
+        slave = SimUartSlave(link.uart)
+        slave._log.level = Level.CRITICAL
+        slave.start()
+        master = UARTMaster(port=link.port, baudrate=args.baudrate, reply_timeout_ms=args.reply_timeout_ms)
+        master._log.level = Level.CRITICAL
+        master.uart._log.level = Level.CRITICAL
+        try:
+            requests = [ Payload("MO", float(i), 1.0, 2.0, 3.0) for i in range(count) ]
+            start = time.perf_counter()
+            replies = master.send_receive_pipelined(requests, window=1)
+            elapsed = time.perf_counter() - start
+        finally:
+            master.uart.close()
+            link.close()
+        lost = sum(reply is UARTMaster.ERROR_PAYLOAD for reply in replies)
+        if kind is None:
+            clean_elapsed = elapsed
+        print('  {:<9} {:4d} faults   {:4d} of {} requests lost   {:6.0f} tx/s   {:5.1f}ms per loss'.format(kind or 'none',
+                faults.total + reply_faults.total, lost, count, count / elapsed,
+                (elapsed - clean_elapsed) / lost * 1000 if lost else 0.0))
+
+def main():
+    parser = argparse.ArgumentParser(description='resynchronisation after corruption')
+    parser.add_argument('--rate', type=float, default=0.001, help='faults per byte (truncation, stray headers: per byte of frame)')
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--header-share', type=float, default=0.25, help="share of frames with 'zz' in their data")
+    parser.add_argument('--chunk', type=int, default=16, help='bytes per read')
+    parser.add_argument('--baudrate', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=9, help='pairs of faulted and clean runs timed')
+    parser.add_argument('--link', action='store_true', help='also run end to end over the simulated link')
+    parser.add_argument('--reply-timeout-ms', type=int, default=20)
+    args = parser.parse_args()
+    offline(args)
+    if args.link:
+        end_to_end(args)
+
+if __name__ == "__main__":
+    main()
+
+#EOF
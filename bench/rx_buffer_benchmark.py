@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Microbenchmark of RX framing: the previous slice-and-copy bytearray framing
+# against RxBuffer, over three streams:
+#
+#     clean   back to back frames
+#     noisy   one frame in ten corrupted, and every hundred frames a burst of
+#             up to 2KB of garbage, a fifth of it sync header bytes
+#     heavy   one frame in four corrupted, and every hundred frames a run of
+#             up to 16KB of garbage, a fifth of it sync header bytes
+#
+# Each is read from a model of the serial port at most N bytes at a time, for
+# each of the --reads sizes, 'all' being the whole stream as one backlog. The
+# previous framing read() bytes and appended them to its buffer as the UART
+# managers did; RxBuffer reads straight into its own with readinto(). Each
+# figure is the best of --repeat runs.
+#
+# The previous framing's cost grows with the bytes it holds, as it copies the
+# rest of its buffer for each frame and each false header, whereas RxBuffer's
+# doesn't: it pulls ahead as reads grow, and reading a backlog after a stall
+# is several times quicker, most of all through heavy noise. With small reads
+# little is ever held, and on CPython RxBuffer is then the slower: by about a
+# fifth at 16 bytes, and through heavy noise also at 256. Part of that is this
+# model of the port, whose readinto() costs more in Python than its read(),
+# but the rest is framing by the schema: the length of each frame, and of
+# each false header, is looked up by its type where the previous framing
+# assumed one fixed size.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.rx_buffer_benchmark [--frames N] [--reads N [N ...]] [--repeat N]
+#
+
+import argparse
+import random
+import time
+
+from uart.payload import Payload
+from uart.rx_buffer import RxBuffer
+
+PACKET_SIZE = Payload("GO", 0.0, 0.0, 0.0, 0.0).packet_size # the fixed size of the frames streamed here
+
+class LegacyFraming:
+    '''
+    The framing previously used by the UART managers: bytes are appended to a
+    bytearray which is rebuilt by slicing on every frame, trim and resync.
+    '''
+    def __init__(self):
+        self._rx_buffer = bytearray()
+
+    def next_frame(self):
+        while True:
+            idx = self._rx_buffer.find(Payload.SYNC_HEADER)
+            if idx == -1:
+                if len(self._rx_buffer) > len(Payload.SYNC_HEADER):
+                    self._rx_buffer = self._rx_buffer[-(len(Payload.SYNC_HEADER)-1):]
+                return None
+            if len(self._rx_buffer) - idx < PACKET_SIZE:
+                return None
+            packet = self._rx_buffer[idx: idx + PACKET_SIZE]
+            try:
+                payload = Payload.from_bytes(packet)
+                self._rx_buffer = self._rx_buffer[idx + PACKET_SIZE:]
+                return payload
+            except ValueError:
+                self._rx_buffer = self._rx_buffer[idx+1:]
+
+    def readinto(self, port):
+        self._rx_buffer += port.read()
+
+class Port:
+    '''
+    The serial port, returning the stream at most chunk bytes per read.
+    '''
+    def __init__(self, stream, chunk):
+        self._stream = memoryview(stream)
+        self._chunk  = chunk
+        self._offset = 0
+
+    def in_waiting(self):
+        return len(self._stream) - self._offset
+
+    def read(self):
+        data = bytes(self._stream[self._offset:self._offset + self._chunk])
+        self._offset += len(data)
+        return data
+
+    def readinto(self, buf):
+        data = self._stream[self._offset:self._offset + min(len(buf), self._chunk)]
+        buf[:len(data)] = data
+        self._offset += len(data)
+        return len(data)
+
+def corrupted_stream(frames, corrupt, every, garbage, sync, seed=1):
+    '''
+    A stream in which a fraction corrupt of the frames have a corrupted byte,
+    and after each every frames there's a run of up to garbage bytes of which
+    a fraction sync are the first byte of the sync header.
+    '''
+    rnd = random.Random(seed)
+    parts = []
+    for i in range(frames):
+        packet = bytearray(Payload("GO", i, -i, 10.0, -20.0, seq=i % 256).to_bytes())
+        if rnd.random() < corrupt:
+            packet[rnd.randrange(2, len(packet))] ^= 0xFF
+        parts.append(bytes(packet))
+        if i % every == every - 1:
+            parts.append(bytes(Payload.SYNC_HEADER[0] if rnd.random() < sync else rnd.randrange(256)
+                    for _ in range(rnd.randrange(garbage))))
+    return b''.join(parts)
+
+def streams(frames):
+    return (('clean', corrupted_stream(frames, 0.0, frames + 1, 0, 0.0)),
+            ('noisy', corrupted_stream(frames, 0.1, 100, 2048, 0.2)),
+            ('heavy', corrupted_stream(frames, 0.25, 100, 16384, 0.2)))
+
+def run(framing, stream, chunk):
+    port = Port(stream, chunk)
+    decoded = 0
+    start = time.perf_counter()
+    while port.in_waiting():
+        framing.readinto(port)
+        while framing.next_frame() is not None:
+            decoded += 1
+    return time.perf_counter() - start, decoded
+
+def main():
+    parser = argparse.ArgumentParser(description='RX framing microbenchmark')
+    parser.add_argument('--frames', type=int, default=20_000)
+    parser.add_argument('--reads', nargs='+', default=['16', '256', '4096', '65536', 'all'],
+            help='bytes per simulated read, or all')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    print('µs per decoded frame, best of {}:'.format(args.repeat))
+    print('  {:<6} {:>8} {:>10} {:>10} {:>8}'.format('stream', 'reads', 'legacy', 'rx-buffer', 'frames'))
+    for name, stream in streams(args.frames):
+        for reads in args.reads:
+            chunk = len(stream) if reads == 'all' else int(reads)
+            results = []
+            for make in (LegacyFraming, lambda: RxBuffer(capacity=max(4096, 2 * chunk))):
+                runs = [ run(make(), stream, chunk) for _ in range(args.repeat) ]
+                results.append((min(elapsed for elapsed, _ in runs), runs[0][1]))
+            print('  {:<6} {:>8} {:>10.2f} {:>10.2f} {:>8}'.format(name, reads,
+                    *(elapsed * 1e6 / max(decoded, 1) for elapsed, decoded in results), results[1][1]))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
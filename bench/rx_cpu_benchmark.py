@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Measures CPU time and latency per transaction of SyncUARTManager, comparing
+# the busy-wait receive against the blocking (poll) receive, and against
+# blocking after a bounded spin of each of the --spin-us times, over a pty
+# loopback. A responder process on the other end of the pty answers each
+# request with an "AK" after a fixed turnaround delay, standing in for the
+# slave and the wire.
+#
+# Blocking costs a wakeup from poll() on every reply, some tens of µs of
+# latency, for a tenth or less of the CPU time. A spin only gains that back
+# for replies arriving within it, so it wants to be about the usual reply
+# time; a shorter one spends CPU time for nothing.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.rx_cpu_benchmark [--count N] [--turnaround-us US] [--spin-us US [US ...]]
+#
+
+import os
+import tty
+import time
+import argparse
+import statistics
+from multiprocessing import get_context
+
+from uart.payload import Payload
+from uart.rx_buffer import RxBuffer
+from uart.sync_uart_manager import SyncUARTManager
+from core.logger import Level
+
+def respond(fd, turnaround_s):
+    '''
+    Answer every request read from fd with an "AK", echoing its sequence number.
+    '''
+    rx_buffer = RxBuffer()
+    while True:
+        try:
+            data = os.read(fd, 4096)
+        except OSError:
+            return
+        if not data:
+            return
+        rx_buffer.write(data)
+        while (request := rx_buffer.next_frame()) is not None:
+            if turnaround_s:
+                time.sleep(turnaround_s)
+            os.write(fd, Payload("AK", seq=request.seq).to_bytes())
+
+def measure(port, busy_wait, spin_us, count):
+    manager = SyncUARTManager(port=port, baudrate=1_000_000, busy_wait=busy_wait, spin_us=spin_us)
+    manager._log.level = Level.WARN
+    manager.open()
+    latencies = []
+    cpu_start = time.thread_time()
+    for i in range(count):
+        payload = Payload("GO", i, i, -10.0, -20.0, seq=i % 256)
+        start = time.perf_counter()
+        manager.send_packet(payload)
+        reply = manager.receive_packet(timeout_ms=100)
+        latencies.append(time.perf_counter() - start)
+        if reply is None or reply.seq != payload.seq:
+            raise RuntimeError('lost reply to {}'.format(payload))
+    cpu = time.thread_time() - cpu_start
+    manager.close()
+    return cpu / count, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description='SyncUARTManager CPU time per transaction')
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--turnaround-us', type=int, default=500, help='responder delay before replying')
+    parser.add_argument('--spin-us', type=int, nargs='+', default=[200, 1000], help='spins before blocking')
+    args = parser.parse_args()
+    master_fd, slave_fd = os.openpty()
+    tty.setraw(slave_fd)
+    port = os.ttyname(slave_fd)
+    responder = get_context('fork').Process(target=respond, args=(master_fd, args.turnaround_us / 1e6), daemon=True)
+    responder.start()
+    print('{} transactions over {}, {}µs turnaround:'.format(args.count, port, args.turnaround_us))
+    runs = [ ('busy-wait', True, 0), ('blocking', False, 0) ]
+    runs += [ ('spin {}µs'.format(spin_us), False, spin_us) for spin_us in args.spin_us ]
+    for label, busy_wait, spin_us in runs:
+        cpu_per_tx, latencies = measure(port, busy_wait, spin_us, args.count)
+        latencies.sort()
+        print('  {:<12} CPU {:7.1f} µs/tx   latency mean {:7.1f} µs  p50 {:7.1f} µs  p99 {:7.1f} µs'.format(
+                label, cpu_per_tx * 1e6, statistics.fmean(latencies) * 1e6,
+                latencies[len(latencies) // 2] * 1e6, latencies[int(len(latencies) * 0.99)] * 1e6))
+    responder.terminate()
+    os.close(slave_fd)
+    os.close(master_fd)
+
+if __name__ == "__main__":
+    main()
+
+#EOF
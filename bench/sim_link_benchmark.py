@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Measures round trip latency and throughput of the sync and async UART
+# managers against the simulated slave, without hardware, alongside the time
+# the link model alone accounts for: the request and reply on the wire plus
+# the slave's turnaround. The difference is the host's own overhead.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.sim_link_benchmark [--baudrate BAUD] [--turnaround-us US] [--byte-latency-us US] [--count N]
+#
+
+import time
+import argparse
+
+from uart.payload import Payload
+from uart.sync_uart_manager import SyncUARTManager
+from uart.async_uart_manager import AsyncUARTManager
+from sim.link import SimulatedLink
+from sim.uart_slave import SimUartSlave
+from core.logger import Level
+
+def measure(manager_class, args):
+    '''
+    Returns the sorted round trip times in seconds of count exchanges, and
+    the link's expected time per exchange.
+    '''
+    link = SimulatedLink(baudrate=args.baudrate, turnaround_us=args.turnaround_us, byte_latency_us=args.byte_latency_us)
+    slave = SimUartSlave(link.uart)
+    slave._log.level = Level.WARN
+    slave.start()
+    manager = manager_class(port=link.port, baudrate=args.baudrate)
+    manager._log.level = Level.WARN
+    manager.open()
+    try:
+        request = Payload("GO", 1.0, 1.0, -10.0, -20.0)
+        expected = link.model.transfer_time(request.packet_size + Payload("AK").packet_size) + link.model.turnaround_s
+        times = []
+        for i in range(args.count):
+            request.seq = i % Payload.SEQ_MODULUS
+            start = time.perf_counter()
+            manager.send_packet(request)
+            reply = manager.receive_packet(timeout_ms=1000)
+            times.append(time.perf_counter() - start)
+            if reply is None or reply.seq != request.seq:
+                raise RuntimeError('no reply to request {}: {}'.format(request.seq, reply))
+        return sorted(times), expected
+    finally:
+        manager.close()
+        link.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='round trips against the simulated slave')
+    parser.add_argument('--baudrate', type=int, default=1_000_000)
+    parser.add_argument('--turnaround-us', type=float, default=50.0, help="the slave's reply latency")
+    parser.add_argument('--byte-latency-us', type=float, default=0.0, help='any gap after each byte')
+    parser.add_argument('--count', type=int, default=1000)
+    args = parser.parse_args()
+    print('{} round trips at {} baud, {}µs turnaround:'.format(args.count, args.baudrate, args.turnaround_us))
+    for manager_class in (SyncUARTManager, AsyncUARTManager):
+        times, expected = measure(manager_class, args)
+        percentile = lambda p: times[min(len(times) - 1, int(p / 100 * len(times)))] * 1e6
+        print('  {:<17} link {:6.0f}µs   p50 {:6.0f}µs   p99 {:6.0f}µs   max {:6.0f}µs   {:5.0f} tx/s'.format(
+                manager_class.__name__, expected * 1e6, percentile(50), percentile(99), times[-1] * 1e6,
+                len(times) / sum(times)))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Measures the memory the MicroPython slave (upy/) allocates per transaction,
+# using tracemalloc, running its own code on CPython against the pyb shim
+# (sim/pyb_shim.py). A transaction is receiving a request, fed to the shim's
+# UART whole or in chunks as it would arrive, and sending the reply:
+#
+#     before   the previous UartSlaveBase, as ported here: a bytearray grown by
+#              concatenating each read() and consumed by slicing, a new reply
+#              Payload per request, and its to_bytes() written
+#     after    UartSlaveBase: readinto() a preallocated buffer, decoded in
+#              place, and a reused reply packed into a preallocated buffer
+#
+# Each is measured as is on CPython, and for the receive and transmit path
+# only, with stand-ins for what allocates on CPython but not on the board (a
+# bound classmethod, the CRC8's slicing, counters beyond 256) and for the
+# decoding of the request, a new Payload either way. Any allocation raises
+# the peak, so 0 bytes means none at all. Fed in chunks, a transaction also
+# awaits between them, which on CPython allocates a coroutine each time (as
+# uasyncio's sleep(0) doesn't).
+#
+# The replies are first checked against the master's decoder.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.slave_alloc_benchmark [--count N] [--chunk BYTES]
+#
+
+import sys
+import time
+import types
+import functools
+import argparse
+import tracemalloc
+
+from uart.payload import Payload as MasterPayload
+from sim import pyb_shim
+from uart.crc8_table import CRC8_TABLE
+from core.logger import Level
+
+pyb_shim.install()
+
+UartSlaveBase = pyb_shim.import_upy('uart_slave_base').UartSlaveBase
+Payload = pyb_shim.import_upy('payload').Payload
+
+class LegacySlave(UartSlaveBase):
+    '''
+    The receive and transmit path of UartSlaveBase before it read into a
+    preallocated buffer, without its logging and address filter.
+    '''
+    def __init__(self, *args, **kwargs):
+        UartSlaveBase.__init__(self, *args, **kwargs)
+        self._buffer = bytearray()
+
+    async def receive_packet(self):
+        while True:
+            if self._uart.any():
+                self._buffer += self._uart.read(self._uart.any())
+            else:
+                await pyb_shim.asyncio.sleep(0)
+                continue
+            if self._buffer.startswith(Payload.SYNC_HEADER):
+                if len(self._buffer) > Payload.TYPE_INDEX:
+                    try:
+                        packet_size = Payload.frame_length(self._buffer)
+                        if packet_size is not None and len(self._buffer) >= packet_size:
+                            _payload = Payload.from_bytes(self._buffer[:packet_size], self._rx_delta)
+                            self._buffer = self._buffer[packet_size:]
+                            self._led.on()
+                            return _payload
+                    except Exception:
+                        self._buffer = self._buffer[1:]
+                        continue
+                await pyb_shim.asyncio.sleep(0)
+                continue
+            idx = self._buffer.find(Payload.SYNC_HEADER)
+            if idx == -1:
+                if len(self._buffer) > len(Payload.SYNC_HEADER):
+                    self._buffer = self._buffer[-(len(Payload.SYNC_HEADER) - 1):]
+            else:
+                self._buffer = self._buffer[idx:]
+            await pyb_shim.asyncio.sleep(0)
+
+    async def send_packet(self, payload, seq=None):
+        if seq is not None:
+            payload.seq = seq
+        packet = payload.to_bytes()
+        if not packet.startswith(Payload.SYNC_HEADER):
+            packet = Payload.SYNC_HEADER + packet[len(Payload.SYNC_HEADER):]
+        self._uart.write(packet)
+        self._led.off()
+
+@types.coroutine
+def driver(box):
+    '''
+    Runs each coroutine sent to it, as far as its first await, putting its
+    result in box[0] once it completes. Sending None resumes one awaiting.
+    Unlike coro.send(), this returns a result without raising (so allocating)
+    a StopIteration, and it holds no reference to a coroutine or result once
+    done with it, whose freeing would otherwise hide allocations that follow.
+    '''
+    while True:
+        coro = yield
+        box[0] = yield from coro
+        coro = None
+
+class Runner:
+    '''
+    Runs transactions through a slave by driver(), its coroutines created
+    before each is measured.
+    '''
+    PENDING = object()
+
+    def __init__(self, slave, reply):
+        self.slave = slave
+        self.reply = reply # None for a new one per transaction
+        self.box = [ None ]
+        self.driver = driver(self.box)
+        self.driver.send(None)
+        self.coros = None
+
+    def prepare(self, request):
+        chunks, seq = request
+        # so the slave's counters stay below 256: CPython allocates larger ints, the board doesn't
+        self.slave.reset_stats()
+        reply = Payload("AK") if self.reply is None else self.reply
+        self.coros = (self.slave.receive_packet(), self.slave.send_packet(reply, seq=seq))
+
+    def __call__(self, request):
+        '''
+        Feeds the request's chunks one at a time, resuming the slave's receive
+        between them, then sends the reply.
+        '''
+        uart = self.slave._uart
+        receive, send = self.coros
+        self.coros = None
+        self.box[0] = Runner.PENDING
+        chunks = request[0]
+        uart.feed(chunks[0])
+        self.driver.send(receive)
+        i = 1
+        while i < len(chunks): # range() would allocate
+            uart.feed(chunks[i])
+            self.driver.send(None)
+            i += 1
+        if self.box[0] is Runner.PENDING:
+            raise RuntimeError('request not received.')
+        self.box[0] = None
+        self.driver.send(send)
+
+def check(slave, requests):
+    '''
+    Runs each request through the slave, checking its reply with the master's decoder.
+    '''
+    uart = slave._uart
+    uart.capture = True
+    runner = Runner(slave, None)
+    for request in requests:
+        runner.prepare(request)
+        runner(request)
+        reply = MasterPayload.from_bytes(uart.take_written())
+        if reply.seq != request[1] or reply.cmd != b'AK':
+            raise RuntimeError('bad reply to request {}: {}'.format(request[1], reply))
+    uart.capture = False
+
+def measure(runner, requests, count):
+    '''
+    Returns the mean peak bytes allocated per transaction, of count
+    transactions following a warmup, during which one-time allocations
+    (caches, interned objects, views) are made. Any allocation raises the
+    peak, so 0 means none at all.
+    '''
+    for i in range(100):
+        runner.prepare(requests[i % len(requests)])
+        runner(requests[i % len(requests)])
+    tracemalloc.start()
+    peak_total = 0
+    for i in range(count):
+        request = requests[i % len(requests)]
+        runner.prepare(request)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        runner(request)
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return peak_total / count
+
+def crc8_indexed(data, start=0, end=None, table=CRC8_TABLE):
+    '''
+    The CRC8 without slicing (so copying) data, as computed on the board by
+    the viper crc8(), and without a range(), which CPython allocates.
+    '''
+    crc = 0
+    i = start
+    end = len(data) if end is None else end
+    while i < end:
+        crc = table[crc ^ data[i]]
+        i += 1
+    return crc
+
+def stand_in(enable, decoded=None):
+    '''
+    Replaces (or if not enable, restores) what allocates on CPython but not on
+    the board, or on both but inevitably: the slave Payload's crc8() and its
+    classmethod frame_length(), which CPython binds to a new method object
+    on each call, and its decoder, which returns a new Payload either way,
+    by the decoded Payload.
+    '''
+    module = sys.modules[Payload.__module__]
+    if enable:
+        stand_in.saved = (module.crc8, Payload.__dict__['frame_length'], Payload.__dict__['unpack_from'])
+        module.crc8 = crc8_indexed
+        Payload.frame_length = functools.partial(Payload.frame_length.__func__, Payload)
+        Payload.unpack_from = lambda buf, offset=0, delta=None: decoded
+    else:
+        module.crc8, Payload.frame_length, Payload.unpack_from = stand_in.saved
+
+def main():
+    parser = argparse.ArgumentParser(description='slave allocations per transaction')
+    parser.add_argument('--count', type=int, default=20_000)
+    parser.add_argument('--chunk', type=int, default=0, help='feed each request in chunks of this many bytes (0 for whole)')
+    args = parser.parse_args()
+    requests = []
+    for seq in range(256):
+        frame = Payload("GO", float(seq), 20.0, -10.0, -20.0, seq=seq).to_bytes()
+        size = args.chunk or len(frame)
+        requests.append(([ frame[i:i + size] for i in range(0, len(frame), size) ], seq))
+    # CPython's ints beyond 256 are allocated, MicroPython's small ints aren't: so
+    # that the buffer's offsets and lengths are cached, it's made no larger
+    UartSlaveBase.RX_BUFFER_SIZE = 256
+    legacy = LegacySlave('legacy')
+    current = UartSlaveBase('slave')
+    for slave in (legacy, current):
+        slave._log.level = Level.ERROR
+        check(slave, requests)
+    # and likewise the clock's ticks, so it's stopped
+    time.ticks_ms = lambda: 0
+    decoded = Payload("GO", 0.0, 20.0, -10.0, -20.0)
+    print('{} transactions, requests fed {}, peak bytes allocated per transaction:'.format(args.count,
+            'in {}-byte chunks'.format(args.chunk) if args.chunk else 'whole'))
+    print('  {:<8} {:>10} {:>12}'.format('', 'CPython', 'path only'))
+    for label, slave, reply in (('before', legacy, None), ('after', current, Payload("AK"))):
+        on_cpython = measure(Runner(slave, reply), requests, args.count)
+        stand_in(True, decoded)
+        try:
+            path_only = measure(Runner(slave, reply), requests, args.count)
+        finally:
+            stand_in(False)
+        print('  {:<8} {:10.1f} {:12.1f}'.format(label, on_cpython, path_only))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Compares the slave's handling of bursts of requests (upy/uart_slave_base.py)
+# frame by frame, as its loop did before, against in batches, running its own
+# code on CPython against the pyb shim (sim/pyb_shim.py):
+#
+#     per frame   receive_packet(), dispatch, and send_packet(): a scheduler
+#                 round trip and a write per frame
+#     batched     run(): receive_packets() decodes every frame buffered in one
+#                 pass, and the batch's replies are written at once
+#
+# Each burst is fed to the shim's UART at once, as it would arrive over the
+# RX idle interrupt, and the next fed once all its replies have been written.
+# This reports the frames answered per second (the best of --repeat runs) and
+# the writes per burst, for each of the --write-us times a write takes: none,
+# as on the host, and 50µs, as a blocking write on a half-duplex line whose
+# transceiver turns the line around for each. A lone request is answered by
+# either way alike; batching gains little in CPU time, and mostly by writing
+# a burst's replies at once. CPython's figures are far from the board's: they
+# compare the two ways rather than predict the board's.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.slave_burst_benchmark [--bursts N] [--write-us US [US ...]] [--repeat N]
+#
+
+import time
+import asyncio
+import argparse
+
+from sim import pyb_shim
+from core.logger import Level
+
+pyb_shim.install()
+
+UartSlaveBase = pyb_shim.import_upy('uart_slave_base').UartSlaveBase
+Payload = pyb_shim.import_upy('payload').Payload
+
+async def per_frame(slave):
+    while True:
+        packet = await slave.receive_packet()
+        await slave.send_packet(await slave._dispatch(packet), seq=packet.seq)
+
+async def acknowledge(payload):
+    return None
+
+async def run(batched, burst, bursts, write_us):
+    '''
+    Returns (frames per second, writes per burst).
+    '''
+    slave = UartSlaveBase('slave', rx_irq=True)
+    slave._log.level = Level.WARN
+    slave.register('GO', acknowledge)
+    uart = slave._uart
+    uart.write_us = write_us
+    frames = [ b''.join(Payload("GO", float(i), 20.0, -10.0, -20.0, seq=(i + j) % 256).to_bytes() for j in range(burst))
+            for i in range(256) ]
+    expected = burst * len(Payload("AK").to_bytes())
+    state = { 'written': 0, 'writes': 0 }
+    done = asyncio.Event()
+    uart_write = uart.write
+    def counted_write(buf):
+        state['writes'] += 1
+        state['written'] += len(buf)
+        if state['written'] >= expected:
+            done.set()
+        return uart_write(buf)
+    uart.write = counted_write
+    server = asyncio.create_task(slave.run() if batched else per_frame(slave))
+    await asyncio.sleep(0.01)
+    state['writes'] = 0
+    start = time.perf_counter()
+    for i in range(bursts):
+        state['written'] = 0
+        done.clear()
+        uart.feed(frames[i % len(frames)])
+        await done.wait()
+    elapsed = time.perf_counter() - start
+    server.cancel()
+    return burst * bursts / elapsed, state['writes'] / bursts
+
+def main():
+    parser = argparse.ArgumentParser(description='slave burst handling, per frame against batched')
+    parser.add_argument('--bursts', type=int, default=2000)
+    parser.add_argument('--write-us', type=int, nargs='+', default=[0, 50], help='the time each write takes')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    for write_us in args.write_us:
+        print('{} bursts, {}µs per write; frames answered per second and writes per burst:'.format(args.bursts, write_us))
+        print('  {:>5} {:>20} {:>20}'.format('burst', 'per frame', 'batched'))
+        for burst in (1, 2, 4, 8, 16):
+            results = [ max(asyncio.run(run(batched, burst, args.bursts, write_us)) for _ in range(args.repeat))
+                    for batched in (False, True) ]
+            print('  {:>5} {}'.format(burst, ' '.join('{:12.0f} {:5.1f}w'.format(*result) for result in results)))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Shows the effect of the slave's GcPolicy (upy/gc_policy.py) on its reply
+# latency, running its own code on CPython against the pyb shim
+# (sim/pyb_shim.py), whose gc is a model of MicroPython's heap: each request's
+# handler allocates --alloc bytes of it, and a collection, automatic or not,
+# holds the CPU for --pause-us. The slave runs:
+#
+#     none        without a policy: MicroPython collects once the heap is full,
+#                 during whichever transaction's allocation fills it
+#     every       collecting after every reply (min_alloc=0)
+#     policy      collecting after a reply once --min-alloc bytes have been
+#                 allocated since the last collection, by default half the
+#                 threshold, as main.py's GcPolicy() does
+#
+# Requests arrive at random, on average every --interval-ms, on a schedule
+# fixed in advance, so whatever the slave is doing when one arrives, e.g.,
+# collecting after the last reply, it arrives regardless. Each reply's latency
+# is from its request's arrival to the reply being written, so a request that
+# arrives during a collection waits for it. (A request is fed once the loop
+# gets to it, so its latency is taken from then, plus the time a collection
+# under way when it was due then kept it waiting.) Then the policy's stats are
+# requested over the link with a GC command and its GS reply decoded by the
+# master's Payload.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.slave_gc_benchmark [--count N] [--interval-ms MS] [--alloc BYTES]
+#             [--pause-us US] [--min-alloc BYTES]
+#
+
+import time
+import bisect
+import random
+import asyncio
+import argparse
+
+from uart.payload import Payload as MasterPayload
+from uart.stats import Histogram
+from sim import pyb_shim
+from core.logger import Level
+
+pyb_shim.install()
+
+UartSlaveBase = pyb_shim.import_upy('uart_slave_base').UartSlaveBase
+GcPolicy = pyb_shim.import_upy('gc_policy').GcPolicy
+Payload = pyb_shim.import_upy('payload').Payload
+
+async def arrive(uart, frames, arrivals, fed):
+    '''
+    Feeds each frame at its arrival time (in perf_counter_ns), or as soon
+    after as the loop gets to it, appending the time it was fed to fed.
+    '''
+    for i, due in enumerate(arrivals):
+        wait_ns = due - time.perf_counter_ns()
+        if wait_ns > 0:
+            await asyncio.sleep(wait_ns / 1e9)
+        fed.append(time.perf_counter_ns())
+        uart.feed(frames[i % len(frames)])
+
+def held(collections, due, fed):
+    '''
+    Returns the time a request fed late was kept waiting by a collection
+    under way when it was due, from the (start, end) times of collections.
+    '''
+    i = bisect.bisect_right(collections, (due, float('inf'))) - 1
+    if i >= 0 and collections[i][1] > due:
+        return min(collections[i][1], fed) - due
+    return 0
+
+async def run(policy_args, frames, count, interval_s, alloc, seed=1):
+    '''
+    Returns (latency Histogram, automatic collections, the decoded GS reply or None).
+    '''
+    heap = pyb_shim.HEAP
+    heap.reset()
+    collections = [] # the (start, end) of each collection, automatic or not
+    heap_collect = heap._collect
+    def timed_collect():
+        start = time.perf_counter_ns()
+        heap_collect()
+        collections.append((start, time.perf_counter_ns()))
+    heap._collect = timed_collect
+    slave = UartSlaveBase('slave', rx_irq=True)
+    slave._log.level = Level.WARN
+    async def go(payload):
+        heap.allocate(alloc) # the transaction's garbage
+        return None
+    slave.register('GO', go)
+    if policy_args is not None:
+        policy = GcPolicy(**policy_args)
+        policy._log.level = Level.WARN
+        slave.set_gc_policy(policy)
+    uart = slave._uart
+    reply_size = len(Payload("AK").to_bytes())
+    answered = [] # the time each request's reply was written
+    uart_write = uart.write
+    def timed_write(buf):
+        now = time.perf_counter_ns()
+        for _ in range(len(buf) // reply_size):
+            answered.append(now)
+        return uart_write(buf)
+    uart.write = timed_write
+    server = asyncio.create_task(slave.run())
+    await asyncio.sleep(interval_s)
+    heap.collections = 0
+    rnd = random.Random(seed)
+    arrivals = []
+    due = time.perf_counter_ns()
+    for _ in range(count):
+        due += int(rnd.expovariate(1 / interval_s) * 1e9)
+        arrivals.append(due)
+    fed = []
+    await arrive(uart, frames, arrivals, fed)
+    await asyncio.sleep(max(interval_s, 0.01))
+    latency = Histogram()
+    for due, fed_ns, answered_ns in zip(arrivals, fed, answered):
+        latency.add(answered_ns - fed_ns + held(collections, due, fed_ns))
+    automatic = heap.collections
+    report = None
+    if policy_args is not None:
+        uart.write = uart_write
+        uart.capture = True
+        uart.feed(Payload("GC", seq=0).to_bytes())
+        await asyncio.sleep(max(interval_s, 0.01))
+        report = MasterPayload.from_bytes(uart.take_written())
+    server.cancel()
+    heap._collect = heap_collect
+    return latency, automatic, report
+
+def main():
+    parser = argparse.ArgumentParser(description='slave reply latency with and without a GC policy')
+    parser.add_argument('--count', type=int, default=2000, help='requests')
+    parser.add_argument('--interval-ms', type=float, default=5.0, help='between requests')
+    parser.add_argument('--alloc', type=int, default=200, help='bytes allocated per request')
+    parser.add_argument('--pause-us', type=int, default=2000, help='duration of a collection')
+    parser.add_argument('--min-alloc', type=int, default=None, help='of the policy, by default half its threshold')
+    args = parser.parse_args()
+    pyb_shim.HEAP.pause_us = args.pause_us
+    frames = [ Payload("GO", float(seq), 20.0, -10.0, -20.0, seq=seq).to_bytes() for seq in range(256) ]
+    print('{} requests, at random every {:g}ms on average, each allocating {} bytes; a collection takes {}µs:'.format(
+            args.count, args.interval_ms, args.alloc, args.pause_us))
+    for label, policy_args in (('none', None), ('every', { 'min_alloc': 0 }), ('policy', { 'min_alloc': args.min_alloc })):
+        latency, collections, report = asyncio.run(run(policy_args, frames, args.count, args.interval_ms / 1000, args.alloc))
+        print('  {:<10} latency p50 {:6.1f}µs  p99 {:6.1f}µs  max {:7.1f}µs   {:>3} collections mid-transaction'.format(label,
+                latency.percentile(50) / 1000, latency.percentile(99) / 1000, latency.max / 1000, collections))
+        if report is not None:
+            print('  {:<10} GS: {} collections after replies, avg {}µs, max {}µs; free heap {}-{} bytes'.format('',
+                    report['collections'], report['avg_us'], report['max_us'], report['free_low'], report['free_high']))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Compares the slave's two receive modes, polling the UART between yields to
+# the scheduler and sleeping until the UART's RX idle interrupt, running the
+# slave's own code (upy/) on CPython against the pyb shim (sim/pyb_shim.py),
+# whose UART calls its interrupt handler as each chunk is fed.
+#
+# Requests arrive at a fixed interval, fed by a task on the slave's event
+# loop, and each is answered. For each mode this reports the receive loop's
+# iterations (its calls to uart.any()) per request, the CPU time used as a
+# share of the run, and the reply latency: from a request's arrival to its
+# reply being written. CPython's event loop is far from the board's, so the
+# figures compare the two modes rather than predict the board's.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.slave_rx_benchmark [--count N] [--interval-ms MS]
+#
+
+import time
+import asyncio
+import argparse
+
+from uart.stats import Histogram
+from sim import pyb_shim
+from core.logger import Level
+
+pyb_shim.install()
+
+UartSlaveBase = pyb_shim.import_upy('uart_slave_base').UartSlaveBase
+Payload = pyb_shim.import_upy('payload').Payload
+
+async def serve(slave, reply):
+    while True:
+        request = await slave.receive_packet()
+        await slave.send_packet(reply, seq=request.seq)
+
+async def run(rx_irq, frames, count, interval_s):
+    '''
+    Returns (receive loop iterations, CPU seconds, elapsed seconds, latency Histogram).
+    '''
+    slave = UartSlaveBase('slave', rx_irq=rx_irq)
+    slave._log.level = Level.WARN
+    uart = slave._uart
+    state = { 'polls': 0, 'fed_ns': 0 }
+    latency = Histogram()
+    # count the slave's polls and time its replies through the shim's UART
+    uart_any, uart_write = uart.any, uart.write
+    def counted_any():
+        state['polls'] += 1
+        return uart_any()
+    def timed_write(buf):
+        latency.add(time.perf_counter_ns() - state['fed_ns'])
+        return uart_write(buf)
+    uart.any, uart.write = counted_any, timed_write
+    server = asyncio.create_task(serve(slave, Payload("AK")))
+    await asyncio.sleep(interval_s)
+    state['polls'] = 0
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    for i in range(count):
+        await asyncio.sleep(interval_s)
+        state['fed_ns'] = time.perf_counter_ns()
+        uart.feed(frames[i % len(frames)])
+    await asyncio.sleep(interval_s)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    server.cancel()
+    return state['polls'], cpu, elapsed, latency
+
+def main():
+    parser = argparse.ArgumentParser(description='slave receive: polling against the RX interrupt')
+    parser.add_argument('--count', type=int, default=500, help='requests')
+    parser.add_argument('--interval-ms', type=float, default=5.0, help='between requests')
+    args = parser.parse_args()
+    frames = [ Payload("GO", float(seq), 20.0, -10.0, -20.0, seq=seq).to_bytes() for seq in range(256) ]
+    print('{} requests, one every {:g}ms:'.format(args.count, args.interval_ms))
+    for label, rx_irq in (('polling', False), ('RX interrupt', True)):
+        polls, cpu, elapsed, latency = asyncio.run(run(rx_irq, frames, args.count, args.interval_ms / 1000))
+        if latency.count != args.count:
+            print('  {}: {} of {} requests answered'.format(label, latency.count, args.count))
+        print('  {:<13} {:10.1f} iterations/request   CPU {:5.1f}%   latency p50 {:6.1f}µs  p99 {:6.1f}µs'.format(label,
+                polls / args.count, 100.0 * cpu / elapsed, latency.percentile(50) / 1000, latency.percentile(99) / 1000))
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Verifies UARTMaster.slave_stats() end to end against the slave itself
+# (SimUartSlave, i.e., UartSlaveBase run through the pyb shim) over the
+# simulated link. After a known run of transactions, --count handled (GO)
+# and --unhandled (MO) requests, and one request whose CRC is corrupted on
+# the line, the counters decoded from the slave's SS reply must account for
+# each of them, and its GS reply must be decoded as the 'gc' dict. A lone ST
+# must be answered by a single SS frame, and ST and GC within an aggregate
+# in their places among its replies. Then reports the time a slave_stats()
+# round trip takes.
+#
+# Usage, from the project root:
+#
+#     python3 -m bench.slave_stats_benchmark [--count N] [--unhandled N] [--fetches N] [--baudrate BAUD]
+#
+
+import time
+import argparse
+
+from uart import schema
+from uart.payload import Payload, Aggregate
+from uart.uart_master import UARTMaster
+from sim.link import SimulatedLink
+from sim.uart_slave import SimUartSlave
+from core.logger import Level
+
+class CorruptNext:
+    '''
+    For a SimulatedLink's faults: flips the CRC of the next write, then
+    passes the rest through.
+    '''
+    def __init__(self):
+        self.pending = True
+
+    def __call__(self, data):
+        if not self.pending:
+            return data
+        self.pending = False
+        return data[:-1] + bytes((data[-1] ^ 0xFF,))
+
+def expect(name, value, expected):
+    if value != expected:
+        raise ValueError('{}: expected {}, got {}.'.format(name, expected, value))
+
+def verify(master, link, count, unhandled):
+    for i in range(count):
+        expect('reply to GO', master.send_receive_payload(Payload("GO", float(i), 1.0, -10.0, -20.0)).cmd, b'AK')
+    for i in range(unhandled):
+        expect('reply to MO', master.send_receive_payload(Payload("MO", float(i), 1.0, -10.0, -20.0)).cmd, b'AK')
+    # unanswered, as the slave discards it
+    link.faults = CorruptNext()
+    master.send_payload(Payload("GO", 0.0, 1.0, -10.0, -20.0))
+    time.sleep(0.05)
+    stats = master.slave_stats()
+    if stats is None:
+        raise ValueError('no reply to slave_stats().')
+    # the ST and GC aggregate is itself a frame received, but as yet neither handled nor answered
+    expect('frames', stats['frames'], count + unhandled + 1)
+    expect('replies', stats['replies'], count + unhandled)
+    expect('crc_failures', stats['crc_failures'], 1)
+    expect('resyncs', stats['resyncs'], 1)
+    expect('rx_timeouts', stats['rx_timeouts'], 0)
+    expect('handled', stats['handled'], count)
+    expect('handler_errors', stats['handler_errors'], 0)
+    expect('unhandled', stats['unhandled'], unhandled)
+    if not stats['rx_high_water'] >= Payload("GO", 0.0, 0.0, 0.0, 0.0).packet_size:
+        raise ValueError('rx_high_water: {} is less than a frame.'.format(stats['rx_high_water']))
+    if not stats['loops_per_s'] > 0:
+        raise ValueError('loops_per_s: {}.'.format(stats['loops_per_s']))
+    expect('gc fields', tuple(stats.get('gc', {})), schema.for_cmd(b'GS').fields)
+    print('  slave_stats(): {} frames, {} replies, {} handled, {} unhandled, {} CRC failure, {} resync; gc: {}'.format(
+            stats['frames'], stats['replies'], stats['handled'], stats['unhandled'], stats['crc_failures'],
+            stats['resyncs'], stats['gc']))
+    reply = master.send_receive_payload(Payload("ST"))
+    if isinstance(reply, Aggregate) or reply.cmd != b'SS':
+        raise ValueError('a lone ST was answered by {}.'.format(reply))
+    expect('frames, following the aggregate', reply['frames'], count + unhandled + 2)
+    replies = master.send_receive_many([ Payload("GO", 1.0, 1.0, -10.0, -20.0), Payload("ST"), Payload("GC"),
+            Payload("MO", 1.0, 1.0, -10.0, -20.0) ])
+    expect('replies to GO, ST, GC, MO', [ reply.cmd for reply in replies ], [ b'AK', b'SS', b'GS', b'AK' ])
+    print('verified: the counters account for every request; ST answered alone and within an aggregate.')
+
+def main():
+    parser = argparse.ArgumentParser(description='slave_stats() end to end against the slave')
+    parser.add_argument('--count', type=int, default=200, help='handled requests')
+    parser.add_argument('--unhandled', type=int, default=20, help='requests without a handler')
+    parser.add_argument('--fetches', type=int, default=200, help='slave_stats() calls timed')
+    parser.add_argument('--baudrate', type=int, default=1_000_000)
+    args = parser.parse_args()
+    link = SimulatedLink(baudrate=args.baudrate, turnaround_us=50)
+    slave = SimUartSlave(link.uart)
+    slave._log.level = Level.CRITICAL
+    slave.start()
+    master = UARTMaster(port=link.port, baudrate=args.baudrate)
+    master._log.level = Level.CRITICAL
+    master.uart._log.level = Level.CRITICAL
+    try:
+        verify(master, link, args.count, args.unhandled)
+        start = time.perf_counter()
+        for _ in range(args.fetches):
+            if master.slave_stats() is None:
+                raise ValueError('no reply to slave_stats().')
+        elapsed = time.perf_counter() - start
+        print('{} slave_stats() round trips at {} baud: {:.0f}µs each.'.format(args.fetches, args.baudrate,
+                elapsed / args.fetches * 1e6))
+    finally:
+        master.uart.close()
+        link.close()
+
+if __name__ == "__main__":
+    main()
+
+#EOF
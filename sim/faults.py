@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Fault injection for the simulated link, or for any stream of bytes: bit
+# flips, dropped bytes and inserted garbage bytes at a rate per byte, and
+# truncation at a rate per write (a frame, as both ends write a frame at a
+# time), cutting it short at a random point. A stray sync header may also be
+# inserted before a write at a rate per write, followed by the type byte of
+# one of the longest layouts, whose length a framer would wait for.
+#
+
+import random
+
+from uart import schema
+from uart.payload import Payload
+
+class FaultInjector:
+    '''
+    :param bit_flip:   the probability of flipping one bit of a byte
+    :param drop:       the probability of dropping a byte
+    :param insert:     the probability of inserting a random byte before a byte
+    :param truncate:   the probability of truncating a write
+    :param stray:      the probability of a stray sync header before a write
+    :param seed:       the random seed, for a reproducible run
+    '''
+    KINDS = ('bit_flip', 'drop', 'insert', 'truncate', 'stray')
+    # the types following a stray header: the longest layouts, and an aggregate
+    STRAY_TYPES = tuple(schema.for_cmd(cmd).type_id for cmd in (b'TM', b'SS', b'GS')) + (schema.AGGREGATE_TYPE,)
+
+    def __init__(self, bit_flip=0.0, drop=0.0, insert=0.0, truncate=0.0, stray=0.0, seed=None):
+        self._bit_flip = bit_flip
+        self._drop     = bit_flip + drop
+        self._insert   = bit_flip + drop + insert
+        self._truncate = truncate
+        self._stray    = stray
+        self._random   = random.Random(seed)
+        self._offset   = 0 # bytes output so far
+        self.counts    = dict.fromkeys(FaultInjector.KINDS, 0)
+        self.events    = [] # (offset in the output, kind) of each fault
+
+    def __call__(self, data):
+        '''
+        Returns the bytes as corrupted.
+        '''
+        rnd = self._random.random
+        if self._truncate and rnd() < self._truncate and len(data) > 1:
+            data = data[:self._random.randrange(1, len(data))]
+            self._record(self._offset + len(data), 'truncate')
+        if self._stray and rnd() < self._stray:
+            self._record(self._offset, 'stray')
+            # the header, a sequence number, the type and (for an aggregate) the length of its records
+            data = Payload.SYNC_HEADER + bytes((self._random.randrange(256), self._random.choice(FaultInjector.STRAY_TYPES),
+                    self._random.randrange(256))) + data
+        if not self._insert:
+            self._offset += len(data)
+            return data
+        out = bytearray()
+        for byte in data:
+            r = rnd()
+            if r < self._insert:
+                if r < self._bit_flip:
+                    self._record(self._offset + len(out), 'bit_flip')
+                    out.append(byte ^ (1 << self._random.randrange(8)))
+                elif r < self._drop:
+                    self._record(self._offset + len(out), 'drop')
+                else:
+                    self._record(self._offset + len(out), 'insert')
+                    out.append(self._random.randrange(256))
+                    out.append(byte)
+                continue
+            out.append(byte)
+        self._offset += len(out)
+        return bytes(out)
+
+    def _record(self, offset, kind):
+        self.counts[kind] += 1
+        self.events.append((offset, kind))
+
+    @property
+    def total(self):
+        '''
+        The number of faults injected.
+        '''
+        return len(self.events)
+
+#EOF
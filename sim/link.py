@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# A simulated serial link for running the master without hardware. The link
+# is a pty pair: the master opens its path (SimulatedLink.port) as it would
+# /dev/serial0, so SyncUARTManager and AsyncUARTManager run against it
+# unchanged, and the slave end is a SimUART with the same any(), read(),
+# readinto() and write() methods as a MicroPython UART.
+#
+# Bytes are delivered in each direction at the rate the LinkModel allows for
+# the baud rate and character format, one byte at a time becoming available
+# to the slave as it would be clocked into its UART. A reply is held for the
+# turnaround latency before its first byte goes on the line. As on the board,
+# the slave may be woken by an RX idle interrupt once the last byte of what
+# the master wrote has arrived.
+#
+# The master's writes complete at once, as the pty has no transmit FIFO to
+# drain, so only what it receives is paced.
+#
+# A FaultInjector (sim/faults.py) may be given for either direction to
+# corrupt the bytes on the line.
+#
+# With drops > 1 the link is a bus with several slave ends (link.uarts), as on
+# a multi-drop RS-485 line: each receives everything the master sends, and all
+# their writes share the one line back to the master.
+#
+
+import os
+import tty
+import time
+import threading
+from collections import deque
+
+class LinkModel:
+    '''
+    The timing of a serial line.
+
+    :param baudrate:           the baud rate
+    :param bits:               data bits per character
+    :param parity:             None, or the parity (any value) if a parity bit is sent
+    :param stop:               stop bits per character
+    :param byte_latency_us:    any additional gap after each byte, in microseconds
+    :param turnaround_us:      the delay between the slave writing a reply and its
+                               first byte going on the line, in microseconds
+    '''
+    def __init__(self, baudrate=115200, bits=8, parity=None, stop=1, byte_latency_us=0, turnaround_us=0):
+        self.baudrate = baudrate
+        # a start bit, the data bits, any parity bit and the stop bits
+        self.bits_per_byte = 1 + bits + (0 if parity is None else 1) + stop
+        self.byte_time_s   = self.bits_per_byte / baudrate + byte_latency_us / 1e6
+        self.turnaround_s  = turnaround_us / 1e6
+
+    def transfer_time(self, count):
+        '''
+        Returns the time in seconds to send count bytes.
+        '''
+        return count * self.byte_time_s
+
+class SimUART:
+    '''
+    The slave end of a SimulatedLink, with the methods of a MicroPython UART
+    that UartSlaveBase uses.
+    '''
+    IRQ_RXIDLE = 0x10
+
+    def __init__(self, link):
+        self._link = link
+        self._model = link.model
+        self._lock = threading.Condition()
+        self._rx_chunks = deque() # [time the first byte arrives, bytes, bytes consumed]
+        self._rx_line_free = 0.0  # when the last byte received so far has arrived
+        self._tx_chunks = deque() # [time the first byte is on the line, bytes, bytes sent]
+        self._tx_line_free = 0.0
+        self._irq_handler = None
+        self._irq_thread  = None
+        self._idle_due = None     # when the last byte received so far arrives, until the handler is called
+
+    @property
+    def closed(self):
+        return self._link.closed
+
+    def _received(self, data):
+        # called by the link for bytes written by the master
+        with self._lock:
+            start = max(time.monotonic(), self._rx_line_free) + self._model.byte_time_s
+            self._rx_chunks.append([start, data, 0])
+            self._rx_line_free = start + self._model.transfer_time(len(data) - 1)
+            self._idle_due = self._rx_line_free
+            self._lock.notify_all()
+
+    def irq(self, handler=None, trigger=0, hard=False):
+        '''
+        Call handler with the SimUART once the bytes received have arrived and
+        the line has gone quiet, as on the RX idle interrupt, if the trigger
+        is IRQ_RXIDLE. It's called from a thread of the SimUART's own.
+        '''
+        with self._lock:
+            self._irq_handler = handler if trigger & SimUART.IRQ_RXIDLE else None
+            if self._irq_handler is not None and self._irq_thread is None:
+                self._irq_thread = threading.Thread(target=self._idle, daemon=True)
+                self._irq_thread.start()
+
+    def _idle(self):
+        # calls the RX idle handler as each burst finishes arriving
+        with self._lock:
+            while not self._link.closed:
+                now = time.monotonic()
+                if self._idle_due is None or now < self._idle_due:
+                    self._lock.wait(None if self._idle_due is None else self._idle_due - now)
+                    continue
+                self._idle_due = None
+                if self._irq_handler is not None:
+                    self._irq_handler(self)
+
+    def _arrived(self, now):
+        # returns the number of bytes that have arrived by now
+        count = 0
+        for start, data, consumed in self._rx_chunks:
+            if now < start:
+                break
+            count += min(len(data), int((now - start) / self._model.byte_time_s) + 1) - consumed
+        return count
+
+    def any(self):
+        '''
+        Returns the number of bytes available to read.
+        '''
+        with self._lock:
+            return self._arrived(time.monotonic())
+
+    def readinto(self, buf, nbytes=None):
+        '''
+        Read the bytes available into buf, up to nbytes if provided, returning
+        the number read, or None if none were available.
+        '''
+        view = memoryview(buf)
+        if nbytes is not None and nbytes < len(view):
+            view = view[:nbytes]
+        count = 0
+        with self._lock:
+            now = time.monotonic()
+            while self._rx_chunks and count < len(view):
+                chunk = self._rx_chunks[0]
+                start, data, consumed = chunk
+                if now < start:
+                    break
+                available = min(len(data), int((now - start) / self._model.byte_time_s) + 1)
+                take = min(available - consumed, len(view) - count)
+                view[count:count + take] = data[consumed:consumed + take]
+                count += take
+                chunk[2] += take
+                if chunk[2] < len(data):
+                    break
+                self._rx_chunks.popleft()
+        return count or None
+
+    def read(self, nbytes=None):
+        '''
+        Read up to nbytes available (all available if None), returning None if
+        none were available.
+        '''
+        buf = bytearray(self.any() if nbytes is None else nbytes)
+        count = self.readinto(buf)
+        return None if count is None else bytes(buf[:count])
+
+    def write(self, buf):
+        '''
+        Queue bytes for the master, sent after the turnaround latency at the
+        link's byte rate. Returns the number of bytes queued.
+        '''
+        if self is not self._link.uart:
+            # another drop on the bus: the line back to the master is shared
+            return self._link.uart.write(buf)
+        data = bytes(buf)
+        count = len(data)
+        if self._link.reply_faults is not None:
+            data = self._link.reply_faults(data)
+            if not data:
+                return count
+        with self._lock:
+            start = max(time.monotonic() + self._model.turnaround_s, self._tx_line_free) + self._model.byte_time_s
+            self._tx_chunks.append([start, data, 0])
+            self._tx_line_free = start + self._model.transfer_time(len(data) - 1)
+            self._lock.notify_all()
+        return count
+
+class SimulatedLink:
+    '''
+    A pty pair between a master, which opens port, and a SimUART, paced by
+    a LinkModel. Call close() when done.
+
+    :param model:         the LinkModel, or None to construct one from the keyword arguments
+    :param faults:        an optional FaultInjector for bytes from the master to the slave
+    :param reply_faults:  an optional FaultInjector for bytes from the slave to the master
+    :param drops:         the number of slave ends, each a SimUART in uarts
+    :param kwargs:        LinkModel arguments, e.g., baudrate=1_000_000, turnaround_us=50
+    '''
+    def __init__(self, model=None, faults=None, reply_faults=None, drops=1, **kwargs):
+        self.model = LinkModel(**kwargs) if model is None else model
+        self.faults = faults
+        self.reply_faults = reply_faults
+        self.closed = False
+        self._fd, self._port_fd = os.openpty()
+        tty.setraw(self._port_fd)
+        self.port = os.ttyname(self._port_fd)
+        self.uarts = [ SimUART(self) for _ in range(drops) ]
+        self.uart = self.uarts[0]
+        self._threads = [ threading.Thread(target=self._receive, daemon=True),
+                          threading.Thread(target=self._transmit, daemon=True) ]
+        for thread in self._threads:
+            thread.start()
+
+    def _receive(self):
+        # from the master to the SimUART
+        while not self.closed:
+            try:
+                data = os.read(self._fd, 4096)
+            except OSError:
+                break
+            if not data:
+                break
+            if self.faults is not None:
+                data = self.faults(data)
+                if not data:
+                    continue
+            for uart in self.uarts:
+                uart._received(data)
+
+    def _transmit(self):
+        # from the SimUART to the master, as each byte is due
+        uart = self.uart
+        byte_time_s = self.model.byte_time_s
+        while not self.closed:
+            with uart._lock:
+                if not uart._tx_chunks:
+                    uart._lock.wait()
+                    continue
+                chunk = uart._tx_chunks[0]
+                start, data, sent = chunk
+                now = time.monotonic()
+                due = min(len(data), int((now - start) / byte_time_s) + 1) if now >= start else 0
+                if due <= sent:
+                    uart._lock.wait(start + sent * byte_time_s - now)
+                    continue
+                chunk[2] = due
+                if due == len(data):
+                    uart._tx_chunks.popleft()
+            # written outside the lock, as this blocks if the master isn't reading
+            try:
+                os.write(self._fd, data[sent:due])
+            except OSError:
+                break
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for uart in self.uarts:
+            with uart._lock:
+                uart._lock.notify_all()
+        os.close(self._port_fd)
+        os.close(self._fd)
+
+#EOF
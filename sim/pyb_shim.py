@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# A CPython stand-in for the MicroPython modules used by the slave (upy/), so
+# that its code can be run and measured on the host: pyb (UART, LED, Pin),
+# machine (UART, Pin), uasyncio (asyncio, with uasyncio's ThreadSafeFlag and
+# its _ms functions) and the ticks functions of time. install() registers
+# them, after which the slave's modules can be imported by import_upy(), which
+# gives them gc (MicroPython's functions, over a model of its heap).
+#
+# The UART is fed its received bytes by the caller, in chunks as they would
+# arrive, and discards the bytes written to it unless asked to keep them. Each
+# write may hold the CPU for write_us, as a blocking write does on a
+# half-duplex line while the transceiver turns the line around. It copies a
+# chunk read whole without slicing it, so that when all that's available is
+# read (as the slave does) it allocates nothing itself, and a measure of the
+# slave's allocations isn't clouded by its own.
+#
+# CPython's allocations can't stand for the board's, so the gc module's heap
+# (HEAP) is a model: the code under test reports what it would allocate by
+# HEAP.allocate(), which collects as MicroPython would, once the heap is full
+# or past the threshold, and a collection holds the CPU for its pause.
+#
+
+import os
+import sys
+import time
+import asyncio
+import importlib
+import gc as cpython_gc
+from types import ModuleType
+
+UPY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'upy')
+
+class UART:
+    '''
+    A pyb.UART or machine.UART whose received bytes are fed by feed(). An
+    RX idle interrupt handler is called by feed(), as once the line has gone
+    quiet after the chunk.
+
+    :param capture:   if True the bytes written are kept, as returned by take_written()
+    :param write_us:  the time each write holds the CPU, in microseconds
+    '''
+    IRQ_RXIDLE = 0x10
+
+    def __init__(self, uart_id, baudrate=115200, capture=False, write_us=0, **kwargs):
+        self.uart_id = uart_id
+        self.baudrate = baudrate
+        self.capture = capture
+        self.write_us = write_us
+        self._chunks = [] # received, the first _count of them in use
+        self._count = 0
+        self._index = 0   # the next chunk to read
+        self._offset = 0  # the bytes of it already read
+        self._available = 0
+        self._tx = bytearray()
+        self._irq_handler = None
+
+    def init(self, baudrate=115200, **kwargs):
+        self.baudrate = baudrate
+
+    def irq(self, handler=None, trigger=0, hard=False):
+        self._irq_handler = handler if trigger & UART.IRQ_RXIDLE else None
+
+    def feed(self, chunk):
+        '''
+        Receive the bytes-like chunk, as though it had arrived at once.
+        '''
+        if self._index == self._count:
+            # all read: reuse the list's slots
+            self._count = self._index = 0
+        if self._count < len(self._chunks):
+            self._chunks[self._count] = chunk
+        else:
+            self._chunks.append(chunk)
+        self._count += 1
+        self._available += len(chunk)
+        if self._irq_handler is not None:
+            self._irq_handler(self)
+
+    def any(self):
+        return self._available
+
+    def readinto(self, buf, nbytes=None):
+        '''
+        Copies whole chunks into buf while they fit, only then a part of one.
+        Returns the number of bytes read, or None if there were none. (min()
+        is avoided as on CPython it allocates a tuple of its arguments.)
+        '''
+        limit = len(buf)
+        if nbytes is not None and nbytes < limit:
+            limit = nbytes
+        count = 0
+        while self._index < self._count and count < limit:
+            chunk = self._chunks[self._index]
+            size = len(chunk) - self._offset
+            if self._offset == 0 and size <= limit - count:
+                buf[count:count + size] = chunk
+                self._index += 1
+            else:
+                if size > limit - count:
+                    size = limit - count
+                buf[count:count + size] = chunk[self._offset:self._offset + size]
+                self._offset += size
+                if self._offset == len(chunk):
+                    self._index += 1
+                    self._offset = 0
+            count += size
+        self._available -= count
+        return count or None
+
+    def read(self, nbytes=None):
+        buf = bytearray(self._available if nbytes is None else min(nbytes, self._available))
+        count = self.readinto(buf)
+        return bytes(buf) if count else None
+
+    def write(self, buf):
+        if self.write_us:
+            end = time.perf_counter() + self.write_us / 1e6
+            while time.perf_counter() < end:
+                pass
+        if self.capture:
+            self._tx += buf
+        return len(buf)
+
+    def take_written(self):
+        '''
+        Returns the bytes written since last called, if capturing.
+        '''
+        written = bytes(self._tx)
+        self._tx.clear()
+        return written
+
+class LED:
+    def __init__(self, led_id):
+        self.led_id = led_id
+        self.lit = False
+
+    def on(self):
+        self.lit = True
+
+    def off(self):
+        self.lit = False
+
+class Pin:
+    IN  = 0
+    OUT = 1
+
+    def __init__(self, pin_id, mode=IN):
+        self.pin_id = pin_id
+        self.mode = mode
+        self.level = 0
+
+    def on(self):
+        self.level = 1
+
+    def off(self):
+        self.level = 0
+
+    def value(self, level=None):
+        if level is None:
+            return self.level
+        self.level = level
+
+class ThreadSafeFlag:
+    '''
+    uasyncio's ThreadSafeFlag, which may be set from another thread.
+    '''
+    def __init__(self):
+        self._event = asyncio.Event()
+        self._loop = None
+
+    def set(self):
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    def clear(self):
+        self._event.clear()
+
+    async def wait(self):
+        self._loop = asyncio.get_running_loop()
+        await self._event.wait()
+        self._event.clear()
+
+class Heap:
+    '''
+    A model of MicroPython's heap and its garbage collector.
+
+    :param size:      the heap size in bytes
+    :param live:      the bytes still in use after a collection
+    :param pause_us:  the duration of a collection, for which the CPU is held
+    '''
+    def __init__(self, size=100_000, live=20_000, pause_us=2000):
+        self.size = size
+        self.live = live
+        self.pause_us = pause_us
+        self.reset()
+
+    def reset(self):
+        self.allocated = self.live
+        self.since_collect = 0
+        self.limit = -1 # the threshold, -1 if none
+        self.enabled = True
+        self.collections = 0 # automatic ones
+        self.collected = 0   # by collect()
+
+    def allocate(self, nbytes):
+        '''
+        Allocate nbytes, first collecting as MicroPython would, if enabled and
+        the heap would be full or past the threshold.
+        '''
+        if self.enabled and (self.allocated + nbytes > self.size
+                or (self.limit >= 0 and self.since_collect + nbytes > self.limit)):
+            self._collect()
+            self.collections += 1
+        self.allocated += nbytes
+        self.since_collect += nbytes
+
+    def _collect(self):
+        end = time.perf_counter() + self.pause_us / 1e6
+        while time.perf_counter() < end:
+            pass
+        self.allocated = self.live
+        self.since_collect = 0
+
+    # MicroPython's gc functions
+
+    def collect(self):
+        self._collect()
+        self.collected += 1
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def isenabled(self):
+        return self.enabled
+
+    def mem_free(self):
+        return self.size - self.allocated
+
+    def mem_alloc(self):
+        return self.allocated
+
+    def threshold(self, amount=None):
+        if amount is None:
+            return self.limit
+        self.limit = amount
+
+HEAP = Heap()
+
+# MicroPython's gc, as imported by the slave's modules (see import_upy())
+MPY_GC = ModuleType('gc')
+for _name in ('collect', 'enable', 'disable', 'isenabled', 'mem_free', 'mem_alloc', 'threshold'):
+    setattr(MPY_GC, _name, getattr(HEAP, _name))
+
+async def sleep_ms(t):
+    await asyncio.sleep(t / 1000)
+
+async def wait_for_ms(aw, timeout):
+    return await asyncio.wait_for(aw, timeout / 1000)
+
+def install():
+    '''
+    Register the stand-in modules and add MicroPython's ticks functions to time.
+    '''
+    for name in ('pyb', 'machine'):
+        module = ModuleType(name)
+        module.UART = UART
+        module.Pin  = Pin
+        sys.modules[name] = module
+    sys.modules['pyb'].LED = LED
+    uasyncio = ModuleType('uasyncio')
+    for name in asyncio.__all__:
+        setattr(uasyncio, name, getattr(asyncio, name))
+    uasyncio.ThreadSafeFlag = ThreadSafeFlag
+    uasyncio.sleep_ms       = sleep_ms
+    uasyncio.wait_for_ms    = wait_for_ms
+    sys.modules['uasyncio'] = uasyncio
+    time.ticks_ms   = lambda: time.monotonic_ns() // 1_000_000
+    time.ticks_us   = lambda: time.monotonic_ns() // 1_000
+    time.ticks_diff = lambda a, b: a - b
+
+def import_upy(name):
+    '''
+    Imports a module of upy/, and the slave's own modules it imports, which
+    import MicroPython's gc rather than CPython's.
+    '''
+    sys.path.insert(0, UPY)
+    sys.modules['gc'] = MPY_GC
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.modules['gc'] = cpython_gc
+        sys.path.remove(UPY)
+
+#EOF
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# The MicroPython slave itself, UartSlaveBase (upy/uart_slave_base.py) with
+# the handlers and GC policy of upy/main.py, run on CPython through the pyb
+# shim (sim/pyb_shim.py) on the far end of a SimulatedLink. SimUartSlave is
+# its port to the link's SimUART, as Stm32UartSlave is to the STM32's UART,
+# sleeping until the SimUART's RX idle interrupt as main.py does on the
+# board, and runs the slave's loop on a thread with an event loop of its own.
+#
+# Usage:
+#
+#     link = SimulatedLink(baudrate=1_000_000, turnaround_us=50)
+#     slave = SimUartSlave(link.uart)
+#     slave.start()
+#     master = UARTMaster(port=link.port, baudrate=1_000_000)
+#
+# or in its own process, which prints the port for the master to open then
+# serves until its standard input is closed:
+#
+#     python3 -m sim.uart_slave [--baudrate BAUD] [--turnaround-us US] [--byte-latency-us US] [--addresses 1,2,3]
+#
+# With --addresses the link is a bus with an addressed slave on each drop.
+#
+
+import sys
+import asyncio
+import argparse
+import threading
+import subprocess
+
+# the host's logger, imported before the slave's modules so that they log
+# through it to stderr, leaving spawn()'s child process's stdout to the port
+import core.logger
+from sim import pyb_shim
+from sim.link import SimulatedLink
+
+pyb_shim.install()
+
+UartSlaveBase = pyb_shim.import_upy('uart_slave_base').UartSlaveBase
+GcPolicy = pyb_shim.import_upy('gc_policy').GcPolicy
+upy_main = pyb_shim.import_upy('main')
+
+class SimUartSlave(UartSlaveBase):
+    '''
+    :param uart:      the SimUART of a SimulatedLink
+    :param name:      the name of the logger
+    :param address:   if provided, the slave's address on a bus: other frames are ignored
+    :param rx_irq:    if True, as in upy/main.py, sleep until the RX idle interrupt rather than polling
+    '''
+    def __init__(self, uart, name='sim-uart-slave', address=None, rx_irq=True):
+        UartSlaveBase.__init__(self, name, baudrate=uart._model.baudrate, address=address, rx_irq=rx_irq)
+        self._uart = uart
+        self._thread = None
+        # as upy/main.py
+        self.register('GO', upy_main.go)
+        self.set_gc_policy(GcPolicy())
+
+    def serve(self):
+        '''
+        Run the slave's loop, run(), on an event loop of its own.
+        '''
+        asyncio.run(self.run())
+
+    def start(self):
+        '''
+        Run serve() on a daemon thread.
+        '''
+        self._thread = threading.Thread(target=self.serve, name=self._log.name, daemon=True)
+        self._thread.start()
+
+def spawn(baudrate, turnaround_us=50.0, byte_latency_us=0.0, addresses=None):
+    '''
+    Starts a simulated slave in a child process, so that its CPU time and the
+    GIL aren't shared with the master, returning the process and the port to
+    open. Closing the process's stdin stops it. If a list of addresses is
+    provided, the port is a bus with an addressed slave for each.
+    '''
+    command = [ sys.executable, '-m', 'sim.uart_slave', '--baudrate', str(baudrate),
+            '--turnaround-us', str(turnaround_us), '--byte-latency-us', str(byte_latency_us) ]
+    if addresses:
+        command += [ '--addresses', ','.join(str(address) for address in addresses) ]
+    child = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return child, child.stdout.readline().strip()
+
+def main():
+    parser = argparse.ArgumentParser(description='simulated UART slave')
+    parser.add_argument('--baudrate', type=int, default=115200)
+    parser.add_argument('--turnaround-us', type=float, default=50.0, help="the slave's reply latency")
+    parser.add_argument('--byte-latency-us', type=float, default=0.0, help='any gap after each byte')
+    parser.add_argument('--addresses', help='addressed slaves sharing the link as a bus, e.g., 1,2,3')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    addresses = [ int(address) for address in args.addresses.split(',') ] if args.addresses else [ None ]
+    link = SimulatedLink(baudrate=args.baudrate, turnaround_us=args.turnaround_us, byte_latency_us=args.byte_latency_us,
+            drops=len(addresses))
+    for uart, address in zip(link.uarts, addresses):
+        slave = SimUartSlave(uart, address=address, name='sim-uart-slave' if address is None else 'sim-slave-{}'.format(address))
+        slave.set_verbose(args.verbose)
+        slave.start()
+    print(link.port, flush=True)
+    try:
+        sys.stdin.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        link.close()
+
+if __name__ == "__main__":
+    main()
+
+#EOF
@@ -7,21 +7,39 @@
 #
 # author:   Murray Altheim
 # created:  2025-06-12
-# modified: 2025-06-12
+# modified: 2026-10-17
+#
+# An asyncio UART manager. The serial port's file descriptor is registered
+# directly with the caller's event loop (add_reader/add_writer) and frames are
+# parsed as bytes arrive, so the awaitable send() and receive() methods involve
+# no threads and no polling. The blocking send_packet() and receive_packet()
+# wrappers used by UARTMaster run those same coroutines on a background loop.
+#
 
+import io
+import os
 import asyncio
 import time
+from time import perf_counter_ns
 import serial
 from threading import Thread
-from concurrent.futures import ThreadPoolExecutor
 from colorama import init, Fore, Style
 init()
 
-from uart.payload import Payload
+from uart.payload import Aggregate
+from uart.rx_buffer import RxBuffer
 from core.logger import Logger, Level
 
 class AsyncUARTManager:
-    def __init__(self, port='/dev/serial0', baudrate=115200, tx_timeout_ms=25, rx_timeout_ms=25):
+    def __init__(self, port='/dev/serial0', baudrate=115200, tx_timeout_ms=25, rx_timeout_ms=25, tx_delta=None, stats=None):
+        '''
+        :param port:           the serial port
+        :param baudrate:       the baud rate
+        :param tx_timeout_ms:  how long a write may wait for the port to become writable
+        :param rx_timeout_ms:  how long a partial packet may wait for the rest of its bytes
+        :param tx_delta:       an optional DeltaState, to send Payloads as delta frames
+        :param stats:          an optional Stats, to time each phase of a transaction
+        '''
         self._log = Logger('async-uart-mgr', Level.INFO)
         self._port_name  = port
         self._baudrate   = baudrate
@@ -29,117 +47,186 @@ class AsyncUARTManager:
         self._rx_timeout_s = rx_timeout_ms / 1000
         self._log.info('TX timeout: {}ms; RX timeout: {}ms'.format(tx_timeout_ms, rx_timeout_ms))
         self._serial     = None
+        self._fd         = None
+        self._rx_file    = None
+        self._tx_delta   = tx_delta
+        self._stats      = stats
+        self._sent_ns    = None # when the last send completed, if instrumented
         self._log.info('using port {} at {} baud.'.format(port, baudrate))
-        self._executor   = ThreadPoolExecutor(max_workers=1)
-        # dedicated asyncio loop and thread
-        self._loop = asyncio.new_event_loop()
-        self._loop_thread = Thread(target=self._loop.run_forever, daemon=True)
-        self._loop_thread.start()
-        self._log.info('ready.')
+        # background loop and thread, created only if the blocking wrappers are used
+        self._loop = None
+        self._loop_thread = None
         # Buffer for sync-header-based framing
-        self._rx_buffer  = bytearray()
+        self._rx_buffer  = RxBuffer(log=self._log, stats=stats)
+        self._last_rx    = time.monotonic()
+        self._receiving  = False # a receive() is waiting on the port
+        # Payloads and Aggregates are encoded into this one reused transmit buffer
+        self._tx_buffer  = bytearray(Aggregate.MAX_PACKET_SIZE)
+        self._tx_view    = memoryview(self._tx_buffer)
         self._log.info('ready.')
 
     def open(self):
         if self._serial is None or not self._serial.is_open:
-            self._serial = serial.Serial(self._port_name, self._baudrate, timeout=self._tx_timeout_s)
+            # non-blocking: all waiting is done by the event loop
+            self._serial = serial.Serial(self._port_name, self._baudrate, timeout=0)
+            self._fd = self._serial.fileno()
+            self._rx_file = io.FileIO(self._fd, 'rb', closefd=False)
             self._log.info("serial port {} opened.".format(self._port_name))
-            
+
     def close(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+            self._loop_thread = None
         if self._serial and self._serial.is_open:
             self._serial.close()
             self._log.info("serial port closed.")
-        self._executor.shutdown(wait=False)
-        self._loop.call_soon_threadsafe(self._loop.stop)
-        self._loop_thread.join()
-        
-    def _send_packet_sync(self, payload):
-        packet_bytes = payload.to_bytes()
-        # ensure sync header is present for robust protocol
-        if not packet_bytes.startswith(Payload.SYNC_HEADER):
-            packet_bytes = Payload.SYNC_HEADER + packet_bytes[len(Payload.SYNC_HEADER):]
-        self._serial.write(packet_bytes)
-        self._serial.flush()
+        self._fd = None
+        self._rx_file = None
+
+    # ┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈
+    async def send(self, payload):
+        '''
+        Write the Payload to the serial port from the caller's event loop,
+        waiting on writability rather than blocking if the kernel buffer is full,
+        then until the bytes have been transmitted, as the synchronous manager
+        does. The drain blocks, so it runs in the loop's default executor.
+        '''
+        stats = self._stats
+        if stats is not None:
+            start_ns = perf_counter_ns()
+        count = payload.pack_into(self._tx_buffer, 0, self._tx_delta)
+        if stats is not None:
+            encoded_ns = perf_counter_ns()
+            stats.record('encode', encoded_ns - start_ns)
+        view = self._tx_view if count == len(self._tx_buffer) else self._tx_view[:count]
+        try:
+            view = view[os.write(self._fd, view):]
+        except BlockingIOError:
+            pass
+        if view:
+            # keep the remainder, as the transmit buffer may be reused while we wait
+            view = memoryview(bytes(view))
+            while view:
+                await self._wait_writable()
+                try:
+                    view = view[os.write(self._fd, view):]
+                except BlockingIOError:
+                    pass
+        if stats is not None:
+            written_ns = perf_counter_ns()
+            stats.record('write', written_ns - encoded_ns)
+        await asyncio.get_running_loop().run_in_executor(None, self._serial.flush)
+        if stats is not None:
+            self._sent_ns = perf_counter_ns()
+            stats.record('flush', self._sent_ns - written_ns)
 #       self._log.info(Style.DIM + "sent: {}".format(repr(payload)))
 
-    def send_packet(self, payload):
+    async def _wait_writable(self):
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        loop.add_writer(self._fd, lambda: waiter.done() or waiter.set_result(None))
+        try:
+            await asyncio.wait_for(waiter, self._tx_timeout_s)
+        except asyncio.TimeoutError:
+            raise TimeoutError('UART TX timeout.')
+        finally:
+            loop.remove_writer(self._fd)
+
+    async def receive(self, timeout_ms=None):
         '''
-        Synchronous wrapper: schedule async send on background loop.
+        Wait on the caller's event loop for the first valid Payload. If timeout_ms
+        is provided this returns None if no valid Payload arrives in time,
+        otherwise it waits indefinitely.
+
+        Only one receive() may wait at a time, as the port has one reader
+        callback: a second raises a RuntimeError rather than displacing the
+        first (as asyncio's StreamReader does). Callers sharing the manager
+        must serialise their transactions, as UARTMaster does.
         '''
-        self._log.debug('send payload.')
-        future = asyncio.run_coroutine_threadsafe(
-            self._send_packet_async(payload), self._loop)
-        return future.result() # wait for completion
-        
-    async def _send_packet_async(self, payload):
+        payload = self._rx_buffer.next_frame()
+        if payload is not None:
+            return payload
+        if self._receiving:
+            raise RuntimeError('receive() called while another is already waiting on the port.')
+        # a partial frame may have gone stale while nothing was waiting for it
+        self._expire_partial_frame()
         loop = asyncio.get_running_loop()
-        await loop.run_in_executor(self._executor, self._send_packet_sync, payload)
-        
-    def _receive_packet_sync(self):
+        waiter = loop.create_future()
+
+        def _on_readable():
+            self._expire_partial_frame()
+            try:
+                count = self._rx_buffer.readinto(self._rx_file)
+            except OSError as e:
+                if not waiter.done():
+                    waiter.set_exception(e)
+                return
+            if not count:
+                return
+            if self._sent_ns is not None:
+                self._stats.record('first_byte', perf_counter_ns() - self._sent_ns)
+                self._sent_ns = None
+            self._last_rx = time.monotonic()
+            self._log.debug('read {} bytes from serial; buffer size now: {}'.format(count, len(self._rx_buffer)))
+            if not waiter.done():
+                payload = self._rx_buffer.next_frame()
+                if payload is not None:
+                    waiter.set_result(payload)
+
+        self._receiving = True
+        loop.add_reader(self._fd, _on_readable)
+        try:
+            if timeout_ms is None:
+                return await waiter
+            return await asyncio.wait_for(waiter, timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            if self._stats is not None:
+                self._stats.count('timeouts')
+            return None
+        finally:
+            loop.remove_reader(self._fd)
+            self._receiving = False
+
+    def _expire_partial_frame(self):
+        if len(self._rx_buffer) and time.monotonic() - self._last_rx > self._rx_timeout_s:
+            # a partial frame went stale before the rest of it arrived
+            self._log.error('UART RX timeout; incomplete packet, clearing buffer.')
+            if self._stats is not None:
+                self._stats.count('rx_timeouts')
+            self._rx_buffer.clear()
+
+    # blocking wrappers ┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈
+    def _run(self, coro):
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = Thread(target=self._loop.run_forever, daemon=True)
+            self._loop_thread.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def send_packet(self, payload):
         '''
-        Reads bytes, synchronizes on sync header, and returns the first valid Payload found.
+        Synchronous wrapper: run send() on the background loop.
         '''
-        start_time = time.time()
-        while True:
-            if self._serial.in_waiting:
-                data = self._serial.read(self._serial.in_waiting)
-#               self._log.debug(f"RAW RX BYTES: {data.hex()}")
-                self._rx_buffer += data
-                self._log.debug('read {} bytes from serial; buffer size now: {}'.format(len(data), len(self._rx_buffer)))
-                start_time = time.time()
-            idx = self._rx_buffer.find(Payload.SYNC_HEADER)
-            if idx == -1:
-                # not found: trim buffer if too large
-                if len(self._rx_buffer) > len(Payload.SYNC_HEADER):
-                    self._rx_buffer = self._rx_buffer[-(len(Payload.SYNC_HEADER)-1):]
-                time.sleep(0.005)
-                if time.time() - start_time > self._rx_timeout_s:
-                    self._log.error("UART RX timeout; sync header not found, clearing buffer.")
-                    self._rx_buffer = bytearray()
-                    start_time = time.time()
-                continue
-            # found sync header: do we have a full packet?
-            if len(self._rx_buffer) - idx >= Payload.PACKET_SIZE:
-                packet = self._rx_buffer[idx: idx + Payload.PACKET_SIZE]
-                self._rx_buffer = self._rx_buffer[idx + Payload.PACKET_SIZE:]
-                try:
-                    payload = Payload.from_bytes(packet)
-                    self._log.debug("received: {}".format(repr(payload)))
-                    return payload
-                except ValueError as e:
-                    self._log.error("receive error: {}. Resyncing...".format(e))
-                    # remove just the first header byte to attempt resync
-                    self._rx_buffer = self._rx_buffer[idx+1:]
-                    continue
-            else:
-                # not enough bytes yet for a full packet
-                time.sleep(0.005)
-                if time.time() - start_time > self._rx_timeout_s:
-                    self._log.error('UART RX timeout; incomplete packet, clearing buffer.')
-                    self._rx_buffer = bytearray()
-                    start_time = time.time()
-                continue
-        
-    def receive_packet(self):
+        self._log.debug('send payload.')
+        return self._run(self.send(payload))
+
+    def receive_packet(self, timeout_ms=None):
         '''
-        Synchronous wrapper: schedule async receive on background loop.
+        Synchronous wrapper: run receive() on the background loop.
         '''
         self._log.debug('receive packet.')
-        future = asyncio.run_coroutine_threadsafe(
-            self._receive_packet_async(), self._loop)
-        return future.result()
-        
-    async def _receive_packet_async(self):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(self._executor, self._receive_packet_sync)
-    
+        return self._run(self.receive(timeout_ms))
+
     def receive_values(self):
         '''
-        Convenience method to receive a Payload and return the tuple (cmd, pfwd, sfwd, paft, saft).
+        Convenience method to receive a Payload and return the tuple (cmd, *values).
         '''
         payload = self.receive_packet()
         if payload:
-            return (payload.cmd.decode('ascii'), payload.pfwd, payload.sfwd, payload.paft, payload.saft)
+            return (payload.cmd.decode('ascii'), *payload.values)
         return None
 
 #EOF
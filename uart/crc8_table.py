@@ -1,3 +1,27 @@
+# CRC-8 for polynomial 0x07 (MSB-first), initial value 0, no final XOR.
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2025-06-12
+# modified: 2026-10-17
+#
+# This module is shared by the master (uart/) and the MicroPython slave (upy/)
+# and the two copies must remain identical. crc8() takes start and end
+# indices, so that callers needn't slice a frame out of a receive buffer.
+# Under MicroPython it is compiled to native code with the viper emitter,
+# working in place on the buffer. On CPython it is no quicker per frame than
+# the original loop: it iterates a slice, which for bytes and bytearray is a
+# copy, as that is still quicker than iterating a memoryview, indexing the
+# buffer, or taking two bytes per step through a 16-bit-indexed table.
+#
+# crc8_many() and crc8_check_many() handle a whole capture of frames in one
+# call. On the host these use NumPy, taking two bytes per pass through that
+# 16-bit-indexed (slice-by-2) table, which is built only for them.
+#
+
 # CRC-8 table for polynomial 0x07 (MSB-first)
 CRC8_TABLE = [
     0x00, 0x07, 0x0E, 0x09, 0x1C, 0x1B, 0x12, 0x15,
@@ -33,3 +57,91 @@ CRC8_TABLE = [
     0xDE, 0xD9, 0xD0, 0xD7, 0xC2, 0xC5, 0xCC, 0xCB,
     0xE6, 0xE1, 0xE8, 0xEF, 0xFA, 0xFD, 0xF4, 0xF3,
 ]
+
+_TABLE = bytes(CRC8_TABLE)
+_WIDE_TABLE = None # slice-by-2 table, built on first use
+
+try:
+    import micropython
+except ImportError:
+    micropython = None
+np = None
+if micropython is None:
+    try:
+        import numpy as np
+    except ImportError:
+        pass
+
+def crc8(data, start=0, end=None, table=CRC8_TABLE):
+    '''
+    Returns the CRC8 of data[start:end]. For bytes or a bytearray the slice
+    is a copy, which for a frame costs less than iterating without one.
+    '''
+    crc = 0
+    for b in data[start:end]:
+        crc = table[crc ^ b]
+    return crc
+
+if micropython is not None and hasattr(micropython, 'viper'):
+
+    @micropython.viper
+    def _crc8_viper(data: ptr8, start: int, end: int, table: ptr8) -> int:
+        crc = 0
+        for i in range(start, end):
+            crc = table[crc ^ data[i]]
+        return crc
+
+    def crc8(data, start=0, end=None, table=_TABLE):
+        '''
+        Returns the CRC8 of data[start:end], without slicing (copying) it.
+        '''
+        return _crc8_viper(data, start, len(data) if end is None else end, table)
+
+def crc8_many(buf, offsets, start, end):
+    '''
+    Returns the CRC8 of buf[offset + start:offset + end] for each offset in
+    offsets, as a uint8 NumPy array if NumPy is available, otherwise as bytes.
+    '''
+    if np is None:
+        return bytes(crc8(buf, offset + start, offset + end) for offset in offsets)
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    # gather the checked bytes of every frame into one row each
+    data = np.lib.stride_tricks.sliding_window_view(raw, end)[offsets][:, start:end]
+    pairs = data.shape[1] // 2
+    # each big-endian 16-bit word is (first byte << 8 | second byte)
+    words = np.ascontiguousarray(data[:, :pairs * 2]).view('>u2').astype(np.uint16)
+    table = _wide_table()
+    crc = np.zeros(len(offsets), dtype=np.uint16)
+    for column in range(pairs):
+        crc = table[words[:, column] ^ (crc << 8)]
+    crc = crc.astype(np.uint8)
+    if data.shape[1] % 2:
+        crc = np.frombuffer(_TABLE, dtype=np.uint8)[crc ^ data[:, -1]]
+    return crc
+
+def crc8_check_many(buf, offsets, start, end):
+    '''
+    Checks many frames in one call: for each offset in offsets, is the CRC8
+    of buf[offset + start:offset + end] equal to the CRC byte at offset + end?
+    Returns a boolean NumPy array if NumPy is available, otherwise a list.
+    '''
+    crcs = crc8_many(buf, offsets, start, end)
+    if np is None:
+        return [crc == buf[offset + end] for offset, crc in zip(offsets, crcs)]
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    return crcs == raw[np.asarray(offsets, dtype=np.intp) + end]
+
+def _wide_table():
+    '''
+    Returns the slice-by-2 table: the CRC after two bytes b0, b1 starting from
+    crc, indexed by ((crc ^ b0) << 8 | b1).
+    '''
+    global _WIDE_TABLE
+    if _WIDE_TABLE is None:
+        table = np.frombuffer(_TABLE, dtype=np.uint8)
+        index = np.arange(65536)
+        _WIDE_TABLE = table[table[index >> 8] ^ (index & 0xFF)].astype(np.uint16)
+    return _WIDE_TABLE
+
+#EOF
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Reference state for delta frames. This module is shared by the master
+# (uart/) and the MicroPython slave (upy/) and the two copies must remain
+# identical.
+#
+# A delta frame carries only the fields that differ from the last full frame
+# (the keyframe) of its type and address, flagged by DELTA_FLAG in its type
+# byte:
+#
+#     SYNC_HEADER | seq | type + 0x80 | keyframe seq | bitmap | changed fields | [address] | CRC8
+#
+# Keyframes are kept per type and address (or none), so that frames of one
+# type for several slaves on a bus, or addressed and unaddressed, are each
+# taken against their own reference rather than another node's.
+#
+# The bitmap has one bit per field, least significant bit first. Deltas are
+# always taken against the keyframe, not the previous frame, so losing a delta
+# frame loses only that frame. Each delta names the sequence number of its
+# keyframe, so if a keyframe is lost the deltas that follow it are rejected
+# rather than applied to the wrong reference, until the next keyframe.
+#
+# A generic layout's command is part of its reference: a change of command
+# is sent as a keyframe.
+#
+
+DELTA_FLAG = 0x80
+
+class DeltaState:
+    '''
+    The keyframe of each type and address for one direction of a link, kept
+    by both the sender and the receiver.
+
+    :param keyframe_interval:  the sender sends a keyframe at least once in
+                               this many frames of a type and address, less
+                               than 128
+    '''
+    def __init__(self, keyframe_interval=50):
+        if not 0 < keyframe_interval < 128:
+            raise ValueError('keyframe interval must be between 1 and 127.')
+        self._keyframe_interval = keyframe_interval
+        self._keyframes = {} # key of type and address: [seq, cmd, values as sent, frames since keyframe]
+
+    def reset(self):
+        '''
+        Forget all keyframes, so the sender's next frame of each type is a keyframe.
+        '''
+        self._keyframes.clear()
+
+    @staticmethod
+    def _key(layout, addr):
+        '''
+        Returns the key of a type and address (or None), an int, so that
+        looking it up allocates nothing.
+        '''
+        return layout.type_id if addr is None else layout.type_id | (addr + 1) << 8
+
+    def keyframe(self, layout, cmd, seq, values, addr=None):
+        '''
+        Record a full frame as the keyframe of its type and address. The
+        values are those sent on the wire, i.e., fixed point fields already
+        scaled.
+        '''
+        self._keyframes[self._key(layout, addr)] = [seq, cmd, values, 0]
+
+    def delta(self, layout, cmd, seq, values, addr=None):
+        '''
+        For the sender: returns (keyframe seq, bitmap, changed values) to send
+        a delta frame, or None if a keyframe should be sent, in which case it
+        is recorded as such.
+        '''
+        keyframe = self._keyframes.get(self._key(layout, addr))
+        if keyframe is not None and keyframe[1] == cmd and keyframe[3] + 1 < self._keyframe_interval:
+            bitmap = 0
+            changed = []
+            size = 0
+            for i, (value, reference) in enumerate(zip(values, keyframe[2])):
+                if value != reference:
+                    bitmap |= 1 << i
+                    changed.append(value)
+                    size += layout.field_sizes[i]
+            # a delta is only sent if it is smaller than a keyframe, which becomes the new reference
+            if 1 + delta_bitmap_size(layout) + size < (2 if layout.cmd is None else 0) + sum(layout.field_sizes):
+                keyframe[3] += 1
+                return keyframe[0], bitmap, changed
+        self.keyframe(layout, cmd, seq, values, addr)
+        return None
+
+    def apply(self, layout, keyframe_seq, bitmap, changed, addr=None):
+        '''
+        For the receiver: returns (cmd, values) reconstructed from the keyframe
+        and the changed values of a delta frame. Raises a ValueError if the
+        delta's keyframe isn't the one held for its type and address.
+        '''
+        keyframe = self._keyframes.get(self._key(layout, addr))
+        if keyframe is None or keyframe[0] != keyframe_seq:
+            raise ValueError("delta frame for missing keyframe {}.".format(keyframe_seq))
+        values = list(keyframe[2])
+        changed = iter(changed)
+        for i in range(len(values)):
+            if bitmap & (1 << i):
+                values[i] = next(changed)
+        return keyframe[1], tuple(values)
+
+def delta_bitmap_size(layout):
+    '''
+    Returns the number of bitmap bytes in a delta frame of the layout.
+    '''
+    return (len(layout.fields) + 7) // 8
+
+#EOF
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Drives several slaves, each on its own serial port, from the caller's thread.
+# A round of transactions writes each port's request then waits on all the
+# ports at once with a single selector, reading each reply as it arrives, so
+# the ports' transactions overlap on the wire while one select() call serves
+# them all, with no thread per port and no event loop.
+#
+# Each port keeps its own sequence numbers, reply timeout, receive buffer and
+# (optionally) Stats, as a UARTMaster would. Requests are written without a
+# tcdrain(), which would otherwise hold up the writes to the following ports.
+#
+
+import io
+import os
+import time
+import select
+import selectors
+from time import perf_counter_ns
+import serial
+
+from uart.payload import Payload, Aggregate
+from uart.rx_buffer import RxBuffer
+from uart.uart_master import UARTMaster
+from uart.stats import Stats
+from core.logger import Logger, Level
+
+class _Port:
+    '''
+    The state of one port: its serial port, buffers, sequence number and stats.
+    '''
+    def __init__(self, name, port, baudrate, reply_timeout_ms, stats, log):
+        self.name   = name
+        self.reply_timeout_s = reply_timeout_ms / 1000
+        self.stats  = stats
+        self.serial = serial.Serial(port, baudrate, timeout=0)
+        self.fd     = self.serial.fileno()
+        # the port is opened non-blocking, so this reads whatever is available straight into the RX buffer
+        self.rx_file   = io.FileIO(self.fd, 'rb', closefd=False)
+        self.rx_buffer = RxBuffer(log=log, stats=stats)
+        self.tx_buffer = bytearray(Aggregate.MAX_PACKET_SIZE)
+        self.tx_view   = memoryview(self.tx_buffer)
+        self.seq       = 0
+        # the transaction in progress, if any
+        self.request   = None
+        self.deadline  = None
+        self.start_ns  = None
+        self.sent_ns   = None
+
+    def next_seq(self):
+        self.seq = (self.seq + 1) % Payload.SEQ_MODULUS
+        return self.seq
+
+class MultiPortManager:
+    '''
+    :param baudrate:          the default baud rate of each port
+    :param reply_timeout_ms:  the default reply timeout of each port
+    :param tx_timeout_ms:     how long a write may wait for a port to become writable
+    :param instrument:        if True, time and count each port's transactions, as returned by stats()
+    '''
+    def __init__(self, baudrate=115200, reply_timeout_ms=50, tx_timeout_ms=10, instrument=False):
+        self._log = Logger('multi-port-mgr', Level.INFO)
+        self._baudrate = baudrate
+        self._reply_timeout_ms = reply_timeout_ms
+        self._tx_timeout_s = tx_timeout_ms / 1000
+        self._instrument = instrument
+        self._ports = {} # name: _Port
+        self._selector = selectors.DefaultSelector()
+        self._log.info('ready.')
+
+    def add(self, name, port, baudrate=None, reply_timeout_ms=None):
+        '''
+        Open a port under a name used to address its transactions. The baud
+        rate and reply timeout default to those of the manager.
+        '''
+        if name in self._ports:
+            raise ValueError('port name already in use: {}'.format(name))
+        entry = _Port(name, port, self._baudrate if baudrate is None else baudrate,
+                self._reply_timeout_ms if reply_timeout_ms is None else reply_timeout_ms,
+                Stats() if self._instrument else None, self._log)
+        self._selector.register(entry.fd, selectors.EVENT_READ, entry)
+        self._ports[name] = entry
+        self._log.info('added port {} as \'{}\'.'.format(port, name))
+
+    @property
+    def names(self):
+        return list(self._ports)
+
+    def __len__(self):
+        return len(self._ports)
+
+    def _write(self, entry, view):
+        '''
+        Write the bytes to the non-blocking port, waiting up to the TX timeout
+        whenever the kernel buffer is full.
+        '''
+        while view:
+            try:
+                view = view[os.write(entry.fd, view):]
+            except BlockingIOError:
+                if not select.select([], [entry.fd], [], self._tx_timeout_s)[1]:
+                    raise TimeoutError('UART TX timeout.')
+
+    def _send(self, entry, request, now):
+        if isinstance(request, Payload):
+            request.seq = entry.next_seq()
+            frame = request
+        else:
+            frame = Aggregate(request, seq=entry.next_seq())
+        entry.request  = frame
+        entry.deadline = now + entry.reply_timeout_s
+        if entry.stats is not None:
+            entry.start_ns = perf_counter_ns()
+        count = frame.pack_into(entry.tx_buffer, 0)
+        self._write(entry, entry.tx_view if count == len(entry.tx_buffer) else entry.tx_view[:count])
+        if entry.stats is not None:
+            entry.sent_ns = perf_counter_ns()
+#       self._log.debug("sent to '{}': {}".format(entry.name, frame))
+
+    def _receive(self, entry, replies):
+        '''
+        Read what has arrived on the port, completing its transaction if its
+        reply is among it; other frames are discarded as stale.
+        '''
+        if not entry.rx_buffer.readinto(entry.rx_file):
+            return
+        if entry.sent_ns is not None:
+            entry.stats.record('first_byte', perf_counter_ns() - entry.sent_ns)
+            entry.sent_ns = None
+        while (reply := entry.rx_buffer.next_frame()) is not None:
+            request = entry.request
+            if request is None or reply.seq != request.seq:
+                self._log.warning("discarding stale reply on '{}': {}".format(entry.name, reply))
+                continue
+            if isinstance(request, Aggregate):
+                if not isinstance(reply, Aggregate) or len(reply) != len(request):
+                    self._log.error("reply on '{}' does not answer all {} requests: {}".format(entry.name, len(request), reply))
+                    self._fail(entry, replies)
+                    return
+                reply = list(reply.payloads)
+            if entry.stats is not None:
+                entry.stats.record('transaction', perf_counter_ns() - entry.start_ns)
+#           self._log.debug("received on '{}': {}".format(entry.name, reply))
+            replies[entry.name] = reply
+            entry.request = None
+            return
+
+    def _fail(self, entry, replies):
+        request = entry.request
+        replies[entry.name] = [UARTMaster.ERROR_PAYLOAD] * len(request) if isinstance(request, Aggregate) else UARTMaster.ERROR_PAYLOAD
+        if entry.stats is not None:
+            entry.stats.count('errors')
+        entry.request = None
+        entry.sent_ns = None
+
+    def send_receive_all(self, requests):
+        '''
+        Run a transaction on each of the named ports concurrently, returning a
+        dict of the replies by name. Each request is a Payload, or a list of
+        Payloads sent as one aggregate frame and answered by a list. A reply
+        that doesn't arrive within its port's reply timeout, or a port that
+        fails, is answered with the ERROR_PAYLOAD (or a list of them).
+        '''
+        replies = {}
+        waiting = []
+        now = time.monotonic()
+        for name, request in requests.items():
+            entry = self._ports[name]
+            try:
+                self._send(entry, request, now)
+                waiting.append(entry)
+            except OSError as e: # including a TX timeout
+                # a failed port shouldn't fail the others' transactions
+                self._log.error("error sending on '{}': {}".format(name, e))
+                entry.request = request if isinstance(request, Payload) else Aggregate(request)
+                self._fail(entry, replies)
+        while waiting:
+            timeout = max(0.0, min(entry.deadline for entry in waiting) - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                entry = key.data
+                try:
+                    self._receive(entry, replies)
+                except OSError as e:
+                    self._log.error("error receiving on '{}': {}".format(entry.name, e))
+                    if entry.request is not None:
+                        self._fail(entry, replies)
+            now = time.monotonic()
+            still_waiting = []
+            for entry in waiting:
+                if entry.request is None:
+                    continue
+                if now >= entry.deadline:
+                    self._log.error("no reply on '{}' within {:.0f}ms.".format(entry.name, entry.reply_timeout_s * 1000))
+                    if entry.stats is not None:
+                        entry.stats.count('timeouts')
+                    if len(entry.rx_buffer):
+                        # a partial frame that won't now be completed
+                        if entry.stats is not None:
+                            entry.stats.count('rx_timeouts')
+                        entry.rx_buffer.clear()
+                    self._fail(entry, replies)
+                else:
+                    still_waiting.append(entry)
+            waiting = still_waiting
+        return replies
+
+    def send_receive(self, name, request):
+        '''
+        Run a single transaction on the named port.
+        '''
+        return self.send_receive_all({ name: request })[name]
+
+    def stats(self):
+        '''
+        Returns a dict of each port's stats snapshot by name, or None if not instrumented.
+        '''
+        if not self._instrument:
+            return None
+        return { name: entry.stats.snapshot() for name, entry in self._ports.items() }
+
+    def reset_stats(self):
+        if self._instrument:
+            for entry in self._ports.values():
+                entry.stats.reset()
+
+    def close(self):
+        for entry in self._ports.values():
+            self._selector.unregister(entry.fd)
+            entry.serial.close()
+        self._ports.clear()
+        self._selector.close()
+        self._log.info('closed.')
+
+#EOF
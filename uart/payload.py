@@ -7,29 +7,92 @@
 #
 # author:   Murray Altheim
 # created:  2025-06-12
-# modified: 2025-06-22
+# modified: 2026-10-17
 
 import struct
-from uart.crc8_table import CRC8_TABLE
+from array import array
+from uart import schema
+from uart.delta import DELTA_FLAG, delta_bitmap_size
+from uart.crc8_table import crc8, crc8_many, crc8_check_many
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class CRCError(ValueError):
+    '''
+    Raised when a frame's CRC doesn't match its contents.
+    '''
+    pass
 
 class Payload:
+    __slots__ = ('cmd', 'seq', 'values', 'schema', 'addr')
+
     # Sync header: 'zz' for human-readability. To switch to a binary header, just uncomment the next line.
     SYNC_HEADER = b'\x7A\x7A'
 #   SYNC_HEADER = b'\xAA\x55'
-    PACK_FORMAT = '<2sffff'  # 2-char cmd, 4 floats
-    PAYLOAD_SIZE = struct.calcsize(PACK_FORMAT)  # Size of cmd+floats only, no CRC or header
     CRC_SIZE = 1
-    PACKET_SIZE = len(SYNC_HEADER) + PAYLOAD_SIZE + CRC_SIZE  # header + payload + crc
+    TYPE_INDEX = len(SYNC_HEADER) + 1 # the type byte follows the sequence number
+    MAX_PACKET_SIZE = len(SYNC_HEADER) + schema.MAX_SIZE + schema.ADDRESS_SIZE + CRC_SIZE # header + seq + type + body + address + crc
 
-    def __init__(self, cmd, pfwd, sfwd, paft, saft):
+    SEQ_MODULUS = 256 # sequence numbers wrap at one byte
+
+    def __init__(self, cmd, *values, seq=0, layout=None, addr=None):
+        '''
+        A two character command and the values of its fields, as declared by
+        its layout in the schema registry. A command that isn't registered
+        carries four values, pfwd, sfwd, paft and saft, sent as float32 unless
+        another generic layout is provided, e.g., schema.GENERIC_FIXED.
+
+        If an address byte is provided this is sent as an addressed frame, for
+        a bus with several slaves: a slave's address (or BROADCAST_ADDRESS) on
+        a request, plus REPLY_FLAG on a reply.
+        '''
         self.cmd = cmd.encode('ascii') if isinstance(cmd, str) else cmd
-        self.pfwd = pfwd
-        self.sfwd = sfwd
-        self.paft = paft
-        self.saft = saft
+        self.schema = schema.for_cmd(self.cmd) if layout is None else layout
+        if self.schema.cmd is not None and self.schema.cmd != self.cmd:
+            raise ValueError("layout of {} used for {}.".format(self.schema.cmd, self.cmd))
+        if len(values) != len(self.schema.fields):
+            raise ValueError("{} expects {} values, not {}.".format(self.cmd, len(self.schema.fields), len(values)))
+        self.seq = seq
+        self.values = values
+        self.addr = addr
+
+    def __getitem__(self, name):
+        '''
+        Returns the value of a field by name, e.g., payload['ch3'].
+        '''
+        try:
+            return self.values[self.schema.fields.index(name)]
+        except ValueError:
+            raise KeyError(name)
+
+    def _field(name):
+        # the fields of the generic layouts are also available as attributes, e.g., payload.pfwd
+        def getter(self):
+            try:
+                return self[name]
+            except KeyError:
+                raise AttributeError("{} has no field {}".format(self.cmd, name))
+        return property(getter)
+
+    pfwd = _field('pfwd')
+    sfwd = _field('sfwd')
+    paft = _field('paft')
+    saft = _field('saft')
+    del _field
 
     def __repr__(self):
-        return f"Payload(cmd={self.cmd.decode('ascii')}, pfwd={self.pfwd}, sfwd={self.sfwd}, paft={self.paft}, saft={self.saft})"
+        fields = ''.join(', {}={}'.format(name, value) for name, value in zip(self.schema.fields, self.values))
+        addr = '' if self.addr is None else ', addr=0x{:02X}'.format(self.addr)
+        return f"Payload(seq={self.seq}{addr}, cmd={self.cmd.decode('ascii')}{fields})"
+
+    @property
+    def packet_size(self):
+        '''
+        The number of bytes this Payload occupies on the wire.
+        '''
+        return len(Payload.SYNC_HEADER) + self.schema.size + (0 if self.addr is None else schema.ADDRESS_SIZE) + self.CRC_SIZE
 
     def to_bytes(self):
         '''
@@ -38,30 +101,527 @@ class Payload:
         return self.__bytes__()
 
     def __bytes__(self):
-        # Pack the data into bytes (cmd, floats)
-        packed = struct.pack(self.PACK_FORMAT, self.cmd, self.pfwd, self.sfwd, self.paft, self.saft)
-        crc = self.calculate_crc8(packed)
-        return Payload.SYNC_HEADER + packed + bytes([crc])
+        packet = bytearray(self.packet_size)
+        self.pack_into(packet, 0)
+        return bytes(packet)
+
+    def pack_into(self, buf, offset=0, delta=None):
+        '''
+        Encode the packet into buf (a bytearray or writable memoryview) starting
+        at offset, so that a sender can reuse a single transmit buffer. Returns
+        the number of bytes written.
+
+        If a DeltaState is provided this is sent as a delta frame, carrying
+        only the fields changed since the keyframe of its type and address,
+        unless a keyframe is due.
+        '''
+        layout = self.schema
+        header_end = offset + len(Payload.SYNC_HEADER)
+        buf[offset:header_end] = Payload.SYNC_HEADER
+        values = self.values if layout.scales is None else layout.encode(self.values)
+        if delta is not None:
+            changes = delta.delta(layout, self.cmd, self.seq, values, self.addr)
+            if changes is not None:
+                return self._pack_delta_into(buf, offset, *changes)
+        crc_index  = header_end + layout.size
+        if layout.cmd is None:
+            layout.packer.pack_into(buf, header_end, self.seq, layout.type_id, self.cmd, *values)
+        else:
+            layout.packer.pack_into(buf, header_end, self.seq, layout.type_id, *values)
+        if self.addr is not None:
+            buf[header_end + 1] |= schema.ADDRESS_FLAG
+            buf[crc_index] = self.addr
+            crc_index += schema.ADDRESS_SIZE
+        buf[crc_index] = self.calculate_crc8(buf, header_end, crc_index)
+        return crc_index + self.CRC_SIZE - offset
+
+    def _pack_delta_into(self, buf, offset, keyframe_seq, bitmap, changed):
+        layout = self.schema
+        header_end = offset + len(Payload.SYNC_HEADER)
+        buf[header_end]     = self.seq
+        buf[header_end + 1] = layout.type_id | DELTA_FLAG
+        buf[header_end + 2] = keyframe_seq
+        index = header_end + 3
+        for i in range(delta_bitmap_size(layout)):
+            buf[index] = (bitmap >> (8 * i)) & 0xFF
+            index += 1
+        changed = iter(changed)
+        for i, code in enumerate(layout.field_formats):
+            if bitmap & (1 << i):
+                struct.pack_into('<' + code, buf, index, next(changed))
+                index += layout.field_sizes[i]
+        if self.addr is not None:
+            buf[header_end + 1] |= schema.ADDRESS_FLAG
+            buf[index] = self.addr
+            index += schema.ADDRESS_SIZE
+        buf[index] = self.calculate_crc8(buf, header_end, index)
+        return index + self.CRC_SIZE - offset
+
+    @classmethod
+    def frame_length(cls, buf, offset=0, end=None):
+        '''
+        Returns the length of the frame starting at offset within buf, as given
+        by its type byte (and for a delta frame, its bitmap), or None if not
+        enough of the frame is in buf (up to end) to tell. Raises a ValueError
+        if the type is unknown.
+        '''
+        if end is None:
+            end = len(buf)
+        type_index = offset + cls.TYPE_INDEX
+        if end <= type_index:
+            return None
+        type_byte = buf[type_index]
+        address_size = schema.ADDRESS_SIZE if type_byte & schema.ADDRESS_FLAG else 0
+        layout = schema.for_type(type_byte & schema.TYPE_MASK)
+        if layout is None:
+            if type_byte & ~schema.ADDRESS_FLAG == schema.AGGREGATE_TYPE:
+                # the length of the records follows the type
+                if end <= type_index + 1:
+                    return None
+                return type_index + 2 + buf[type_index + 1] + address_size + cls.CRC_SIZE - offset
+            raise ValueError("unknown type: {}".format(type_byte))
+        if not type_byte & DELTA_FLAG:
+            return len(Payload.SYNC_HEADER) + layout.size + address_size + cls.CRC_SIZE
+        # type, keyframe seq, then the bitmap
+        bitmap_index = type_index + 2
+        bitmap_size = delta_bitmap_size(layout)
+        if end < bitmap_index + bitmap_size:
+            return None
+        length = bitmap_index + bitmap_size + address_size + cls.CRC_SIZE - offset
+        for i in range(len(layout.fields)):
+            if buf[bitmap_index + i // 8] & (1 << (i % 8)):
+                length += layout.field_sizes[i]
+        return length
+
+    @classmethod
+    def frame_address(cls, buf, offset, length):
+        '''
+        Returns the address byte of the frame of length bytes (as returned by
+        frame_length()) starting at offset within buf, or None if the frame
+        isn't addressed. The CRC isn't checked, so that a slave may skip a
+        frame for another slave without decoding it.
+        '''
+        if buf[offset + cls.TYPE_INDEX] & schema.ADDRESS_FLAG:
+            return buf[offset + length - cls.CRC_SIZE - schema.ADDRESS_SIZE]
+        return None
 
     @classmethod
-    def from_bytes(cls, packet):
-        if len(packet) != cls.PACKET_SIZE:
+    def frame_valid(cls, buf, offset, length):
+        '''
+        Returns True if the CRC of the frame of length bytes (as returned by
+        frame_length()) starting at offset within buf matches, without
+        decoding it.
+        '''
+        crc_index = offset + length - cls.CRC_SIZE
+        return buf[crc_index] == cls.calculate_crc8(buf, offset + len(cls.SYNC_HEADER), crc_index)
+
+    @classmethod
+    def from_bytes(cls, packet, delta=None):
+        if len(packet) != cls.frame_length(packet):
             raise ValueError(f"invalid packet size: {len(packet)}")
-        if packet[:len(Payload.SYNC_HEADER)] != Payload.SYNC_HEADER:
+        return cls.unpack_from(packet, 0, delta)
+
+    @classmethod
+    def unpack_from(cls, buf, offset=0, delta=None):
+        '''
+        Decode the packet starting at offset within buf (bytes, bytearray or
+        memoryview) in place, without copying it out first.
+
+        A DeltaState is required to decode delta frames, and if provided
+        records every full frame as the keyframe of its type and address. An
+        aggregate frame is returned as an Aggregate.
+        '''
+        if len(buf) <= offset + cls.TYPE_INDEX:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        if buf[offset] != Payload.SYNC_HEADER[0] or buf[offset + 1] != Payload.SYNC_HEADER[1]:
             raise ValueError("invalid sync header")
-        data_and_crc = packet[len(Payload.SYNC_HEADER):]
-        data, crc = data_and_crc[:-1], data_and_crc[-1]
-        calc_crc = cls.calculate_crc8(data)
-        if crc != calc_crc:
-            raise ValueError("CRC mismatch.")
-        cmd, pfwd, sfwd, paft, saft = struct.unpack(cls.PACK_FORMAT, data)
-        return cls(cmd.decode('ascii'), pfwd, sfwd, paft, saft)
+        type_byte = buf[offset + cls.TYPE_INDEX]
+        if type_byte & DELTA_FLAG:
+            return cls._unpack_delta_from(buf, offset, delta)
+        layout = schema.for_type(type_byte & schema.TYPE_MASK)
+        if layout is None:
+            if type_byte & ~schema.ADDRESS_FLAG == schema.AGGREGATE_TYPE:
+                return Aggregate.unpack_from(buf, offset)
+            raise ValueError("unknown type: {}".format(type_byte))
+        header_end = offset + len(Payload.SYNC_HEADER)
+        crc_index  = header_end + layout.size
+        if type_byte & schema.ADDRESS_FLAG:
+            crc_index += schema.ADDRESS_SIZE
+        if len(buf) <= crc_index:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        calc_crc = cls.calculate_crc8(buf, header_end, crc_index)
+        if buf[crc_index] != calc_crc:
+            raise CRCError("CRC mismatch.")
+        record = layout.packer.unpack_from(buf, header_end)
+        # the layout is already known, so this bypasses __init__()
+        payload = cls.__new__(cls)
+        payload.seq = record[0]
+        payload.schema = layout
+        payload.addr = buf[crc_index - schema.ADDRESS_SIZE] if type_byte & schema.ADDRESS_FLAG else None
+        if layout.cmd is None:
+            payload.cmd = record[2]
+            if not payload.cmd.isascii():
+                raise ValueError("invalid command.")
+            payload.values = record[3:]
+        else:
+            payload.cmd = layout.cmd
+            payload.values = record[2:]
+        if delta is not None:
+            delta.keyframe(layout, payload.cmd, payload.seq, payload.values, payload.addr)
+        if layout.scales is not None:
+            payload.values = layout.decode(payload.values)
+        return payload
+
+    @classmethod
+    def _unpack_delta_from(cls, buf, offset, delta):
+        length = cls.frame_length(buf, offset)
+        if length is None or len(buf) < offset + length:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        header_end = offset + len(Payload.SYNC_HEADER)
+        crc_index  = offset + length - cls.CRC_SIZE
+        if buf[crc_index] != cls.calculate_crc8(buf, header_end, crc_index):
+            raise CRCError("CRC mismatch.")
+        if delta is None:
+            raise ValueError("delta frame received without a DeltaState.")
+        layout = schema.for_type(buf[header_end + 1] & schema.TYPE_MASK)
+        addr = buf[crc_index - schema.ADDRESS_SIZE] if buf[header_end + 1] & schema.ADDRESS_FLAG else None
+        index = header_end + 3
+        bitmap = 0
+        for i in range(delta_bitmap_size(layout)):
+            bitmap |= buf[index] << (8 * i)
+            index += 1
+        changed = []
+        for i, code in enumerate(layout.field_formats):
+            if bitmap & (1 << i):
+                changed.append(struct.unpack_from('<' + code, buf, index)[0])
+                index += layout.field_sizes[i]
+        cmd, values = delta.apply(layout, buf[header_end + 2], bitmap, changed, addr)
+        if layout.scales is not None:
+            values = layout.decode(values)
+        return cls(cmd, *values, seq=buf[header_end], layout=layout, addr=addr)
+
+    # batch encoding and decoding ┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈
+    # These are used on the host for log analysis and burst telemetry, and use
+    # NumPy when it is available, falling back to struct.iter_unpack.
+
+    _NUMPY_TYPES = { 'b': 'i1', 'B': 'u1', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4', 'e': '<f2', 'f': '<f4', 'd': '<f8' }
+    _ARRAY_TYPES = { 'e': 'f' } # array.array has no half float
+
+    @classmethod
+    def pack_many(cls, rows, layout=None, use_numpy=True):
+        '''
+        Encode an iterable of rows, each of the form (cmd, *values) with an
+        optional trailing sequence number, as one contiguous bytes object.
+        Unregistered commands are sent in the generic layout provided, float32
+        by default. Rows that all share one layout are encoded with NumPy if
+        available.
+        '''
+        rows = list(rows)
+        generic = schema.GENERIC if layout is None else layout
+        def layout_of(cmd):
+            found = schema.for_cmd(cmd.encode('ascii') if isinstance(cmd, str) else cmd)
+            return generic if found.cmd is None else found
+        layouts = { layout_of(cmd) for cmd in { row[0] for row in rows } }
+        if use_numpy and np is not None and len(layouts) == 1:
+            layout = layouts.pop()
+            width = len(layout.fields) + 1
+            rows = [row if len(row) > width else (*row, 0) for row in rows]
+            frames = np.zeros(len(rows), dtype=cls._frame_dtype(layout))
+            columns = list(zip(*rows)) # cmd, values..., seq
+            frames['header'] = cls.SYNC_HEADER
+            frames['seq']    = columns[-1]
+            frames['type']   = layout.type_id
+            # str or bytes commands are both converted to 'S2'
+            for name, column, scale in zip(cls._columns(layout)[1:], columns[0 if layout.cmd is None else 1:-1],
+                    ((None,) if layout.cmd is None else ()) + (layout.scales or (None,) * len(layout.fields))):
+                if scale is not None:
+                    column = np.rint(np.asarray(column, dtype=float) * scale)
+                    limits = np.iinfo(frames.dtype[name])
+                    if column.min() < limits.min or column.max() > limits.max:
+                        raise ValueError("{} out of range of its fixed point format.".format(name))
+                frames[name] = column
+            size = frames.dtype.itemsize
+            raw = frames.view(np.uint8).reshape(len(rows), size)
+            raw[:, -1] = crc8_many(frames, range(0, frames.nbytes, size), len(cls.SYNC_HEADER), size - 1)
+            return frames.tobytes()
+        payloads = []
+        for row in rows:
+            layout = layout_of(row[0])
+            width = len(layout.fields) + 1
+            payloads.append(cls(*row[:width], seq=row[width] if len(row) > width else 0, layout=layout))
+        out = bytearray(sum(payload.packet_size for payload in payloads))
+        offset = 0
+        for payload in payloads:
+            offset += payload.pack_into(out, offset)
+        return bytes(out)
+
+    @classmethod
+    def unpack_many(cls, buffer, layout=None, use_numpy=True):
+        '''
+        Decode every valid frame of one layout in a buffer of captured bytes:
+        the layout is a Schema or a registered command, by default the float32
+        generic layout. Returns a dict of columns: 'seq' (uint8), 'cmd' (2 byte
+        strings) for a generic layout, then one per field, fixed point fields
+        unscaled. Frames of other layouts, those with a bad sync header or CRC,
+        and any bytes between frames are skipped.
+
+        With NumPy the columns are NumPy arrays, otherwise 'cmd' is a list and
+        the others are array.array instances.
+        '''
+        if layout is None:
+            layout = schema.GENERIC
+        elif not isinstance(layout, schema.Schema):
+            layout = schema.for_cmd(layout.encode('ascii') if isinstance(layout, str) else layout)
+        if use_numpy and np is not None:
+            return cls._unpack_many_numpy(buffer, layout)
+        names = cls._columns(layout)
+        columns = { 'seq': array('B') }
+        for name, code in zip(names[1:], cls._field_codes(layout)):
+            columns[name] = [] if code.endswith('s') else array(cls._ARRAY_TYPES.get(code, code))
+        for name, scale in zip(layout.fields, layout.scales or ()):
+            if scale is not None:
+                columns[name] = array('d')
+        appends = [ columns[name].append for name in names ]
+        for record in cls._iter_records(buffer, layout):
+            for append, value in zip(appends, record):
+                append(value)
+        return columns
+
+    @classmethod
+    def _iter_records(cls, buffer, layout):
+        '''
+        Yields (seq, [cmd,] *values) for each valid frame of the layout. A buffer
+        of back-to-back valid frames is decoded with struct.iter_unpack; on the
+        first bad frame this falls back to scanning for sync headers.
+        '''
+        view = memoryview(buffer)
+        header_size = len(cls.SYNC_HEADER)
+        size = header_size + layout.size + cls.CRC_SIZE
+        if len(view) % size == 0:
+            records = []
+            offset = 0
+            for record in struct.iter_unpack('<{}s{}B'.format(header_size, layout.format[1:]), view):
+                if record[0] != cls.SYNC_HEADER or record[2] != layout.type_id \
+                        or record[-1] != cls.calculate_crc8(view, offset + header_size, offset + size - 1) \
+                        or (layout.cmd is None and not record[3].isascii()):
+                    break
+                records.append(record[1:2] + record[3:-1])
+                offset += size
+            else:
+                if layout.scales is None:
+                    yield from records
+                else:
+                    width = len(layout.fields)
+                    for record in records:
+                        yield record[:-width] + layout.decode(record[-width:])
+                return
+        data = buffer if hasattr(buffer, 'find') else bytes(buffer)
+        offset = 0
+        while True:
+            offset = data.find(cls.SYNC_HEADER, offset)
+            if offset == -1 or len(view) - offset < size:
+                return
+            try:
+                payload = cls.unpack_from(view, offset)
+            except ValueError:
+                offset += 1
+                continue
+            if payload.schema is layout:
+                yield (payload.seq, payload.cmd, *payload.values) if layout.cmd is None else (payload.seq, *payload.values)
+            offset += payload.packet_size
+
+    @classmethod
+    def _unpack_many_numpy(cls, buffer, layout):
+        raw = np.frombuffer(buffer, dtype=np.uint8)
+        dtype = cls._frame_dtype(layout)
+        size = dtype.itemsize
+        count = len(raw) - size + 1
+        if count <= 0:
+            records = np.zeros(0, dtype=dtype)
+        else:
+            # every sync header followed by the layout's type is a candidate frame,
+            # kept if its CRC is good and (for the generic layout) its command is ASCII
+            header_size = len(cls.SYNC_HEADER)
+            offsets = np.flatnonzero((raw[:count] == cls.SYNC_HEADER[0]) & (raw[1:count + 1] == cls.SYNC_HEADER[1])
+                    & (raw[cls.TYPE_INDEX:count + cls.TYPE_INDEX] == layout.type_id))
+            valid = crc8_check_many(raw, offsets, header_size, size - 1)
+            if layout.cmd is None:
+                valid &= (raw[offsets + cls.TYPE_INDEX + 1] < 0x80) & (raw[offsets + cls.TYPE_INDEX + 2] < 0x80)
+            offsets = offsets[valid]
+            if len(offsets) > 1 and (np.diff(offsets) < size).any():
+                # a header pattern inside a frame passed its CRC by chance: keep the earliest of any overlap
+                keep = np.zeros(len(offsets), dtype=bool)
+                next_offset = 0
+                for i, offset in enumerate(offsets.tolist()):
+                    if offset >= next_offset:
+                        keep[i] = True
+                        next_offset = offset + size
+                offsets = offsets[keep]
+            frames = np.lib.stride_tricks.sliding_window_view(raw, size)[offsets]
+            records = np.ascontiguousarray(frames).view(dtype).ravel()
+        columns = { name: records[name] for name in cls._columns(layout) }
+        for name, scale in zip(layout.fields, layout.scales or ()):
+            if scale is not None:
+                columns[name] = columns[name] / scale
+        return columns
 
     @staticmethod
-    def calculate_crc8(data: bytes) -> int:
-        crc = 0
-        for b in data:
-            crc = CRC8_TABLE[crc ^ b]
-        return crc
+    def _columns(layout):
+        '''
+        Returns the column names of a layout used by unpack_many().
+        '''
+        return ('seq', 'cmd') + layout.fields if layout.cmd is None else ('seq',) + layout.fields
+
+    @staticmethod
+    def _field_codes(layout):
+        '''
+        Returns the struct format of each column of a layout following 'seq',
+        e.g., '2s' for the generic 'cmd' then 'f' for each float.
+        '''
+        return (('2s',) if layout.cmd is None else ()) + layout.field_formats
+
+    @classmethod
+    def _frame_dtype(cls, layout):
+        fields = [('header', 'S{}'.format(len(cls.SYNC_HEADER))), ('seq', 'u1'), ('type', 'u1')]
+        for name, code in zip(cls._columns(layout)[1:], cls._field_codes(layout)):
+            fields.append((name, 'S' + code[:-1] if code.endswith('s') else cls._NUMPY_TYPES[code]))
+        fields.append(('crc', 'u1'))
+        return np.dtype(fields)
+
+    @staticmethod
+    def calculate_crc8(data: bytes, start=0, end=None) -> int:
+        '''
+        Returns the CRC8 of data[start:end].
+        '''
+        return crc8(data, start, end)
+
+class Aggregate:
+    __slots__ = ('seq', 'payloads', 'addr')
+
+    # the largest total of records, as sent in the length byte
+    MAX_RECORDS_SIZE = 255
+    MAX_PACKET_SIZE  = len(Payload.SYNC_HEADER) + 3 + MAX_RECORDS_SIZE + schema.ADDRESS_SIZE + Payload.CRC_SIZE # header + seq + type + length + records + address + crc
+
+    def __init__(self, payloads, seq=0, addr=None):
+        '''
+        Several Payloads, of any commands, sent as a single aggregate frame
+        behind one sync header, sequence number, length and CRC:
+
+            SYNC_HEADER | seq | AGGREGATE_TYPE | length | records | CRC8
+
+        where each record is a Payload's type byte and body, as in its own
+        frame. The reply to an aggregate is an aggregate with the same sequence
+        number, holding one reply per request in the same order. Records are
+        always sent in full, never as delta frames.
+
+        If an address byte is provided it's sent before the CRC, as for an
+        addressed Payload; the records' own addresses are ignored.
+        '''
+        self.payloads = tuple(payloads)
+        self.seq = seq
+        self.addr = addr
+        size = self.records_size
+        if size > Aggregate.MAX_RECORDS_SIZE:
+            raise ValueError("{} bytes of records exceeds the maximum of {}.".format(size, Aggregate.MAX_RECORDS_SIZE))
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def __iter__(self):
+        return iter(self.payloads)
+
+    def __repr__(self):
+        addr = '' if self.addr is None else ', addr=0x{:02X}'.format(self.addr)
+        return "Aggregate(seq={}{}, payloads=[{}])".format(self.seq, addr, ', '.join(repr(payload) for payload in self.payloads))
+
+    @property
+    def records_size(self):
+        '''
+        The number of bytes of the records, at most MAX_RECORDS_SIZE.
+        '''
+        return sum(payload.schema.size - 1 for payload in self.payloads)
+
+    @property
+    def packet_size(self):
+        '''
+        The number of bytes this Aggregate occupies on the wire.
+        '''
+        return len(Payload.SYNC_HEADER) + 3 + self.records_size + (0 if self.addr is None else schema.ADDRESS_SIZE) + Payload.CRC_SIZE
+
+    def to_bytes(self):
+        '''
+        A convenience method that calls __bytes__().
+        '''
+        return self.__bytes__()
+
+    def __bytes__(self):
+        packet = bytearray(self.packet_size)
+        self.pack_into(packet, 0)
+        return bytes(packet)
+
+    def pack_into(self, buf, offset=0, delta=None):
+        '''
+        Encode the aggregate into buf starting at offset, returning the number
+        of bytes written. The DeltaState argument is accepted so that this may
+        be sent wherever a Payload is, but is ignored.
+        '''
+        header_end = offset + len(Payload.SYNC_HEADER)
+        buf[offset:header_end] = Payload.SYNC_HEADER
+        buf[header_end]     = self.seq
+        buf[header_end + 1] = schema.AGGREGATE_TYPE
+        index = header_end + 3
+        for payload in self.payloads:
+            layout = payload.schema
+            values = payload.values if layout.scales is None else layout.encode(payload.values)
+            if layout.cmd is None:
+                layout.record_packer.pack_into(buf, index, layout.type_id, payload.cmd, *values)
+            else:
+                layout.record_packer.pack_into(buf, index, layout.type_id, *values)
+            index += layout.size - 1
+        buf[header_end + 2] = index - header_end - 3
+        if self.addr is not None:
+            buf[header_end + 1] |= schema.ADDRESS_FLAG
+            buf[index] = self.addr
+            index += schema.ADDRESS_SIZE
+        buf[index] = Payload.calculate_crc8(buf, header_end, index)
+        return index + Payload.CRC_SIZE - offset
+
+    @classmethod
+    def unpack_from(cls, buf, offset=0):
+        '''
+        Decode the aggregate frame starting at offset within buf, returning an
+        Aggregate of its Payloads, each stamped with the aggregate's sequence
+        number. Payload.unpack_from() calls this on an aggregate frame.
+        '''
+        header_end   = offset + len(Payload.SYNC_HEADER)
+        length_index = header_end + 2
+        if len(buf) <= length_index:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        records_end = length_index + 1 + buf[length_index]
+        addressed = buf[header_end + 1] & schema.ADDRESS_FLAG
+        crc_index = records_end + schema.ADDRESS_SIZE if addressed else records_end
+        if len(buf) <= crc_index:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        if buf[crc_index] != Payload.calculate_crc8(buf, header_end, crc_index):
+            raise CRCError("CRC mismatch.")
+        seq = buf[header_end]
+        payloads = []
+        index = length_index + 1
+        while index < records_end:
+            layout = schema.for_type(buf[index])
+            if layout is None:
+                raise ValueError("unknown record type: {}".format(buf[index]))
+            if index + layout.size - 1 > records_end:
+                raise ValueError("truncated record.")
+            record = layout.record_packer.unpack_from(buf, index)
+            cmd = layout.cmd if layout.cmd is not None else record[1]
+            values = record[1:] if layout.cmd is not None else record[2:]
+            if layout.cmd is None and not cmd.isascii():
+                raise ValueError("invalid command.")
+            if layout.scales is not None:
+                values = layout.decode(values)
+            payloads.append(Payload(cmd, *values, seq=seq, layout=layout))
+            index += layout.size - 1
+        return cls(payloads, seq, buf[records_end] if addressed else None)
 
 #EOF
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Polls several addressed slaves sharing one half-duplex bus, e.g., motor
+# nodes on an RS-485 line, through a single UARTMaster. Each cycle polls every
+# slave in a weighted round robin, a slave of weight 2 being polled twice per
+# cycle with its polls spread through it, one transaction at a time so that
+# only one slave ever drives the line.
+#
+# Each slave has its own reply timeout, so the cycle time is bounded by the
+# sum of its polls' timeouts. A slave that misses max_failures replies in a
+# row is marked down and then polled only once every retry_cycles cycles
+# until it answers again, so that a dead node costs one timeout now and then
+# rather than one in every cycle.
+#
+# Frames that aren't the polled slave's reply, such as the master's own
+# request echoed back by a half-duplex transceiver, are skipped while
+# waiting for it.
+#
+
+from time import monotonic, perf_counter_ns
+
+from uart import schema
+from uart.stats import Histogram
+from core.logger import Logger, Level
+
+class _Slave:
+    '''
+    A slave on the bus, its request and its statistics.
+    '''
+    def __init__(self, address, request, weight, timeout_ms):
+        self.address    = address
+        self.request    = request
+        self.weight     = weight
+        self.timeout_ms = timeout_ms
+        self.failures   = 0 # consecutive
+        self.down       = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.polls    = 0
+        self.replies  = 0
+        self.timeouts = 0
+        self.errors   = 0 # replies from the wrong address, skipped
+        self.latency  = Histogram()
+
+class PollScheduler:
+    '''
+    :param master:         the UARTMaster on the bus
+    :param timeout_ms:     the default reply timeout of each slave
+    :param max_failures:   consecutive missed replies after which a slave is marked down
+    :param retry_cycles:   a slave marked down is polled once in this many cycles
+    '''
+    def __init__(self, master, timeout_ms=20, max_failures=3, retry_cycles=50):
+        self._log = Logger('poll-scheduler', Level.INFO)
+        self._master = master
+        self._timeout_ms = timeout_ms
+        self._max_failures = max_failures
+        self._retry_cycles = retry_cycles
+        self._slaves = {} # address: _Slave
+        self._order = []  # the slaves in the order polled each cycle
+        self._cycles = 0
+        self._cycle_time = Histogram()
+        self._log.info('ready.')
+
+    def add(self, address, request, weight=1, timeout_ms=None):
+        '''
+        Add a slave to the cycle.
+
+        :param address:     its address, 0 to schema.MAX_ADDRESS
+        :param request:     the Payload to send it, or a function returning one, called per poll
+        :param weight:      the number of times it's polled per cycle
+        :param timeout_ms:  how long to wait for its reply, by default the scheduler's
+        '''
+        if not 0 <= address <= schema.MAX_ADDRESS:
+            raise ValueError('address must be between 0 and {}.'.format(schema.MAX_ADDRESS))
+        if address in self._slaves:
+            raise ValueError('address already added: {}'.format(address))
+        if weight < 1:
+            raise ValueError('weight must be at least 1.')
+        self._slaves[address] = _Slave(address, request, weight, self._timeout_ms if timeout_ms is None else timeout_ms)
+        self._order = self._weighted_order()
+
+    def _weighted_order(self):
+        '''
+        Returns the order of one cycle, by smooth weighted round robin: each
+        slave appears weight times, spread through the cycle.
+        '''
+        slaves = list(self._slaves.values())
+        total = sum(slave.weight for slave in slaves)
+        current = { slave.address: 0 for slave in slaves }
+        order = []
+        for _ in range(total):
+            for slave in slaves:
+                current[slave.address] += slave.weight
+            chosen = max(slaves, key=lambda slave: current[slave.address])
+            current[chosen.address] -= total
+            order.append(chosen)
+        return order
+
+    def _poll(self, slave):
+        master = self._master
+        payload = slave.request() if callable(slave.request) else slave.request
+        payload.addr = slave.address
+        slave.polls += 1
+        start_ns = perf_counter_ns()
+        master.send_payload(payload)
+        deadline = monotonic() + slave.timeout_ms / 1000
+        reply = None
+        while reply is None:
+            timeout_ms = (deadline - monotonic()) * 1000
+            if timeout_ms <= 0:
+                break
+            try:
+                frame = master.receive_payload(seq=payload.seq, timeout_ms=timeout_ms)
+            except ValueError:
+                break
+            if frame.addr == slave.address | schema.REPLY_FLAG:
+                reply = frame
+            elif frame.addr != slave.address:
+                # not the request's own echo, but a reply from the wrong slave
+                self._log.error('reply to slave {} from address {}: {}'.format(slave.address, frame.addr, frame))
+                slave.errors += 1
+        if reply is None:
+            slave.timeouts += 1
+            slave.failures += 1
+            if not slave.down and slave.failures >= self._max_failures:
+                slave.down = True
+                self._log.warning('slave {} is down after {} missed replies.'.format(slave.address, slave.failures))
+            return None
+        slave.latency.add(perf_counter_ns() - start_ns)
+        slave.replies += 1
+        slave.failures = 0
+        if slave.down:
+            slave.down = False
+            self._log.info('slave {} is up.'.format(slave.address))
+        return reply
+
+    def cycle(self):
+        '''
+        Poll every slave once per unit of its weight, returning a list of
+        (address, reply) in the order polled, the reply None if none arrived
+        in time. A slave marked down is polled only on every retry_cycles-th
+        cycle, and then once.
+        '''
+        start_ns = perf_counter_ns()
+        retry = self._cycles % self._retry_cycles == 0
+        self._cycles += 1
+        results = []
+        retried = set()
+        for slave in self._order:
+            if slave.down:
+                if not retry or slave.address in retried:
+                    continue
+                retried.add(slave.address)
+            results.append((slave.address, self._poll(slave)))
+        self._cycle_time.add(perf_counter_ns() - start_ns)
+        return results
+
+    def broadcast(self, payload):
+        '''
+        Send a Payload to every slave on the bus, none of which replies.
+        '''
+        payload.addr = schema.BROADCAST_ADDRESS
+        self._master.send_payload(payload)
+
+    def reset_stats(self):
+        self._cycle_time = Histogram()
+        for slave in self._slaves.values():
+            slave.reset_stats()
+
+    def stats(self):
+        '''
+        Returns a dict of the number of cycles, a summary of the cycle time, and
+        for each slave by address its polls, replies, timeouts, errors, whether
+        it's down and a summary of its reply latency.
+        '''
+        return {
+            'cycles':     self._cycles,
+            'cycle_time': self._cycle_time.snapshot(),
+            'slaves':     { address: {
+                    'polls':    slave.polls,
+                    'replies':  slave.replies,
+                    'timeouts': slave.timeouts,
+                    'errors':   slave.errors,
+                    'down':     slave.down,
+                    'latency':  slave.latency.snapshot(),
+                } for address, slave in self._slaves.items() },
+        }
+
+#EOF
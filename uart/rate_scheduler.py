@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# A fixed rate scheduler for a control loop. Deadlines are computed from the
+# start time as start + n * period on the monotonic perf_counter_ns() clock,
+# so they never drift however late any one iteration wakes. Waiting sleeps
+# until shortly before the deadline then spins for the remainder, as sleep()
+# alone typically wakes 50-100µs or more late. The spin yields the GIL on
+# each pass, so it doesn't hold up other threads.
+#
+# When an iteration overruns its period the policy decides what follows:
+#
+#     'skip'      missed ticks are dropped and the loop resumes on the next
+#                 deadline still in the future, keeping to the grid
+#     'catch_up'  missed ticks are run back to back, without waiting, until
+#                 the loop is back on schedule, but at most max_catch_up of
+#                 them: after a long stall the rest are dropped as by 'skip',
+#                 rather than followed by a burst of back to back iterations
+#
+
+import time
+from time import perf_counter_ns
+
+from uart.stats import Histogram
+
+class RateScheduler:
+    '''
+    :param rate_hz:   the loop rate
+    :param overrun:   the policy when an iteration overruns, 'skip' or 'catch_up'
+    :param spin_us:   how long before each deadline to stop sleeping and spin
+    :param max_catch_up:  for 'catch_up', the most missed ticks run back to back
+    '''
+    OVERRUN_POLICIES = ('skip', 'catch_up')
+
+    def __init__(self, rate_hz, overrun='skip', spin_us=300, max_catch_up=1):
+        if rate_hz <= 0:
+            raise ValueError('rate must be positive.')
+        if overrun not in RateScheduler.OVERRUN_POLICIES:
+            raise ValueError('overrun policy must be one of: {}'.format(', '.join(RateScheduler.OVERRUN_POLICIES)))
+        if max_catch_up < 1:
+            raise ValueError('max_catch_up must be at least 1.')
+        self._period_ns = int(round(1e9 / rate_hz))
+        self._rate_hz   = rate_hz
+        self._overrun   = overrun
+        self._spin_ns   = int(spin_us * 1000)
+        self._max_catch_up = max_catch_up
+        self._start_ns  = None
+        self._tick      = 0
+        self.reset_stats()
+
+    @property
+    def period_ns(self):
+        return self._period_ns
+
+    def start(self):
+        '''
+        Start the schedule now; the first deadline is one period from now.
+        This is called by the first wait() if not called beforehand.
+        '''
+        self._start_ns = perf_counter_ns()
+        self._tick = 0
+
+    def wait(self):
+        '''
+        Wait until the next deadline, returning how late the wait returned in
+        nanoseconds. If the deadline has already passed the overrun policy
+        applies.
+        '''
+        if self._start_ns is None:
+            self.start()
+        self._tick += 1
+        deadline = self._start_ns + self._tick * self._period_ns
+        now = perf_counter_ns()
+        if now > deadline:
+            # the iteration overran its period
+            self._overruns += 1
+            missed = (now - deadline) // self._period_ns + 1
+            if self._overrun == 'skip':
+                # drop this tick and any others passed, waiting for the next deadline on the grid
+                self._skipped += missed
+                self._tick += missed
+                deadline = self._start_ns + self._tick * self._period_ns
+            else:
+                # catch up: run at once, dropping any ticks passed beyond the most to be caught up
+                if missed > self._max_catch_up:
+                    dropped = missed - self._max_catch_up
+                    self._skipped += dropped
+                    self._tick += dropped
+                    deadline = self._start_ns + self._tick * self._period_ns
+                self._late += 1
+                lateness = now - deadline
+                self._jitter.add(lateness)
+                return lateness
+        remaining = deadline - now
+        if remaining > self._spin_ns:
+            time.sleep((remaining - self._spin_ns) / 1e9)
+        while True:
+            now = perf_counter_ns()
+            if now >= deadline:
+                break
+            time.sleep(0) # releases the GIL, so other threads (e.g., a UART manager's) aren't starved
+        lateness = now - deadline
+        self._jitter.add(lateness)
+        return lateness
+
+    def reset_stats(self):
+        '''
+        Clear the jitter histogram and the overrun counters.
+        '''
+        self._jitter   = Histogram()
+        self._overruns = 0 # iterations that ran past their period
+        self._skipped  = 0 # ticks dropped, by 'skip' or beyond the catch-up limit
+        self._late     = 0 # ticks run late by the 'catch_up' policy
+
+    def stats(self):
+        '''
+        Returns a dict of the rate, overrun policy, number of ticks, overruns,
+        ticks skipped or run late, and a summary of the jitter, how late each
+        tick started.
+        '''
+        return {
+            'rate_hz':  self._rate_hz,
+            'overrun':  self._overrun,
+            'ticks':    self._jitter.count,
+            'overruns': self._overruns,
+            'skipped':  self._skipped,
+            'late':     self._late,
+            'jitter':   self._jitter.snapshot(),
+        }
+
+#EOF
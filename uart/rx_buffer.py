@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# A preallocated receive buffer used for sync-header framing by the UART
+# managers. Bytes are read straight into the buffer with readinto(), headers
+# are located by offset, frames are decoded in place from the buffer and
+# consumed by advancing an index. The unconsumed tail is only moved back to
+# the start of the buffer when there's no room left behind it, which is at
+# most a partial frame, so neither a clean stream nor resynchronising after
+# noise ever copies the whole buffer.
+#
+# Given an address, as for a slave on a bus, frames not addressed to it (or
+# broadcast) are skipped by their length without being decoded.
+#
+# A stray sync header, e.g., in noise, gives a frame length from whatever
+# type byte follows it, up to that of the largest aggregate. So that what
+# follows isn't held up waiting for bytes that may never arrive, a partial
+# frame is skipped as a resync once a complete, valid frame follows its
+# header within it.
+#
+
+from time import perf_counter_ns
+
+from uart import schema
+from uart.payload import Payload, Aggregate, CRCError
+
+HEADER_SIZE    = len(Payload.SYNC_HEADER)
+MIN_FRAME_SIZE = HEADER_SIZE + 2 + Payload.CRC_SIZE # header + seq + type + crc, the least any frame can be
+
+class RxBuffer:
+    def __init__(self, capacity=4096, log=None, delta=None, stats=None, address=None):
+        '''
+        :param capacity:  the size of the preallocated buffer in bytes
+        :param log:       an optional Logger for framing errors
+        :param delta:     an optional DeltaState, to decode delta frames
+        :param stats:     an optional Stats, to count frames, errors and discarded bytes
+        :param address:   if provided, only frames addressed to this (or broadcast) are returned
+        '''
+        if capacity < 2 * Aggregate.MAX_PACKET_SIZE:
+            raise ValueError('capacity must hold at least two of the largest packets.')
+        self._log    = log
+        self._delta  = delta
+        self._stats  = stats
+        self._address = address
+        self._buffer = bytearray(capacity)
+        self._view   = memoryview(self._buffer)
+        self._views  = {} # offset: view of the buffer from the offset, for readinto()
+        self._capacity = capacity
+        self._start  = 0 # index of the first unconsumed byte
+        self._end    = 0 # index one past the last received byte
+        self._wanted = 0 # unconsumed bytes needed before next_frame() can progress
+        self._length = 0 # the length of the partial frame at _start, once known
+        self._scanned = 0 # the index before which a partial frame holds no valid frame
+
+    def __len__(self):
+        '''
+        Returns the number of unconsumed bytes.
+        '''
+        return self._end - self._start
+
+    def clear(self):
+        if self._stats is not None:
+            self._stats.count('bytes_discarded', self._end - self._start)
+        self._start = 0
+        self._end   = 0
+        self._wanted = 0
+        self._length = 0
+        self._scanned = 0
+
+    def _make_room(self):
+        '''
+        Ensure there is free space after the last received byte, moving the
+        unconsumed tail to the front if necessary. If the buffer is full of
+        unconsumed bytes the oldest half is dropped.
+        '''
+        if self._end < self._capacity:
+            return
+        pending = self._end - self._start
+        if pending >= self._capacity:
+            drop = pending // 2
+            if self._log:
+                self._log.error('receive buffer full; discarding {} bytes.'.format(drop))
+            if self._stats is not None:
+                self._stats.count('bytes_discarded', drop)
+            self._start += drop
+            pending -= drop
+            self._wanted = 0
+            self._length = 0
+            self._scanned = 0
+        self._buffer[:pending] = self._view[self._start:self._end]
+        self._scanned = max(0, self._scanned - self._start)
+        self._start = 0
+        self._end   = pending
+
+    def readinto(self, source):
+        '''
+        Read whatever is available from source (anything with a readinto()
+        method, e.g., a non-blocking io.FileIO) directly into the buffer.
+        Returns the number of bytes read, zero if nothing was available.
+        '''
+        end = self._end
+        if end == self._capacity:
+            self._make_room()
+            end = self._end
+        view = self._views.get(end)
+        if view is None:
+            view = self._views[end] = self._view[end:]
+        count = source.readinto(view)
+        if not count:
+            return 0
+        self._end = end + count
+        return count
+
+    def write(self, data):
+        '''
+        Append bytes to the buffer, for data that arrives already read.
+        '''
+        end = self._end + len(data)
+        if end <= self._capacity:
+            # the usual case, a read that fits behind what's buffered
+            self._buffer[self._end:end] = data
+            self._end = end
+            return
+        data = memoryview(data)
+        while data:
+            self._make_room()
+            count = min(len(data), self._capacity - self._end)
+            self._buffer[self._end:self._end + count] = data[:count]
+            self._end += count
+            data = data[count:]
+
+    def next_frame(self):
+        '''
+        Synchronizes on the sync header and returns the first valid Payload
+        (or Aggregate) buffered, or None if no complete frame is available yet.
+
+        A partial frame is parsed once: until the bytes it needs have arrived,
+        further calls return at once, so a frame arriving in many small reads
+        isn't rescanned for each. After a corrupt frame, or a partial frame
+        followed by a complete one within its length, the search resumes at
+        the next sync header following its own.
+        '''
+        end = self._end
+        if end - self._start < self._wanted:
+            return None
+        length = self._length
+        self._length = 0
+        buf = self._buffer
+        header = Payload.SYNC_HEADER
+        stats = self._stats
+        idx = self._start if length else buf.find(header, self._start, end)
+        while True:
+            if idx == -1:
+                # not found: keep only enough bytes to possibly start the next header
+                start = max(self._start, end - (HEADER_SIZE - 1))
+                if stats is not None:
+                    stats.count('bytes_discarded', start - self._start)
+                self._start = start
+                self._wanted = MIN_FRAME_SIZE
+                return None
+            if stats is not None:
+                stats.count('bytes_discarded', idx - self._start)
+            self._start = idx
+            try:
+                if not length:
+                    length = Payload.frame_length(buf, idx, end)
+                    if length is None:
+                        # not enough bytes yet to know the length: wait for another
+                        self._wanted = end - idx + 1
+                        return None
+                if end - idx < length:
+                    scanned = self._scanned
+                    if buf.find(header, idx + 1 if scanned <= idx else scanned, end) == -1:
+                        # the usual case, no header within the frame: wait for the rest,
+                        # or the least a frame whose header begins in the last byte needs
+                        self._scanned = end - (HEADER_SIZE - 1)
+                        self._wanted = min(length, end - idx + MIN_FRAME_SIZE - 1)
+                        self._length = length
+                        return None
+                    later = self._later_frame(idx, length, end)
+                    if later == -1:
+                        # not enough bytes yet for a full packet: wait for them
+                        self._length = length
+                        return None
+                    # a stray header, whose length would hold up the frame that follows
+                    if self._log:
+                        self._log.error("receive error: stray sync header. Resyncing...")
+                    if stats is not None:
+                        stats.count('resyncs')
+                    length = 0
+                    idx = later
+                    continue
+                if self._address is not None:
+                    addr = Payload.frame_address(buf, idx, length)
+                    if addr != self._address and addr != schema.BROADCAST_ADDRESS:
+                        # for another slave, a reply, or unaddressed
+                        self._start = idx + length
+                        length = 0
+                        idx = buf.find(header, self._start, end)
+                        continue
+                if stats is None:
+                    payload = Payload.unpack_from(buf, idx, self._delta)
+                else:
+                    start_ns = perf_counter_ns()
+                    payload = Payload.unpack_from(buf, idx, self._delta)
+                    stats.record('decode', perf_counter_ns() - start_ns)
+                    stats.count('frames')
+                self._start = idx + length
+                # nothing can follow until at least the least frame has
+                self._wanted = MIN_FRAME_SIZE
+                return payload
+            except ValueError as e:
+                if self._log:
+                    self._log.error("receive error: {}. Resyncing...".format(e))
+                if stats is not None:
+                    stats.count('resyncs')
+                    stats.count('bytes_discarded')
+                    if isinstance(e, CRCError):
+                        stats.count('crc_failures')
+                # skip the false header's first byte and jump to the next header
+                self._start = idx + 1
+                length = 0
+                idx = buf.find(header, self._start, end)
+
+    def _later_frame(self, idx, length, end):
+        '''
+        Returns the index of a complete, valid frame within the partial frame
+        of length bytes at idx, or -1 if there's none (yet), setting the bytes
+        wanted before looking again. The bytes already searched, which hold no
+        valid frame, aren't again.
+        '''
+        buf = self._buffer
+        header = Payload.SYNC_HEADER
+        wanted = length
+        later = buf.find(header, max(idx + 1, self._scanned), end)
+        while later != -1:
+            try:
+                later_length = Payload.frame_length(buf, later, end)
+            except ValueError:
+                later_length = 0 # an unknown type: not a header
+            if later_length is None:
+                wanted = end - idx + 1
+                break
+            if later_length:
+                if end - later < later_length:
+                    wanted = min(wanted, later - idx + later_length)
+                    break
+                if Payload.frame_valid(buf, later, later_length):
+                    return later
+            later = buf.find(header, later + 1, end)
+        if later == -1:
+            # a header may yet begin in the last byte
+            wanted = min(wanted, end - idx + MIN_FRAME_SIZE - 1)
+            later = end - (HEADER_SIZE - 1)
+        self._scanned = later
+        self._wanted = wanted
+        return -1
+
+#EOF
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# The registry of Payload layouts. This module is shared by the master (uart/)
+# and the MicroPython slave (upy/) and the two copies must remain identical.
+#
+# Every frame carries a type byte following its sequence number, identifying
+# the layout of the body that follows:
+#
+#     SYNC_HEADER | seq | type | body | CRC8
+#
+# A registered command is identified by its type alone, so its two character
+# code isn't sent and its body is just its own fields; an "AK" with no fields
+# is five bytes. Any command that isn't registered is sent using one of the
+# generic types, whose body is the two character command followed by four
+# values: float32 as in the original protocol, float16, or int16 fixed point.
+#
+# A field with a scale is sent as fixed point, i.e., round(value * scale) in
+# an integer format, and is decoded as value / scale.
+#
+# Several frames may be sent as one aggregate frame of AGGREGATE_TYPE, whose
+# records are each a type byte and body as above (see Aggregate in payload.py).
+#
+# The two high bits of the type byte are flags: DELTA_FLAG (delta.py) and
+# ADDRESS_FLAG, for a bus with several slaves. An addressed frame carries the
+# address of the slave it's for in a byte before its CRC:
+#
+#     SYNC_HEADER | seq | type + 0x40 | body | address | CRC8
+#
+# A slave replies with its own address plus REPLY_FLAG, so that other slaves,
+# and the slave itself, never take a reply for a request. Nothing replies to
+# a frame for BROADCAST_ADDRESS. Addressed frames are always sent in full.
+#
+# Type numbers are part of the protocol, so once assigned must not change.
+#
+
+import struct
+
+GENERIC_TYPE   = 0x00  # unregistered commands: 2 char cmd + 4 floats
+MAX_TYPE       = 0x3E  # type numbers above this are reserved
+AGGREGATE_TYPE = 0x3F  # several records behind one header and CRC
+MAX_SIZE       = 125   # largest seq + type + body, so a frame fits in 128 bytes
+TYPE_MASK      = 0x3F  # the type bits of the type byte, below the flags
+ADDRESS_FLAG   = 0x40  # on the type byte: an address byte precedes the CRC
+ADDRESS_SIZE   = 1
+MAX_ADDRESS    = 0x7E  # slave addresses are 0 to MAX_ADDRESS
+BROADCAST_ADDRESS = 0x7F # for every slave, none of which replies
+REPLY_FLAG     = 0x80  # on the address byte: a reply from that address
+
+class Schema:
+    '''
+    The layout of one type of frame: its type number, its command (None for
+    the generic types), the names of its fields, their struct format and the
+    scale of any fixed point fields.
+    '''
+    def __init__(self, type_id, cmd, fields, fmt, scale=None):
+        self.type_id = type_id
+        self.cmd     = cmd
+        self.fields  = tuple(fields)
+        # one scale per field (None if not fixed point), or None if no field is
+        if scale is None or isinstance(scale, (int, float)):
+            scale = None if scale is None else (scale,) * len(self.fields)
+        elif len(scale) != len(self.fields):
+            raise ValueError('expected {} scales, not {}.'.format(len(self.fields), len(scale)))
+        self.scales  = None if scale is None else tuple(scale)
+        # the struct format and size of each field, e.g., 'f' and 4
+        self.field_formats = self._split(fmt)
+        self.field_sizes   = tuple(struct.calcsize('<' + code) for code in self.field_formats)
+        # the (least, greatest) integer each fixed point field may send, None if not fixed point
+        self.limits  = None if self.scales is None else tuple(None if scale is None else self._limits(code, size)
+                for code, size, scale in zip(self.field_formats, self.field_sizes, self.scales))
+        # the format of everything between the sync header and the CRC
+        self.format  = '<BB' + ('2s' if cmd is None else '') + fmt
+        self.size    = struct.calcsize(self.format)
+        # a precompiled Struct where available (not under MicroPython)
+        self.packer  = struct.Struct(self.format) if hasattr(struct, 'Struct') else None
+        # the format of a record within an aggregate frame: the type byte and body, no seq
+        self.record_format = '<' + self.format[2:]
+        self.record_packer = struct.Struct(self.record_format) if self.packer is not None else None
+        if len(self.field_formats) != len(self.fields):
+            raise ValueError('format {} does not match fields {}.'.format(fmt, self.fields))
+        if self.size > MAX_SIZE:
+            raise ValueError('layout of {} bytes exceeds the maximum of {}.'.format(self.size, MAX_SIZE))
+
+    @staticmethod
+    def _split(fmt):
+        '''
+        Splits a struct format into one format per value, e.g., '2s3f' into
+        ('2s', 'f', 'f', 'f').
+        '''
+        formats = []
+        count = ''
+        for char in fmt:
+            if char.isdigit():
+                count += char
+            elif char == 's':
+                formats.append(count + char)
+                count = ''
+            else:
+                formats.extend([char] * int(count or 1))
+                count = ''
+        return tuple(formats)
+
+    @staticmethod
+    def _limits(code, size):
+        '''
+        Returns the least and greatest integers of a struct integer format.
+        '''
+        if code not in 'bBhHiIlLqQ':
+            raise ValueError('a scaled field must have an integer format, not {}.'.format(code))
+        if code.isupper():
+            return 0, (1 << (8 * size)) - 1
+        return -(1 << (8 * size - 1)), (1 << (8 * size - 1)) - 1
+
+    def __repr__(self):
+        return 'Schema(type={}, cmd={}, fields={}, format={}, scales={})'.format(
+                self.type_id, self.cmd, self.fields, self.format, self.scales)
+
+    def encode(self, values):
+        '''
+        Returns the values as sent, with fixed point fields scaled and rounded.
+        Raises a ValueError if a fixed point field is out of range of its format.
+        '''
+        encoded = []
+        for name, value, scale, limits in zip(self.fields, values, self.scales, self.limits):
+            if scale is not None:
+                value = round(value * scale)
+                if value < limits[0] or value > limits[1]:
+                    raise ValueError("{} out of range of its fixed point format.".format(name))
+            encoded.append(value)
+        return tuple(encoded)
+
+    def decode(self, values):
+        '''
+        Returns the values as received, with fixed point fields unscaled.
+        '''
+        return tuple(value if scale is None else value / scale for value, scale in zip(values, self.scales))
+
+_by_type = {}
+_by_cmd  = {}
+
+# the generic layouts, in which a sender may choose to send any unregistered command
+_GENERIC_FIELDS = ('pfwd', 'sfwd', 'paft', 'saft')
+GENERIC       = Schema(GENERIC_TYPE, None, _GENERIC_FIELDS, 'ffff')          # float32
+try:
+    GENERIC_HALF = Schema(0x01, None, _GENERIC_FIELDS, 'eeee')               # float16, 3 significant digits
+except (ValueError, TypeError):
+    # a MicroPython port whose struct lacks 'e': half float frames are
+    # unavailable, and received as of an unknown type
+    GENERIC_HALF = None
+GENERIC_FIXED = Schema(0x02, None, _GENERIC_FIELDS, 'hhhh', scale=100)       # int16, 0.01 in ±327.67
+for _schema in (GENERIC, GENERIC_HALF, GENERIC_FIXED):
+    if _schema is not None:
+        _by_type[_schema.type_id] = _schema
+
+def register(type_id, cmd, fields=(), fmt='', scale=None):
+    '''
+    Register the layout of a command, returning its Schema. The same
+    registrations must be made on both ends of the link.
+
+    :param type_id:  the type number sent on the wire, from 1 to MAX_TYPE
+    :param cmd:      the two character command
+    :param fields:   the names of the fields
+    :param fmt:      the struct format of the fields, e.g., '16f', without byte order
+    :param scale:    for fixed point fields in an integer format, the scale of
+                     every field or a sequence of one per field (None if not scaled)
+    '''
+    cmd = cmd.encode('ascii') if isinstance(cmd, str) else bytes(cmd)
+    if len(cmd) != 2:
+        raise ValueError('command must be two characters: {}'.format(cmd))
+    if not 0 < type_id <= MAX_TYPE:
+        raise ValueError('type must be between 1 and {}.'.format(MAX_TYPE))
+    if type_id in _by_type or cmd in _by_cmd:
+        raise ValueError('type {} or command {} already registered.'.format(type_id, cmd))
+    schema = Schema(type_id, cmd, fields, fmt, scale)
+    _by_type[type_id] = schema
+    _by_cmd[cmd] = schema
+    return schema
+
+def for_type(type_id):
+    '''
+    Returns the Schema for a type number, or None if it's unknown.
+    '''
+    return _by_type.get(type_id)
+
+def for_cmd(cmd):
+    '''
+    Returns the Schema for a command (bytes), the generic Schema if the
+    command isn't registered.
+    '''
+    return _by_cmd.get(cmd, GENERIC)
+
+# the standard layouts ┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈
+
+# acknowledgement, no fields
+register(0x10, 'AK')
+# telemetry, sixteen float channels
+register(0x11, 'TM', tuple('ch{}'.format(i) for i in range(16)), '16f')
+# a request for the slave's garbage collection stats, no fields
+register(0x12, 'GC')
+# the reply: collections after replies, their average and maximum duration in
+# µs, and the lowest and highest free heap in bytes (see upy/gc_policy.py)
+register(0x13, 'GS', ('collections', 'avg_us', 'max_us', 'free_low', 'free_high'), '5I')
+# a request for the slave's performance counters, no fields
+register(0x14, 'ST')
+# the reply: its counters since started or reset (see UartSlaveBase.stats()),
+# a single frame, so that ST may be sent within an aggregate
+register(0x15, 'SS', ('frames', 'replies', 'crc_failures', 'resyncs', 'rx_timeouts', 'rx_high_water',
+        'loops_per_s', 'handled', 'handler_avg_us', 'handler_max_us', 'handler_errors', 'unhandled'), '12I')
+
+#EOF
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# Optional instrumentation of transactions: a streaming histogram of the time
+# spent in each phase, timed with perf_counter_ns(), and counters of framing
+# errors. A Stats instance is passed to the UART managers and RxBuffer, which
+# record into it only if provided, so when disabled this costs a test of None
+# per phase.
+#
+# The phases are:
+#
+#     encode       packing the Payload into the transmit buffer
+#     write        writing it to the port
+#     flush        waiting for the port to drain (tcdrain)
+#     first_byte   from the end of sending until the first byte of a reply
+#     decode       decoding a received frame
+#     transaction  a whole UARTMaster request and reply
+#
+
+class Histogram:
+    '''
+    A streaming histogram of durations in nanoseconds, in log-linear buckets
+    (four per power of two, so within 25%), so that recording is constant
+    time and memory.
+    '''
+    def __init__(self):
+        self.buckets = [0] * 256
+        self.count = 0
+        self.total = 0
+        self.min   = None
+        self.max   = 0
+
+    @staticmethod
+    def _index(ns):
+        bits = ns.bit_length()
+        if bits < 3:
+            return ns
+        # the power of two, then the two bits following the leading one
+        return (bits << 2) | ((ns >> (bits - 3)) & 3)
+
+    @staticmethod
+    def _bound(index):
+        '''
+        Returns the upper bound (exclusive) of a bucket in nanoseconds.
+        '''
+        if index < 4:
+            return index + 1
+        bits = index >> 2
+        return (1 << (bits - 1)) + ((index & 3) + 1) * (1 << (bits - 3))
+
+    def add(self, ns):
+        self.buckets[Histogram._index(ns)] += 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, p):
+        '''
+        Returns the upper bound in nanoseconds of the bucket holding the p-th
+        percentile (but never more than the maximum), or None if empty.
+        '''
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(Histogram._bound(i), self.max)
+        return self.max
+
+    def snapshot(self):
+        if not self.count:
+            return { 'count': 0 }
+        return {
+            'count':   self.count,
+            'mean_us': self.total / self.count / 1000,
+            'min_us':  self.min / 1000,
+            'p50_us':  self.percentile(50) / 1000,
+            'p90_us':  self.percentile(90) / 1000,
+            'p99_us':  self.percentile(99) / 1000,
+            'max_us':  self.max / 1000,
+            # the count of durations in each non-empty bucket, by its upper bound
+            'buckets_us': { Histogram._bound(i) / 1000: n for i, n in enumerate(self.buckets) if n },
+        }
+
+class Stats:
+    '''
+    Phase histograms and counters for one link.
+    '''
+    PHASES   = ('encode', 'write', 'flush', 'first_byte', 'decode', 'transaction')
+    COUNTERS = ('frames', 'crc_failures', 'resyncs', 'timeouts', 'rx_timeouts', 'bytes_discarded', 'errors')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        '''
+        Clear all histograms and counters.
+        '''
+        self.phases   = { phase: Histogram() for phase in Stats.PHASES }
+        self.counters = dict.fromkeys(Stats.COUNTERS, 0)
+
+    def record(self, phase, ns):
+        self.phases[phase].add(ns)
+
+    def count(self, counter, n=1):
+        self.counters[counter] += n
+
+    def snapshot(self):
+        '''
+        Returns a dict of the counters and of a summary of each phase.
+        '''
+        return {
+            'counters': dict(self.counters),
+            'phases':   { phase: histogram.snapshot() for phase, histogram in self.phases.items() },
+        }
+
+#EOF
@@ -7,18 +7,39 @@
 #
 # author:   Murray Altheim
 # created:  2025-06-23
-# modified: 2025-06-23
+# modified: 2026-10-17
 
+import io
+import os
+import select
 import serial
 import time
+from time import perf_counter_ns
 from colorama import init, Fore, Style
 init()
 
-from uart.payload import Payload
+from uart.payload import Aggregate
+from uart.rx_buffer import RxBuffer
 from core.logger import Logger, Level
 
 class SyncUARTManager:
-    def __init__(self, port='/dev/serial0', baudrate=115200, tx_timeout_ms=10, rx_timeout_ms=25):
+    def __init__(self, port='/dev/serial0', baudrate=115200, tx_timeout_ms=10, rx_timeout_ms=25, busy_wait=False, spin_us=0, tx_delta=None, stats=None):
+        '''
+        :param port:           the serial port
+        :param baudrate:       the baud rate
+        :param tx_timeout_ms:  the serial port timeout
+        :param rx_timeout_ms:  how long a partial packet may wait for the rest of its bytes
+        :param busy_wait:      if True, spin while waiting for a reply rather than blocking
+                               in the kernel. This has the lowest latency, by the cost of a
+                               wakeup from poll(), so is the choice for latency-critical use,
+                               but burns a whole core for as long as the reply takes
+        :param spin_us:        if not busy-waiting, spin (yielding the CPU on each pass)
+                               for up to this long after a send before blocking, so that a
+                               reply arriving within it is read as promptly as by busy_wait,
+                               for the CPU time of the spin
+        :param tx_delta:       an optional DeltaState, to send Payloads as delta frames
+        :param stats:          an optional Stats, to time each phase of a transaction
+        '''
         self._log = Logger('sync-uart-mgr', Level.INFO)
         self._port_name  = port
         self._baudrate   = baudrate
@@ -26,75 +47,124 @@ class SyncUARTManager:
         self._rx_timeout_s = rx_timeout_ms / 1000
         self._log.info('TX timeout: {}ms; RX timeout: {}ms'.format(tx_timeout_ms, rx_timeout_ms))
         self._serial     = None
+        self._rx_file    = None
+        self._busy_wait  = busy_wait
+        self._spin_s     = spin_us / 1_000_000
+        self._spin_until = 0.0 # when the spin following the last send ends
+        self._tx_delta   = tx_delta
+        self._stats      = stats
+        self._sent_ns    = None # when the last send completed, if instrumented
+        self._poller     = None
         self._log.info('using port {} at {} baud.'.format(port, baudrate))
         # Buffer for sync-header-based framing
-        self._rx_buffer  = bytearray()
+        self._rx_buffer  = RxBuffer(log=self._log, stats=stats)
+        # Payloads and Aggregates are encoded into this one reused transmit buffer
+        self._tx_buffer  = bytearray(Aggregate.MAX_PACKET_SIZE)
+        self._tx_view    = memoryview(self._tx_buffer)
         self._log.info('ready.')
 
     def open(self):
         if self._serial is None or not self._serial.is_open:
             self._serial = serial.Serial(self._port_name, self._baudrate, timeout=self._tx_timeout_s)
+            # the port is opened non-blocking, so this reads whatever is available straight into the RX buffer
+            self._rx_file = io.FileIO(self._serial.fileno(), 'rb', closefd=False)
+            self._poller = select.poll()
+            self._poller.register(self._serial.fileno(), select.POLLIN)
             self._log.info("serial port {} opened.".format(self._port_name))
             
     def close(self):
         if self._serial and self._serial.is_open:
             self._serial.close()
             self._log.info("serial port closed.")
+        self._rx_file = None
+        self._poller  = None
 
     def send_packet(self, payload):
-        packet_bytes = payload.to_bytes()
-        # ensure sync header is present for robust protocol
-        if not packet_bytes.startswith(Payload.SYNC_HEADER):
-            packet_bytes = Payload.SYNC_HEADER + packet_bytes[len(Payload.SYNC_HEADER):]
-        self._serial.write(packet_bytes)
+        if self._stats is not None:
+            return self._send_packet_timed(payload)
+        count = payload.pack_into(self._tx_buffer, 0, self._tx_delta)
+        self._write(self._tx_view if count == len(self._tx_buffer) else self._tx_view[:count])
         self._serial.flush()
+        if self._spin_s:
+            self._spin_until = time.monotonic() + self._spin_s
         # self._log.info(Style.DIM + "sent: {}".format(repr(payload)))
 
-    def receive_packet(self):
-        '''Reads bytes, synchronizes on sync header, and returns the first valid Payload found.'''
-        start_time = time.time()
+    def _send_packet_timed(self, payload):
+        stats = self._stats
+        start_ns = perf_counter_ns()
+        count = payload.pack_into(self._tx_buffer, 0, self._tx_delta)
+        encoded_ns = perf_counter_ns()
+        self._write(self._tx_view if count == len(self._tx_buffer) else self._tx_view[:count])
+        written_ns = perf_counter_ns()
+        self._serial.flush()
+        self._sent_ns = perf_counter_ns()
+        if self._spin_s:
+            self._spin_until = time.monotonic() + self._spin_s
+        stats.record('encode', encoded_ns - start_ns)
+        stats.record('write', written_ns - encoded_ns)
+        stats.record('flush', self._sent_ns - written_ns)
+
+    def _write(self, view):
+        '''
+        Write the bytes directly to the non-blocking port, waiting up to the TX
+        timeout whenever the kernel buffer is full. Unlike Serial.write() this
+        doesn't copy the bytes first.
+        '''
+        fd = self._serial.fileno()
+        while view:
+            try:
+                view = view[os.write(fd, view):]
+            except BlockingIOError:
+                if not select.select([], [fd], [], self._tx_timeout_s)[1]:
+                    raise TimeoutError('UART TX timeout.')
+
+    def receive_packet(self, timeout_ms=None):
+        '''
+        Reads bytes, synchronizes on sync header, and returns the first valid Payload found.
+        If timeout_ms is provided this returns None if no valid Payload arrives in time,
+        otherwise it waits indefinitely.
+        '''
+        start_time = time.monotonic()
+        deadline = None if timeout_ms is None else start_time + timeout_ms / 1000
         while True:
-            if self._serial.in_waiting:
-                data = self._serial.read(self._serial.in_waiting)
-                self._rx_buffer += data
-                start_time = time.time()
-            idx = self._rx_buffer.find(Payload.SYNC_HEADER)
-            if idx == -1:
-                # not found: trim buffer if too large
-                if len(self._rx_buffer) > len(Payload.SYNC_HEADER):
-                    self._rx_buffer = self._rx_buffer[-(len(Payload.SYNC_HEADER)-1):]
+            if self._rx_buffer.readinto(self._rx_file):
+                start_time = time.monotonic()
+                if self._sent_ns is not None:
+                    self._stats.record('first_byte', perf_counter_ns() - self._sent_ns)
+                    self._sent_ns = None
+            payload = self._rx_buffer.next_frame()
+            if payload is not None:
+                return payload
+            now = time.monotonic()
+            if deadline is not None and now > deadline:
+                if self._stats is not None:
+                    self._stats.count('timeouts')
+                return None
+            if now - start_time > self._rx_timeout_s:
+                if len(self._rx_buffer):
+                    self._log.error('UART RX timeout; incomplete packet, clearing buffer.')
+                    if self._stats is not None:
+                        self._stats.count('rx_timeouts')
+                    self._rx_buffer.clear()
+                start_time = now
+            if self._busy_wait:
                 # tight loop, no sleep
-                if time.time() - start_time > self._rx_timeout_s:
-                    self._log.error("UART RX timeout; sync header not found, clearing buffer.")
-                    self._rx_buffer = bytearray()
-                    start_time = time.time()
                 continue
-            # found sync header: do we have a full packet?
-            if len(self._rx_buffer) - idx >= Payload.PACKET_SIZE:
-                packet = self._rx_buffer[idx: idx + Payload.PACKET_SIZE]
-                self._rx_buffer = self._rx_buffer[idx + Payload.PACKET_SIZE:]
-                try:
-                    payload = Payload.from_bytes(packet)
-                    return payload
-                except ValueError as e:
-                    self._log.error("receive error: {}. Resyncing...".format(e))
-                    # remove just the first header byte to attempt resync
-                    self._rx_buffer = self._rx_buffer[idx+1:]
-                    continue
-            else:
-                # not enough bytes yet for a full packet
-                # tight loop, no sleep
-                if time.time() - start_time > self._rx_timeout_s:
-                    self._log.error('UART RX timeout; incomplete packet, clearing buffer.')
-                    self._rx_buffer = bytearray()
-                    start_time = time.time()
+            if now < self._spin_until:
+                # spin, but let the kernel and any other process (e.g., the far end of a pty) run
+                os.sched_yield()
                 continue
+            # block until bytes arrive, a partial packet times out or the deadline passes
+            wake_time = start_time + self._rx_timeout_s if len(self._rx_buffer) else None
+            if deadline is not None:
+                wake_time = deadline if wake_time is None else min(wake_time, deadline)
+            self._poller.poll(None if wake_time is None else max(0.0, (wake_time - now) * 1000))
 
     def receive_values(self):
-        '''Convenience method to receive a Payload and return the tuple (cmd, pfwd, sfwd, paft, saft).'''
+        '''Convenience method to receive a Payload and return the tuple (cmd, *values).'''
         payload = self.receive_packet()
         if payload:
-            return (payload.cmd.decode('ascii'), payload.pfwd, payload.sfwd, payload.paft, payload.saft)
+            return (payload.cmd.decode('ascii'), *payload.values)
         return None
 
 #EOF
@@ -7,52 +7,120 @@
 #
 # author:   Murray Altheim
 # created:  2025-06-12
-# modified: 2025-06-24
+# modified: 2026-10-17
 
 import time
+import asyncio
+from time import perf_counter_ns
 from typing import Callable, Optional
-from datetime import datetime as dt
 from colorama import init, Fore, Style
 init()
 
 from uart.async_uart_manager import AsyncUARTManager
 from uart.sync_uart_manager import SyncUARTManager
-from uart.payload import Payload
+from uart.payload import Payload, Aggregate
+from uart.delta import DeltaState
+from uart.stats import Stats
+from uart.rate_scheduler import RateScheduler
 from core.logger import Logger, Level
 
 class UARTMaster:
 
     ERROR_PAYLOAD = Payload("ER", -1.0, -1.0, -1.0, -1.0) # singleton error payload
 
-    def __init__(self, port='/dev/serial0', baudrate=115200):
+    def __init__(self, port='/dev/serial0', baudrate=115200, window=1, reply_timeout_ms=50, keyframe_interval=None, use_async=False, instrument=False):
+        '''
+        :param port:              the serial port
+        :param baudrate:          the baud rate
+        :param window:            the number of requests kept in flight by send_receive_pipelined()
+        :param reply_timeout_ms:  how long a pipelined or awaited request waits for its reply before being declared lost
+        :param keyframe_interval: if provided, Payloads are sent as delta frames carrying only changed
+                                  fields, with a full keyframe at least once in this many frames
+        :param use_async:         if True use the AsyncUARTManager, otherwise the SyncUARTManager;
+                                  required by the awaitable methods
+        :param instrument:        if True, time each phase of every transaction and count
+                                  framing errors, as returned by stats()
+        '''
         self._log = Logger('uart-master', Level.INFO)
-        _use_async_uart_manager = False # config?
-        if _use_async_uart_manager:
-            self.uart = AsyncUARTManager(port=port, baudrate=baudrate)
+        if not 1 <= window < Payload.SEQ_MODULUS // 2:
+            raise ValueError('window must be between 1 and {}.'.format(Payload.SEQ_MODULUS // 2 - 1))
+        self._window = window
+        self._reply_timeout_ms = reply_timeout_ms
+        self._seq = 0
+        tx_delta = None if keyframe_interval is None else DeltaState(keyframe_interval)
+        self._stats = Stats() if instrument else None
+        self._scheduler = None
+        self._lock = None # serialises awaited transactions, created on first use
+        if use_async:
+            self.uart = AsyncUARTManager(port=port, baudrate=baudrate, tx_delta=tx_delta, stats=self._stats)
         else:
-            self.uart = SyncUARTManager(port=port, baudrate=baudrate)
+            self.uart = SyncUARTManager(port=port, baudrate=baudrate, tx_delta=tx_delta, stats=self._stats)
         self.uart.open()
         self._log.info('UART master ready at baud rate: {}.'.format(baudrate))
 
+    def stats(self):
+        '''
+        Returns a snapshot of the transaction statistics, a dict of counters and
+        of a summary of the time spent in each phase, or None if not instrumented.
+        '''
+        return None if self._stats is None else self._stats.snapshot()
+
+    def reset_stats(self):
+        '''
+        Clear the transaction statistics.
+        '''
+        if self._stats is not None:
+            self._stats.reset()
+
+    def slave_stats(self):
+        '''
+        Request the slave's performance counters with ST and GC commands, in
+        one aggregate, returning them as a dict (see UartSlaveBase.stats()),
+        along with a 'gc' dict of its garbage collection stats if it has a GC
+        policy, or None if no valid reply arrives.
+        '''
+        stats_reply, gc_reply = self.send_receive_many([ Payload("ST"), Payload("GC") ])
+        if stats_reply is self.ERROR_PAYLOAD:
+            return None
+        if stats_reply.cmd != b'SS':
+            self._log.error("no slave stats in reply: {}".format(stats_reply))
+            return None
+        stats = dict(zip(stats_reply.schema.fields, stats_reply.values))
+        if gc_reply.cmd == b'GS':
+            stats['gc'] = dict(zip(gc_reply.schema.fields, gc_reply.values))
+        return stats
+
+    def _next_seq(self):
+        self._seq = (self._seq + 1) % Payload.SEQ_MODULUS
+        return self._seq
+
     def send_payload(self, payload):
         '''
-        Send a Payload object after converting it to bytes.
+        Send a Payload object, encoded directly into the UART manager's transmit buffer. The Payload is
+        stamped with the next sequence number, which the slave echoes back.
         '''
-        packet_bytes = payload.to_bytes()
-#       self._log.info(f"MASTER TX BYTES: {packet_bytes.hex(' ')}") # TEMP
+        payload.seq = self._next_seq()
         self.uart.send_packet(payload)
         self._log.info(Fore.MAGENTA + "master sent: {}".format(payload))
 
-    def receive_payload(self):
+    def receive_payload(self, seq=None, timeout_ms=None):
         '''
-        Receive a Payload object.
+        Receive a Payload object. If a sequence number is provided, stale replies
+        to earlier (timed out) requests are discarded until the matching one arrives.
+        If a timeout is provided, raises a ValueError if no reply arrives within it.
         '''
-        response_payload = self.uart.receive_packet()
-        if response_payload:
+        deadline = None if timeout_ms is None else time.monotonic() + timeout_ms / 1000
+        while True:
+            if deadline is not None:
+                timeout_ms = max(0.0, (deadline - time.monotonic()) * 1000)
+            response_payload = self.uart.receive_packet(timeout_ms=timeout_ms)
+            if not response_payload:
+                raise ValueError("no valid response received.")
+            if seq is not None and response_payload.seq != seq:
+                self._log.warning("discarding stale reply: {}".format(response_payload))
+                continue
             self._log.info(Fore.MAGENTA + "received: {}".format(response_payload))
             return response_payload
-        else:
-            raise ValueError("no valid response received.")
 
     def send_receive_payload(self, payload):
         '''
@@ -60,19 +128,236 @@ class UARTMaster:
         This method can be used without needing to run the full loop. If an error occurs
         this returns the ERROR_PAYLOAD.
         '''
+        if self._stats is not None:
+            start_ns = perf_counter_ns()
         self.send_payload(payload)
         try:
-            response_payload = self.receive_payload()
-            return response_payload
+            response_payload = self.receive_payload(seq=payload.seq)
         except ValueError as e:
             self._log.error("error during communication: {}".format(e))
+            if self._stats is not None:
+                self._stats.count('errors')
             return self.ERROR_PAYLOAD
+        if self._stats is not None:
+            self._stats.record('transaction', perf_counter_ns() - start_ns)
+        return response_payload
 
-    def run(self, source: Optional[Callable[[], int]] = None):
+    def send_receive_many(self, payloads):
+        '''
+        Send a list of Payloads, of any commands, as a single aggregate frame,
+        i.e., with one sync header, CRC and write for them all, then wait for
+        the slave's aggregate reply and return its Payloads, one per request
+        in request order. If an error occurs, or the reply doesn't answer every
+        request, each is answered with the ERROR_PAYLOAD.
+        '''
+        if self._stats is not None:
+            start_ns = perf_counter_ns()
+        aggregate = Aggregate(payloads, seq=self._next_seq())
+        self.uart.send_packet(aggregate)
+        self._log.info(Fore.MAGENTA + "master sent: {}".format(aggregate))
+        try:
+            response = self.receive_payload(seq=aggregate.seq)
+        except ValueError as e:
+            self._log.error("error during communication: {}".format(e))
+            if self._stats is not None:
+                self._stats.count('errors')
+            return [self.ERROR_PAYLOAD] * len(aggregate)
+        if not isinstance(response, Aggregate) or len(response) != len(aggregate):
+            self._log.error("reply does not answer all {} requests: {}".format(len(aggregate), response))
+            if self._stats is not None:
+                self._stats.count('errors')
+            return [self.ERROR_PAYLOAD] * len(aggregate)
+        if self._stats is not None:
+            self._stats.record('transaction', perf_counter_ns() - start_ns)
+        return list(response.payloads)
+
+    def send_receive_pipelined(self, payloads, window=None):
+        '''
+        Send a sequence of Payloads keeping up to 'window' requests in flight,
+        matching each reply to its request by sequence number. Returns a list
+        of responses in request order; requests whose reply was lost or timed
+        out are answered with the ERROR_PAYLOAD.
+
+        The slave answers strictly in order, so a reply also tells us that any
+        older request still outstanding has been lost.
+        '''
+        window = self._window if window is None else window
+        if not 1 <= window < Payload.SEQ_MODULUS // 2:
+            raise ValueError('window must be between 1 and {}.'.format(Payload.SEQ_MODULUS // 2 - 1))
+        timeout_s = self._reply_timeout_ms / 1000
+        responses = [self.ERROR_PAYLOAD] * len(payloads)
+        in_flight = {} # seq: (index, deadline), in send order
+        next_index = 0
+        lost = 0
+        while next_index < len(payloads) or in_flight:
+            # top up the window
+            while next_index < len(payloads) and len(in_flight) < window:
+                payload = payloads[next_index]
+                payload.seq = self._next_seq()
+                self.uart.send_packet(payload)
+                in_flight[payload.seq] = (next_index, time.monotonic() + timeout_s)
+                next_index += 1
+            # wait no longer than the oldest request's deadline
+            _, oldest_deadline = next(iter(in_flight.values()))
+            remaining_ms = max(0.0, (oldest_deadline - time.monotonic()) * 1000)
+            response_payload = self.uart.receive_packet(timeout_ms=remaining_ms)
+            if response_payload is None:
+                # expire everything past its deadline
+                now = time.monotonic()
+                for seq in [seq for seq, (_, deadline) in in_flight.items() if deadline <= now]:
+                    del in_flight[seq]
+                    lost += 1
+                continue
+            entry = in_flight.get(response_payload.seq)
+            if entry is None:
+                self._log.warning("discarding unmatched reply: {}".format(response_payload))
+                continue
+            # anything sent before the matched request is now known to be lost
+            for seq in list(in_flight):
+                if seq == response_payload.seq:
+                    break
+                del in_flight[seq]
+                lost += 1
+            del in_flight[response_payload.seq]
+            responses[entry[0]] = response_payload
+            if self._stats is not None:
+                # the request was sent timeout_s before its deadline
+                self._stats.record('transaction', int((time.monotonic() - entry[1] + timeout_s) * 1e9))
+        if lost:
+            self._log.warning("{} of {} pipelined requests lost.".format(lost, len(payloads)))
+            if self._stats is not None:
+                self._stats.count('errors', lost)
+        return responses
+
+    # awaitable methods ┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈┈
+    # These run on the caller's event loop, the AsyncUARTManager waiting on the
+    # port's file descriptor there, so no thread is involved. Transactions from
+    # concurrent tasks take turns on the link under an asyncio.Lock; cancelling
+    # one releases the link, and its late reply is discarded as stale.
+
+    def _async_uart(self):
+        if not isinstance(self.uart, AsyncUARTManager):
+            raise ValueError('awaitable methods require a UARTMaster created with use_async=True.')
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self.uart
+
+    async def send_payload_async(self, payload):
+        '''
+        Awaitable send_payload(), waiting its turn on the link as a
+        transaction does.
+        '''
+        uart = self._async_uart()
+        async with self._lock:
+            await self._send_async(uart, payload)
+
+    async def receive_payload_async(self, seq=None, timeout_ms=None):
+        '''
+        Awaitable receive_payload(), waiting its turn on the link as a
+        transaction does: if a sequence number is provided, stale replies are
+        discarded until the matching one arrives. Raises a ValueError if no
+        reply arrives within the timeout, if provided.
+        '''
+        uart = self._async_uart()
+        async with self._lock:
+            return await self._receive_async(uart, seq, timeout_ms)
+
+    async def _send_async(self, uart, payload):
+        payload.seq = self._next_seq()
+        await uart.send(payload)
+        self._log.info(Fore.MAGENTA + "master sent: {}".format(payload))
+
+    async def _receive_async(self, uart, seq, timeout_ms):
+        '''
+        The body of receive_payload_async(), for a caller holding the link.
+        '''
+        deadline = None if timeout_ms is None else time.monotonic() + timeout_ms / 1000
+        while True:
+            if deadline is not None:
+                timeout_ms = max(0.0, (deadline - time.monotonic()) * 1000)
+            response_payload = await uart.receive(timeout_ms)
+            if not response_payload:
+                raise ValueError("no valid response received.")
+            if seq is not None and response_payload.seq != seq:
+                self._log.warning("discarding stale reply: {}".format(response_payload))
+                continue
+            self._log.info(Fore.MAGENTA + "received: {}".format(response_payload))
+            return response_payload
+
+    async def send_receive_payload_async(self, payload, timeout_ms=None):
+        '''
+        Awaitable send_receive_payload(), waiting its turn on the link then up
+        to timeout_ms (by default the reply timeout) for the reply. Returns the
+        ERROR_PAYLOAD if no reply arrives in time. For a deadline on the whole
+        call, including the wait for the link, use asyncio.wait_for().
+        '''
+        uart = self._async_uart()
+        timeout_ms = self._reply_timeout_ms if timeout_ms is None else timeout_ms
+        async with self._lock:
+            if self._stats is not None:
+                start_ns = perf_counter_ns()
+            await self._send_async(uart, payload)
+            try:
+                response_payload = await self._receive_async(uart, payload.seq, timeout_ms)
+            except ValueError as e:
+                self._log.error("error during communication: {}".format(e))
+                if self._stats is not None:
+                    self._stats.count('errors')
+                return self.ERROR_PAYLOAD
+            if self._stats is not None:
+                self._stats.record('transaction', perf_counter_ns() - start_ns)
+            return response_payload
+
+    async def send_receive_many_async(self, payloads, timeout_ms=None):
+        '''
+        Awaitable send_receive_many(), sending the Payloads as one aggregate
+        frame and returning the replies in request order, each the ERROR_PAYLOAD
+        if the reply doesn't arrive within timeout_ms (by default the reply
+        timeout) or doesn't answer every request.
+        '''
+        uart = self._async_uart()
+        timeout_ms = self._reply_timeout_ms if timeout_ms is None else timeout_ms
+        async with self._lock:
+            if self._stats is not None:
+                start_ns = perf_counter_ns()
+            aggregate = Aggregate(payloads, seq=self._next_seq())
+            await uart.send(aggregate)
+            self._log.info(Fore.MAGENTA + "master sent: {}".format(aggregate))
+            try:
+                response = await self._receive_async(uart, aggregate.seq, timeout_ms)
+            except ValueError as e:
+                self._log.error("error during communication: {}".format(e))
+                if self._stats is not None:
+                    self._stats.count('errors')
+                return [self.ERROR_PAYLOAD] * len(aggregate)
+            if not isinstance(response, Aggregate) or len(response) != len(aggregate):
+                self._log.error("reply does not answer all {} requests: {}".format(len(aggregate), response))
+                if self._stats is not None:
+                    self._stats.count('errors')
+                return [self.ERROR_PAYLOAD] * len(aggregate)
+            if self._stats is not None:
+                self._stats.record('transaction', perf_counter_ns() - start_ns)
+            return list(response.payloads)
+
+    def run(self, source: Optional[Callable[[], int]] = None, rate_hz=None, overrun='skip', max_catch_up=1):
         '''
         Main loop for communication with elapsed time measurement. This is currently
         used for testing but could easily be modified for continuous use.
+
+        If a rate is provided each transaction starts on a fixed schedule at that rate,
+        waiting at most the reply timeout for its reply, and the scheduler's jitter and
+        overrun statistics are logged once a second; otherwise this runs as fast as the
+        system allows.
+
+        :param source:   a function returning the data to send, or None for a counter
+        :param rate_hz:  the optional loop rate
+        :param overrun:  when a transaction overruns its period, 'skip' the missed ticks
+                         or 'catch_up' by running them back to back
+        :param max_catch_up:  for 'catch_up', the most missed ticks run back to back
         '''
+        scheduler = None if rate_hz is None else RateScheduler(rate_hz, overrun, max_catch_up=max_catch_up)
+        self._scheduler = scheduler
+        timeout_ms = None if scheduler is None else self._reply_timeout_ms
         try:
             if source is None:
                 print(Fore.GREEN + "source not provided, using counter.")
@@ -80,9 +365,19 @@ class UARTMaster:
                 print(Fore.GREEN + "using source for data.")
 
             count = 0.0
+            if scheduler is not None:
+                self._log.info(Fore.GREEN + "running at {}Hz, overrun policy: {}".format(rate_hz, overrun))
+                scheduler.start()
+                next_report = time.monotonic() + 1.0
 
             while True:
 
+                if scheduler is not None:
+                    scheduler.wait()
+                    if time.monotonic() >= next_report:
+                        next_report += 1.0
+                        self._log_schedule(scheduler.stats())
+
                 if source is not None:
                     data = source()
                     print("data: '{}'".format(data))
@@ -90,28 +385,42 @@ class UARTMaster:
                     count += 1.0
                     data = count
 
-                start_time = dt.now()
+                start_time = time.perf_counter()
                 # create Payload with cmd (2 letters) and floats for pfwd, sfwd, paft, saft
                 payload = Payload("GO", data, data, -10.0, -20.0)
                 # send the Payload object
                 self.send_payload(payload)
                 try:
-                    self.receive_payload()
+                    self.receive_payload(seq=payload.seq, timeout_ms=timeout_ms)
                 except ValueError as e:
                     self._log.error("error receiving payload: {}:".format(e))
                     continue  # optionally, continue the loop without stopping
-                # calculate elapsed time
-                end_time = dt.now()
-                elapsed_time = (end_time - start_time).total_seconds() * 1000  # Convert to milliseconds
-                self._log.info(Fore.GREEN + "tx elapsed: {:.2f} ms".format(elapsed_time))
-                # with no sleep here, would be running as fast as the system allows
-#               time.sleep(0.25)
+                if scheduler is None:
+                    # calculate elapsed time
+                    elapsed_time = (time.perf_counter() - start_time) * 1000  # Convert to milliseconds
+                    self._log.info(Fore.GREEN + "tx elapsed: {:.2f} ms".format(elapsed_time))
+                # with no scheduler, would be running as fast as the system allows
 
         except Exception as e:
             self._log.error("{} raised in run loop: {}".format(type(e), e))
         except KeyboardInterrupt:
             self._log.info("ctrl-c caught, exiting…")
         finally:
+            if scheduler is not None:
+                self._log_schedule(scheduler.stats())
             self.uart.close()
 
+    def schedule_stats(self):
+        '''
+        Returns the statistics of the scheduler of a run() at a fixed rate, or None.
+        '''
+        return None if self._scheduler is None else self._scheduler.stats()
+
+    def _log_schedule(self, stats):
+        jitter = stats['jitter']
+        if jitter['count']:
+            self._log.info(Fore.GREEN + "{} ticks at {}Hz: jitter p50 {:.1f}µs, p99 {:.1f}µs, max {:.1f}µs; {} overruns, {} skipped, {} late".format(
+                    stats['ticks'], stats['rate_hz'], jitter['p50_us'], jitter['p99_us'], jitter['max_us'],
+                    stats['overruns'], stats['skipped'], stats['late']))
+
 #EOF
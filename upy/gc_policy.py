@@ -0,0 +1,105 @@
+#!/micropython
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2026 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2026-10-17
+# modified: 2026-10-17
+#
+# When the slave's garbage is collected. Left to itself MicroPython collects
+# whenever an allocation finds the heap full (or past gc.threshold()), which
+# may well be between receiving a request and sending its reply, adding the
+# collection's milliseconds to that reply's latency.
+#
+# A GcPolicy instead collects in the idle window right after a reply is
+# written, when the master isn't waiting on the slave, once half the threshold
+# has been allocated since the last collection, so that an automatic
+# collection is only a backstop. As a collection takes about as long however
+# little garbage there is, collecting after every reply would only make one
+# more likely to be under way when the next request arrives. It records
+# each collection's duration and the free heap's low and high water marks,
+# which are reported to the master in reply to a GC request.
+#
+
+import gc
+import time
+
+from core.logger import Logger, Level
+from payload import Payload
+
+class GcPolicy:
+    '''
+    :param threshold:  the bytes allocated after which MicroPython collects of
+                       its own accord, by default a quarter of the heap free
+                       once collected
+    :param min_alloc:  the bytes that must have been allocated since the last
+                       collection for a collection after a reply, by default
+                       half the threshold; 0 collects after every reply
+    '''
+    def __init__(self, threshold=None, min_alloc=None):
+        self._log = Logger('gc-policy', Level.INFO)
+        gc.collect()
+        if threshold is None:
+            threshold = gc.mem_free() // 4
+        gc.threshold(threshold)
+        self._min_alloc = threshold // 2 if min_alloc is None else min_alloc
+        self.reset_stats()
+        self._log.info('collecting after replies once {} bytes are allocated; threshold: {} bytes.'.format(
+                self._min_alloc, threshold))
+
+    def reset_stats(self):
+        self.collections = 0
+        self.total_us    = 0
+        self.max_us      = 0
+        self.free_low    = gc.mem_free()
+        self.free_high   = self.free_low
+        self._alloc_after = gc.mem_alloc() # following the last collection
+
+    def idle(self):
+        '''
+        Called once a reply has been written: collect, unless less than
+        min_alloc bytes have been allocated since the last collection.
+        '''
+        free = gc.mem_free()
+        if free < self.free_low:
+            self.free_low = free
+        if gc.mem_alloc() - self._alloc_after < self._min_alloc:
+            return
+        start = time.ticks_us()
+        gc.collect()
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        self.collections += 1
+        self.total_us += elapsed
+        if elapsed > self.max_us:
+            self.max_us = elapsed
+        free = gc.mem_free()
+        if free > self.free_high:
+            self.free_high = free
+        self._alloc_after = gc.mem_alloc()
+
+    def stats(self):
+        '''
+        Returns a dict of the collections after replies, their average and
+        maximum duration in µs, and the free heap's low and high water marks
+        in bytes.
+        '''
+        return {
+            'collections': self.collections,
+            'avg_us':      self.total_us // self.collections if self.collections else 0,
+            'max_us':      self.max_us,
+            'free_low':    self.free_low,
+            'free_high':   self.free_high,
+        }
+
+    async def report(self, payload):
+        '''
+        The handler of the GC command, returning the stats as a GS Payload.
+        '''
+        stats = self.stats()
+        return Payload("GS", stats['collections'], stats['avg_us'], stats['max_us'],
+                stats['free_low'], stats['free_high'])
+
+#EOF
@@ -7,12 +7,13 @@
 #
 # author:   Murray Altheim
 # created:  2025-06-12
-# modified: 2025-06-23
+# modified: 2026-10-17
 
 import uasyncio as asyncio
 from colorama import Fore, Style
 
 from payload import Payload
+from gc_policy import GcPolicy
 from core.logger import Logger, Level
 
 _IS_PYBOARD = True
@@ -37,11 +38,20 @@ async def wait_a_bit():
         await asyncio.sleep_ms(950)
     _led.off()
 
+# the reply to a GO, reused for every request rather than allocated per transaction
+_ACK = Payload("AK")
+
+async def go(payload):
+    # act upon the command (example), then acknowledge it
+    return _ACK
+
 async def main():
 
     _slave = None
     _log = Logger('main', Level.INFO)
     _baudrate = 1_000_000 # 115200 460800 921600 
+    _address  = None # this slave's address if one of several on a bus
+    _rx_irq   = True # sleep until the UART's RX interrupt rather than polling it
 
     # delay the inevitable
     if _IS_PYBOARD:
@@ -50,26 +60,24 @@ async def main():
 
         await pyb_wait_a_bit()
         _uart_id = 4
-        _slave = Stm32UartSlave(uart_id=_uart_id, baudrate=_baudrate)
+        _slave = Stm32UartSlave(uart_id=_uart_id, baudrate=_baudrate, address=_address, rx_irq=_rx_irq)
     else:
         _log.info(Fore.GREEN + "configuring UART slave for RP2040…")
         from rp2040_uart_slave import RP2040UartSlave
 
         await wait_a_bit()
         _uart_id = 1
-        _slave = RP2040UartSlave(uart_id=_uart_id, baudrate=_baudrate)
+        _slave = RP2040UartSlave(uart_id=_uart_id, baudrate=_baudrate, address=_address, rx_irq=_rx_irq)
 
-    _slave.set_verbose(True)
+    _slave.set_verbose(False) # logging each frame allocates its strings
+    # a handler per command; any other is acknowledged. A handler that may
+    # take a while is registered as deferred, to reply once it completes.
+    _slave.register('GO', go)
+    # collect garbage after replies rather than mid-transaction, once half
+    # the threshold has been allocated since the last collection
+    _slave.set_gc_policy(GcPolicy())
     _log.info("UART slave: waiting for command from master…")
-    while True:
-        packet = await _slave.receive_packet()
-        if packet is not None:
-#           _log.info(Fore.MAGENTA + "received payload: {}".format(packet))
-            # respond with ACK + same payload command but zeroed floats (example)
-            ack_payload = Payload("AK", 0.0, 0.0, 0.0, 0.0)
-            await _slave.send_packet(ack_payload)
-        else:
-            _log.warning("no valid packet received.")
+    await _slave.run()
 
 # for use from the REPL
 def exec():
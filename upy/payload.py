@@ -7,29 +7,85 @@
 #
 # author:   Murray Altheim
 # created:  2025-06-12
-# modified: 2025-06-22
+# modified: 2026-10-17
 
 import struct
-from crc8_table import CRC8_TABLE
+import schema
+from delta import DELTA_FLAG, delta_bitmap_size
+from crc8_table import crc8
+
+class CRCError(ValueError):
+    '''
+    Raised when a frame's CRC doesn't match its contents.
+    '''
+    pass
 
 class Payload:
     # Sync header: 'zz' for human-readability. To switch to a binary header, just uncomment the next line.
     SYNC_HEADER = b'\x7A\x7A'
 #   SYNC_HEADER = b'\xAA\x55'
-    PACK_FORMAT = '<2sffff'  # 2-char cmd, 4 floats
-    PAYLOAD_SIZE = struct.calcsize(PACK_FORMAT)  # Size of cmd+floats only, no CRC or header
     CRC_SIZE = 1
-    PACKET_SIZE = len(SYNC_HEADER) + PAYLOAD_SIZE + CRC_SIZE  # header + payload + crc
+    TYPE_INDEX = len(SYNC_HEADER) + 1 # the type byte follows the sequence number
+    MAX_PACKET_SIZE = len(SYNC_HEADER) + schema.MAX_SIZE + schema.ADDRESS_SIZE + CRC_SIZE # header + seq + type + body + address + crc
+
+    SEQ_MODULUS = 256 # sequence numbers wrap at one byte
 
-    def __init__(self, cmd, pfwd, sfwd, paft, saft):
+    def __init__(self, cmd, *values, seq=0, layout=None, addr=None):
+        '''
+        A two character command and the values of its fields, as declared by
+        its layout in the schema registry. A command that isn't registered
+        carries four values, pfwd, sfwd, paft and saft, sent as float32 unless
+        another generic layout is provided, e.g., schema.GENERIC_FIXED.
+
+        If an address byte is provided this is sent as an addressed frame, for
+        a bus with several slaves: a slave's address (or BROADCAST_ADDRESS) on
+        a request, plus REPLY_FLAG on a reply.
+        '''
         self.cmd = cmd.encode('ascii') if isinstance(cmd, str) else cmd
-        self.pfwd = pfwd
-        self.sfwd = sfwd
-        self.paft = paft
-        self.saft = saft
+        self.schema = schema.for_cmd(self.cmd) if layout is None else layout
+        if self.schema.cmd is not None and self.schema.cmd != self.cmd:
+            raise ValueError("layout of {} used for {}.".format(self.schema.cmd, self.cmd))
+        if len(values) != len(self.schema.fields):
+            raise ValueError("{} expects {} values, not {}.".format(self.cmd, len(self.schema.fields), len(values)))
+        self.seq = seq
+        self.values = values
+        self.addr = addr
+
+    def __getitem__(self, name):
+        '''
+        Returns the value of a field by name, e.g., payload['ch3'].
+        '''
+        try:
+            return self.values[self.schema.fields.index(name)]
+        except ValueError:
+            raise KeyError(name)
+
+    def _field(name):
+        # the fields of the generic layouts are also available as attributes, e.g., payload.pfwd
+        def getter(self):
+            try:
+                return self[name]
+            except KeyError:
+                raise AttributeError("{} has no field {}".format(self.cmd, name))
+        return property(getter)
+
+    pfwd = _field('pfwd')
+    sfwd = _field('sfwd')
+    paft = _field('paft')
+    saft = _field('saft')
+    del _field
 
     def __repr__(self):
-        return f"Payload(cmd={self.cmd.decode('ascii')}, pfwd={self.pfwd}, sfwd={self.sfwd}, paft={self.paft}, saft={self.saft})"
+        fields = ''.join(', {}={}'.format(name, value) for name, value in zip(self.schema.fields, self.values))
+        addr = '' if self.addr is None else ', addr=0x{:02X}'.format(self.addr)
+        return f"Payload(seq={self.seq}{addr}, cmd={self.cmd.decode('ascii')}{fields})"
+
+    @property
+    def packet_size(self):
+        '''
+        The number of bytes this Payload occupies on the wire.
+        '''
+        return len(Payload.SYNC_HEADER) + self.schema.size + (0 if self.addr is None else schema.ADDRESS_SIZE) + self.CRC_SIZE
 
     def to_bytes(self):
         '''
@@ -38,30 +94,329 @@ class Payload:
         return self.__bytes__()
 
     def __bytes__(self):
-        # Pack the data into bytes (cmd, floats)
-        packed = struct.pack(self.PACK_FORMAT, self.cmd, self.pfwd, self.sfwd, self.paft, self.saft)
-        crc = self.calculate_crc8(packed)
-        return Payload.SYNC_HEADER + packed + bytes([crc])
+        packet = bytearray(self.packet_size)
+        self.pack_into(packet, 0)
+        return bytes(packet)
+
+    def pack_into(self, buf, offset=0, delta=None):
+        '''
+        Encode the packet into buf (a bytearray or writable memoryview) starting
+        at offset, so that a sender can reuse a single transmit buffer. Returns
+        the number of bytes written.
+
+        If a DeltaState is provided this is sent as a delta frame, carrying
+        only the fields changed since the keyframe of its type and address,
+        unless a keyframe is due.
+        '''
+        layout = self.schema
+        header_end = offset + len(Payload.SYNC_HEADER)
+        buf[offset:header_end] = Payload.SYNC_HEADER
+        values = self.values if layout.scales is None else layout.encode(self.values)
+        if delta is not None:
+            changes = delta.delta(layout, self.cmd, self.seq, values, self.addr)
+            if changes is not None:
+                return self._pack_delta_into(buf, offset, *changes)
+        crc_index  = header_end + layout.size
+        if layout.cmd is None:
+            struct.pack_into(layout.format, buf, header_end, self.seq, layout.type_id, self.cmd, *values)
+        elif values:
+            struct.pack_into(layout.format, buf, header_end, self.seq, layout.type_id, *values)
+        else:
+            # a command without fields, e.g., "AK": a call with *values would allocate its arguments
+            buf[header_end]     = self.seq
+            buf[header_end + 1] = layout.type_id
+        if self.addr is not None:
+            buf[header_end + 1] |= schema.ADDRESS_FLAG
+            buf[crc_index] = self.addr
+            crc_index += schema.ADDRESS_SIZE
+        buf[crc_index] = self.calculate_crc8(buf, header_end, crc_index)
+        return crc_index + self.CRC_SIZE - offset
+
+    def _pack_delta_into(self, buf, offset, keyframe_seq, bitmap, changed):
+        layout = self.schema
+        header_end = offset + len(Payload.SYNC_HEADER)
+        buf[header_end]     = self.seq
+        buf[header_end + 1] = layout.type_id | DELTA_FLAG
+        buf[header_end + 2] = keyframe_seq
+        index = header_end + 3
+        for i in range(delta_bitmap_size(layout)):
+            buf[index] = (bitmap >> (8 * i)) & 0xFF
+            index += 1
+        changed = iter(changed)
+        for i, code in enumerate(layout.field_formats):
+            if bitmap & (1 << i):
+                struct.pack_into('<' + code, buf, index, next(changed))
+                index += layout.field_sizes[i]
+        if self.addr is not None:
+            buf[header_end + 1] |= schema.ADDRESS_FLAG
+            buf[index] = self.addr
+            index += schema.ADDRESS_SIZE
+        buf[index] = self.calculate_crc8(buf, header_end, index)
+        return index + self.CRC_SIZE - offset
 
     @classmethod
-    def from_bytes(cls, packet):
-        if len(packet) != cls.PACKET_SIZE:
+    def frame_length(cls, buf, offset=0, end=None):
+        '''
+        Returns the length of the frame starting at offset within buf, as given
+        by its type byte (and for a delta frame, its bitmap), or None if not
+        enough of the frame is in buf (up to end) to tell. Raises a ValueError
+        if the type is unknown.
+        '''
+        if end is None:
+            end = len(buf)
+        type_index = offset + cls.TYPE_INDEX
+        if end <= type_index:
+            return None
+        type_byte = buf[type_index]
+        address_size = schema.ADDRESS_SIZE if type_byte & schema.ADDRESS_FLAG else 0
+        layout = schema.for_type(type_byte & schema.TYPE_MASK)
+        if layout is None:
+            if type_byte & ~schema.ADDRESS_FLAG == schema.AGGREGATE_TYPE:
+                # the length of the records follows the type
+                if end <= type_index + 1:
+                    return None
+                return type_index + 2 + buf[type_index + 1] + address_size + cls.CRC_SIZE - offset
+            raise ValueError("unknown type: {}".format(type_byte))
+        if not type_byte & DELTA_FLAG:
+            return len(Payload.SYNC_HEADER) + layout.size + address_size + cls.CRC_SIZE
+        # type, keyframe seq, then the bitmap
+        bitmap_index = type_index + 2
+        bitmap_size = delta_bitmap_size(layout)
+        if end < bitmap_index + bitmap_size:
+            return None
+        length = bitmap_index + bitmap_size + address_size + cls.CRC_SIZE - offset
+        for i in range(len(layout.fields)):
+            if buf[bitmap_index + i // 8] & (1 << (i % 8)):
+                length += layout.field_sizes[i]
+        return length
+
+    @classmethod
+    def frame_address(cls, buf, offset, length):
+        '''
+        Returns the address byte of the frame of length bytes (as returned by
+        frame_length()) starting at offset within buf, or None if the frame
+        isn't addressed. The CRC isn't checked, so that a slave may skip a
+        frame for another slave without decoding it.
+        '''
+        if buf[offset + cls.TYPE_INDEX] & schema.ADDRESS_FLAG:
+            return buf[offset + length - cls.CRC_SIZE - schema.ADDRESS_SIZE]
+        return None
+
+    @classmethod
+    def frame_valid(cls, buf, offset, length):
+        '''
+        Returns True if the CRC of the frame of length bytes (as returned by
+        frame_length()) starting at offset within buf matches, without
+        decoding it.
+        '''
+        crc_index = offset + length - cls.CRC_SIZE
+        return buf[crc_index] == cls.calculate_crc8(buf, offset + len(cls.SYNC_HEADER), crc_index)
+
+    @classmethod
+    def from_bytes(cls, packet, delta=None):
+        if len(packet) != cls.frame_length(packet):
             raise ValueError(f"invalid packet size: {len(packet)}")
-        if packet[:len(Payload.SYNC_HEADER)] != Payload.SYNC_HEADER:
+        return cls.unpack_from(packet, 0, delta)
+
+    @classmethod
+    def unpack_from(cls, buf, offset=0, delta=None):
+        '''
+        Decode the packet starting at offset within buf (bytes, bytearray or
+        memoryview) in place, without copying it out first.
+
+        A DeltaState is required to decode delta frames, and if provided
+        records every full frame as the keyframe of its type and address. An
+        aggregate frame is returned as an Aggregate.
+        '''
+        if len(buf) <= offset + cls.TYPE_INDEX:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        if buf[offset] != Payload.SYNC_HEADER[0] or buf[offset + 1] != Payload.SYNC_HEADER[1]:
             raise ValueError("invalid sync header")
-        data_and_crc = packet[len(Payload.SYNC_HEADER):]
-        data, crc = data_and_crc[:-1], data_and_crc[-1]
-        calc_crc = cls.calculate_crc8(data)
-        if crc != calc_crc:
-            raise ValueError("CRC mismatch.")
-        cmd, pfwd, sfwd, paft, saft = struct.unpack(cls.PACK_FORMAT, data)
-        return cls(cmd.decode('ascii'), pfwd, sfwd, paft, saft)
+        type_byte = buf[offset + cls.TYPE_INDEX]
+        if type_byte & DELTA_FLAG:
+            return cls._unpack_delta_from(buf, offset, delta)
+        layout = schema.for_type(type_byte & schema.TYPE_MASK)
+        if layout is None:
+            if type_byte & ~schema.ADDRESS_FLAG == schema.AGGREGATE_TYPE:
+                return Aggregate.unpack_from(buf, offset)
+            raise ValueError("unknown type: {}".format(type_byte))
+        header_end = offset + len(Payload.SYNC_HEADER)
+        crc_index  = header_end + layout.size
+        if type_byte & schema.ADDRESS_FLAG:
+            crc_index += schema.ADDRESS_SIZE
+        if len(buf) <= crc_index:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        calc_crc = cls.calculate_crc8(buf, header_end, crc_index)
+        if buf[crc_index] != calc_crc:
+            raise CRCError("CRC mismatch.")
+        record = struct.unpack_from(layout.format, buf, header_end)
+        cmd = layout.cmd if layout.cmd is not None else record[2]
+        values = record[2:] if layout.cmd is not None else record[3:]
+        addr = buf[crc_index - schema.ADDRESS_SIZE] if type_byte & schema.ADDRESS_FLAG else None
+        if delta is not None:
+            delta.keyframe(layout, cmd, record[0], values, addr)
+        if layout.scales is not None:
+            values = layout.decode(values)
+        return cls(cmd, *values, seq=record[0], layout=layout, addr=addr)
+
+    @classmethod
+    def _unpack_delta_from(cls, buf, offset, delta):
+        length = cls.frame_length(buf, offset)
+        if length is None or len(buf) < offset + length:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        header_end = offset + len(Payload.SYNC_HEADER)
+        crc_index  = offset + length - cls.CRC_SIZE
+        if buf[crc_index] != cls.calculate_crc8(buf, header_end, crc_index):
+            raise CRCError("CRC mismatch.")
+        if delta is None:
+            raise ValueError("delta frame received without a DeltaState.")
+        layout = schema.for_type(buf[header_end + 1] & schema.TYPE_MASK)
+        addr = buf[crc_index - schema.ADDRESS_SIZE] if buf[header_end + 1] & schema.ADDRESS_FLAG else None
+        index = header_end + 3
+        bitmap = 0
+        for i in range(delta_bitmap_size(layout)):
+            bitmap |= buf[index] << (8 * i)
+            index += 1
+        changed = []
+        for i, code in enumerate(layout.field_formats):
+            if bitmap & (1 << i):
+                changed.append(struct.unpack_from('<' + code, buf, index)[0])
+                index += layout.field_sizes[i]
+        cmd, values = delta.apply(layout, buf[header_end + 2], bitmap, changed, addr)
+        if layout.scales is not None:
+            values = layout.decode(values)
+        return cls(cmd, *values, seq=buf[header_end], layout=layout, addr=addr)
 
     @staticmethod
-    def calculate_crc8(data: bytes) -> int:
-        crc = 0
-        for b in data:
-            crc = CRC8_TABLE[crc ^ b]
-        return crc
+    def calculate_crc8(data: bytes, start=0, end=None) -> int:
+        '''
+        Returns the CRC8 of data[start:end].
+        '''
+        return crc8(data, start, end)
+
+class Aggregate:
+    # the largest total of records, as sent in the length byte
+    MAX_RECORDS_SIZE = 255
+    MAX_PACKET_SIZE  = len(Payload.SYNC_HEADER) + 3 + MAX_RECORDS_SIZE + schema.ADDRESS_SIZE + Payload.CRC_SIZE # header + seq + type + length + records + address + crc
+
+    def __init__(self, payloads, seq=0, addr=None):
+        '''
+        Several Payloads, of any commands, sent as a single aggregate frame
+        behind one sync header, sequence number, length and CRC:
+
+            SYNC_HEADER | seq | AGGREGATE_TYPE | length | records | CRC8
+
+        where each record is a Payload's type byte and body, as in its own
+        frame. The reply to an aggregate is an aggregate with the same sequence
+        number, holding one reply per request in the same order. Records are
+        always sent in full, never as delta frames.
+
+        If an address byte is provided it's sent before the CRC, as for an
+        addressed Payload; the records' own addresses are ignored.
+        '''
+        self.payloads = tuple(payloads)
+        self.seq = seq
+        self.addr = addr
+        size = self.records_size
+        if size > Aggregate.MAX_RECORDS_SIZE:
+            raise ValueError("{} bytes of records exceeds the maximum of {}.".format(size, Aggregate.MAX_RECORDS_SIZE))
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def __iter__(self):
+        return iter(self.payloads)
+
+    def __repr__(self):
+        addr = '' if self.addr is None else ', addr=0x{:02X}'.format(self.addr)
+        return "Aggregate(seq={}{}, payloads=[{}])".format(self.seq, addr, ', '.join(repr(payload) for payload in self.payloads))
+
+    @property
+    def records_size(self):
+        '''
+        The number of bytes of the records, at most MAX_RECORDS_SIZE.
+        '''
+        return sum(payload.schema.size - 1 for payload in self.payloads)
+
+    @property
+    def packet_size(self):
+        '''
+        The number of bytes this Aggregate occupies on the wire.
+        '''
+        return len(Payload.SYNC_HEADER) + 3 + self.records_size + (0 if self.addr is None else schema.ADDRESS_SIZE) + Payload.CRC_SIZE
+
+    def to_bytes(self):
+        '''
+        A convenience method that calls __bytes__().
+        '''
+        return self.__bytes__()
+
+    def __bytes__(self):
+        packet = bytearray(self.packet_size)
+        self.pack_into(packet, 0)
+        return bytes(packet)
+
+    def pack_into(self, buf, offset=0, delta=None):
+        '''
+        Encode the aggregate into buf starting at offset, returning the number
+        of bytes written. The DeltaState argument is accepted so that this may
+        be sent wherever a Payload is, but is ignored.
+        '''
+        header_end = offset + len(Payload.SYNC_HEADER)
+        buf[offset:header_end] = Payload.SYNC_HEADER
+        buf[header_end]     = self.seq
+        buf[header_end + 1] = schema.AGGREGATE_TYPE
+        index = header_end + 3
+        for payload in self.payloads:
+            layout = payload.schema
+            values = payload.values if layout.scales is None else layout.encode(payload.values)
+            if layout.cmd is None:
+                struct.pack_into(layout.record_format, buf, index, layout.type_id, payload.cmd, *values)
+            else:
+                struct.pack_into(layout.record_format, buf, index, layout.type_id, *values)
+            index += layout.size - 1
+        buf[header_end + 2] = index - header_end - 3
+        if self.addr is not None:
+            buf[header_end + 1] |= schema.ADDRESS_FLAG
+            buf[index] = self.addr
+            index += schema.ADDRESS_SIZE
+        buf[index] = Payload.calculate_crc8(buf, header_end, index)
+        return index + Payload.CRC_SIZE - offset
+
+    @classmethod
+    def unpack_from(cls, buf, offset=0):
+        '''
+        Decode the aggregate frame starting at offset within buf, returning an
+        Aggregate of its Payloads, each stamped with the aggregate's sequence
+        number. Payload.unpack_from() calls this on an aggregate frame.
+        '''
+        header_end   = offset + len(Payload.SYNC_HEADER)
+        length_index = header_end + 2
+        if len(buf) <= length_index:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        records_end = length_index + 1 + buf[length_index]
+        addressed = buf[header_end + 1] & schema.ADDRESS_FLAG
+        crc_index = records_end + schema.ADDRESS_SIZE if addressed else records_end
+        if len(buf) <= crc_index:
+            raise ValueError(f"invalid packet size: {len(buf) - offset}")
+        if buf[crc_index] != Payload.calculate_crc8(buf, header_end, crc_index):
+            raise CRCError("CRC mismatch.")
+        seq = buf[header_end]
+        payloads = []
+        index = length_index + 1
+        while index < records_end:
+            layout = schema.for_type(buf[index])
+            if layout is None:
+                raise ValueError("unknown record type: {}".format(buf[index]))
+            if index + layout.size - 1 > records_end:
+                raise ValueError("truncated record.")
+            record = struct.unpack_from(layout.record_format, buf, index)
+            cmd = layout.cmd if layout.cmd is not None else record[1]
+            values = record[1:] if layout.cmd is not None else record[2:]
+            if layout.scales is not None:
+                values = layout.decode(values)
+            payloads.append(Payload(cmd, *values, seq=seq, layout=layout))
+            index += layout.size - 1
+        return cls(payloads, seq, buf[records_end] if addressed else None)
 
 #EOF
@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2025-06-12
-# modified: 2025-06-24
+# modified: 2026-10-17
 #
 # A UART slave for the RP2040.
 #
@@ -24,8 +24,8 @@ from payload import Payload
 from uart_slave_base import UartSlaveBase
 
 class RP2040UartSlave(UartSlaveBase):
-    def __init__(self, uart_id=1, baudrate=115200, rx_pin=5, tx_pin=4, led_pin=25):
-        UartSlaveBase.__init__(self, 'rp2040-uart', uart_id=uart_id, baudrate=baudrate)
+    def __init__(self, uart_id=1, baudrate=115200, rx_pin=5, tx_pin=4, led_pin=25, address=None, rx_irq=False):
+        UartSlaveBase.__init__(self, 'rp2040-uart', uart_id=uart_id, baudrate=baudrate, address=address, rx_irq=rx_irq)
         self.rx_pin   = rx_pin
         self.tx_pin   = tx_pin
         self._log.info('pins: rx={}; tx={}.'.format(rx_pin, tx_pin))
@@ -33,7 +33,7 @@ class RP2040UartSlave(UartSlaveBase):
         # set up LED pin
         self.led = Pin(self.led_pin, Pin.OUT)
         # set up UART connection with custom TX and RX pins
-        self._uart = UART(uart_id, baudrate=baudrate, bits=8, parity=None, stop=1, tx=Pin(self.tx_pin), rx=Pin(self.rx_pin))
+        self._uart = UART(uart_id, baudrate=baudrate, bits=8, parity=None, stop=1, tx=Pin(self.tx_pin), rx=Pin(self.rx_pin), rxbuf=self.RX_BUFFER_SIZE)
         # ready
 
 #EOF
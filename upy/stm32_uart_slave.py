@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2025-06-12
-# modified: 2025-06-24
+# modified: 2026-10-17
 #
 # A UART slave for the STM32, using UART 1-4.
 #
@@ -41,11 +41,11 @@ from payload import Payload
 from uart_slave_base import UartSlaveBase
 
 class Stm32UartSlave(UartSlaveBase):
-    def __init__(self, uart_id=1, baudrate=115200):
-        UartSlaveBase.__init__(self, 'stm32-uart', uart_id=uart_id, baudrate=baudrate)
+    def __init__(self, uart_id=1, baudrate=115200, address=None, rx_irq=False):
+        UartSlaveBase.__init__(self, 'stm32-uart', uart_id=uart_id, baudrate=baudrate, address=address, rx_irq=rx_irq)
         self._led = LED(1)
         self._uart = UART(uart_id)
-        self._uart.init(baudrate=baudrate, bits=8, parity=None, stop=1)
+        self._uart.init(baudrate=baudrate, bits=8, parity=None, stop=1, read_buf_len=self.RX_BUFFER_SIZE)
         # ready
 
 #EOF
@@ -8,85 +8,523 @@ from pyb import LED
 from colorama import Fore, Style
 
 from core.logger import Logger, Level
-from payload import Payload
+import schema
+from payload import Payload, Aggregate, CRCError
+from delta import DeltaState
+
+class _Handler:
+    '''
+    A registered command's handler and its counters, the durations in µs.
+    '''
+    def __init__(self, handler, deferred):
+        self.handler  = handler
+        self.deferred = deferred
+        self.count    = 0
+        self.total_us = 0
+        self.max_us   = 0
+        self.errors   = 0
 
 class UartSlaveBase:
-    def __init__(self, name, uart_id=1, baudrate=115200):
+    # large enough for a window of pipelined requests to queue while we reply
+    RX_BUFFER_SIZE = 512
+    # room for the replies to a burst of requests, written at once
+    TX_BUFFER_SIZE = 1024
+    # the most frames returned by receive_packets(), bounding a batch's replies' latency
+    MAX_BATCH = 16
+
+    def __init__(self, name, uart_id=1, baudrate=115200, address=None, rx_irq=False):
+        '''
+        If an address is provided the slave is one of several on a bus: frames
+        not addressed to it (or broadcast) are skipped, and it replies from it.
+
+        If rx_irq is True the receiving task sleeps until woken by the UART's
+        RX idle interrupt rather than polling the UART, if the port has one.
+        '''
         self._log = Logger(name, Level.INFO)
         self.baudrate    = baudrate
-        self._buffer     = bytearray()
+        self._address    = address
+        self._rx_irq     = rx_irq
+        self._rx_flag    = None # set by the RX interrupt, once enabled
         self._last_rx    = time.ticks_ms()
         self._timeout_ms = 250
         self._verbose    = False
         self._led        = LED(1)
+        # frames are read into and decoded from one preallocated buffer, and
+        # replies packed into another, so that a transaction doesn't churn the
+        # heap and so trigger a garbage collection in the middle of it
+        self._rx_buffer  = bytearray(self.RX_BUFFER_SIZE)
+        self._rx_view    = memoryview(self._rx_buffer)
+        self._rx_views   = {} # offset: view of the RX buffer from the offset
+        self._rx_start   = 0  # the unconsumed bytes are _rx_buffer[_rx_start:_rx_end]
+        self._rx_end     = 0
+        self._rx_checked = 0  # the _rx_end at which a partial frame was last checked for a stray header
+        self._tx_buffer  = bytearray(max(self.TX_BUFFER_SIZE, Aggregate.MAX_PACKET_SIZE))
+        self._tx_view    = memoryview(self._tx_buffer)
+        self._tx_views   = {} # length: view of the TX buffer of that length
+        self._tx_end     = 0  # the replies queued and not yet written are _tx_buffer[:_tx_end]
+        self._tx_limit   = len(self._tx_buffer) - Aggregate.MAX_PACKET_SIZE # beyond which a reply might not fit
+        self._batch      = [] # the frames returned by receive_packets(), reused
+        # keyframes of the master's frames, to decode its delta frames
+        self._rx_delta   = DeltaState()
+        # command: _Handler, a command without one acknowledged
+        self._handlers   = {}
+        self._deferred   = False # whether any handler is deferred
+        self._unhandled  = 0
+        self._ack        = Payload("AK")
+        self._gc_policy  = None
+        self.reset_stats()
+        self.register('ST', self._report_stats) # reserved: the counters, to the master
+        self.register('GC', self._report_gc)    # reserved: the GcPolicy's stats, if any
         self._uart = UART(uart_id)
-        self._uart.init(baudrate=baudrate, bits=8, parity=None, stop=1)
+        self._uart.init(baudrate=baudrate, bits=8, parity=None, stop=1, read_buf_len=self.RX_BUFFER_SIZE)
         self._log.info('UART {} slave ready at baud rate: {}.'.format(uart_id, baudrate))
 
     def set_verbose(self, verbose: bool):
         self._verbose = verbose
 
-    async def receive_packet(self):
+    def register(self, cmd, handler, deferred=False):
+        '''
+        Register the coroutine function handling a command, replacing any
+        handler already registered for it. The handler is called with the
+        request Payload and returns the reply Payload, or None to acknowledge
+        it. A reply may be reused from one request to the next.
+
+        A deferred handler, i.e., one that may take a while, is run as a task
+        of its own, so that run() carries on receiving and answering requests
+        in the meantime, replying once it completes. That reply may therefore
+        follow the replies to later requests: the master matches it by its
+        sequence number, but only if it waits for it, i.e., a deferred
+        command shouldn't be pipelined.
+
+        :param cmd:       the two-character command code
+        :param handler:   the coroutine function
+        :param deferred:  if True the handler's reply is sent once it completes
+        '''
+        cmd = cmd.encode('ascii') if isinstance(cmd, str) else bytes(cmd)
+        if len(cmd) != 2:
+            raise ValueError('command must be two characters: {}'.format(cmd))
+        self._handlers[cmd] = _Handler(handler, deferred)
+        self._deferred = any(entry.deferred for entry in self._handlers.values())
+
+    def set_gc_policy(self, policy):
+        '''
+        Collect garbage as the GcPolicy directs, after each reply written by
+        run(), and answer a GC request with its stats.
+        '''
+        self._gc_policy = policy
+
+    def reset_stats(self):
+        '''
+        Clear the counters returned by stats(), and those of each handler.
+        '''
+        self._frames        = 0 # received, for this slave
+        self._replies       = 0 # queued
+        self._crc_failures  = 0
+        self._resyncs       = 0 # frames that failed to decode, of which CRC failures are some
+        self._rx_timeouts   = 0 # partial frames dropped
+        self._rx_high_water = 0 # the most bytes held in the RX buffer
+        self._loops         = 0 # receive loop iterations, since _loops_ms, i.e., since reset
+        self._loops_ms      = time.ticks_ms()
+        self.reset_handler_stats()
+
+    def stats(self):
+        '''
+        Returns a dict of the slave's counters: frames received and replies
+        sent, CRC failures and resyncs, RX timeouts, the RX buffer's high
+        water mark in bytes, receive loop iterations per second (since the
+        counters were reset), and the count, average and maximum duration in µs, and
+        errors of all handler calls, and the requests with no handler.
+        '''
+        elapsed = time.ticks_diff(time.ticks_ms(), self._loops_ms)
+        loops_per_s = self._loops * 1000 // elapsed if elapsed > 0 else 0
+        handled = total_us = max_us = errors = 0
+        for entry in self._handlers.values():
+            handled  += entry.count
+            total_us += entry.total_us
+            errors   += entry.errors
+            if entry.max_us > max_us:
+                max_us = entry.max_us
+        return {
+            'frames':         self._frames,
+            'replies':        self._replies,
+            'crc_failures':   self._crc_failures,
+            'resyncs':        self._resyncs,
+            'rx_timeouts':    self._rx_timeouts,
+            'rx_high_water':  self._rx_high_water,
+            'loops_per_s':    loops_per_s,
+            'handled':        handled,
+            'handler_avg_us': total_us // handled if handled else 0,
+            'handler_max_us': max_us,
+            'handler_errors': errors,
+            'unhandled':      self._unhandled,
+        }
+
+    async def _report_stats(self, payload):
+        '''
+        The handler of the ST command, returning the stats as an SS Payload.
+        This is a single Payload so that ST may be sent within an aggregate,
+        whose reply can't nest another.
+        '''
+        stats = self.stats()
+        # a counter is sent as a uint32, so one that's wrapped on the board reads as such
+        return Payload("SS", *[ stats[name] & 0xFFFFFFFF for name in schema.for_cmd(b'SS').fields ])
+
+    async def _report_gc(self, payload):
+        '''
+        The handler of the GC command, returning the GcPolicy's stats as a GS
+        Payload, or acknowledging it if there's no policy.
+        '''
+        if self._gc_policy is None:
+            return None
+        return await self._gc_policy.report(payload)
+
+    def handler_stats(self):
+        '''
+        Returns a dict of each registered command's count of calls, their
+        average and maximum duration in µs and count of errors, by command,
+        and the number of requests whose command had no handler.
+        '''
+        return {
+            'unhandled': self._unhandled,
+            'handlers':  { cmd.decode('ascii'): {
+                    'count':  entry.count,
+                    'avg_us': entry.total_us // entry.count if entry.count else 0,
+                    'max_us': entry.max_us,
+                    'errors': entry.errors,
+                } for cmd, entry in self._handlers.items() },
+        }
+
+    def reset_handler_stats(self):
+        self._unhandled = 0
+        for entry in self._handlers.values():
+            entry.count = entry.total_us = entry.max_us = entry.errors = 0
+
+    async def run(self):
+        '''
+        Receive requests forever, dispatching each to the handler registered
+        for its command and replying with its reply, echoing the request's
+        sequence number. Each of an aggregate's records is dispatched in turn
+        and answered by one aggregate, deferred if any of them is. A broadcast
+        is dispatched but never answered.
+
+        The requests are received in batches, every frame already buffered,
+        and the replies to a batch are written together once it's handled,
+        after which any GcPolicy may collect.
+        '''
+        handlers = self._handlers
         while True:
-            if self._uart.any():
-                # read all available bytes at once
-                data = self._uart.read(self._uart.any())
-                self._buffer += data
-                self._last_rx = time.ticks_ms()
-                if self._verbose:
-                    self._log.debug("read {} bytes, buffer size now {}".format(len(data), len(self._buffer)))
+            for packet in await self.receive_packets():
+                deferred = False
+                if not self._deferred:
+                    pass
+                elif isinstance(packet, Aggregate):
+                    for payload in packet.payloads:
+                        entry = handlers.get(payload.cmd)
+                        if entry is not None and entry.deferred:
+                            deferred = True
+                            break
+                else:
+                    entry = handlers.get(packet.cmd)
+                    deferred = entry is not None and entry.deferred
+                if deferred:
+                    asyncio.create_task(self._answer(packet, True))
+                else:
+                    await self._answer(packet, False)
+            self.flush()
+            if self._gc_policy is not None:
+                self._gc_policy.idle()
+
+    async def _answer(self, packet, flush):
+        '''
+        Dispatch the Payload or Aggregate and queue its reply, unless broadcast,
+        writing it at once if flush is True. A handler that raises an exception
+        is logged and its request left unanswered, for the master to time out.
+        '''
+        try:
+            if isinstance(packet, Aggregate):
+                # a loop, as MicroPython doesn't await within a comprehension
+                replies = []
+                for payload in packet.payloads:
+                    replies.append(await self._dispatch(payload))
+                reply = Aggregate(replies)
             else:
-                # timeout: clear buffer to avoid garbage growth
-                if self._buffer and time.ticks_diff(time.ticks_ms(), self._last_rx) > self._timeout_ms:
+                reply = await self._dispatch(packet)
+        except Exception as e:
+            self._log.error("error handling {}: {}".format(packet, e))
+            return
+        if packet.addr != schema.BROADCAST_ADDRESS:
+            self.queue_packet(reply, seq=packet.seq)
+            if flush:
+                self.flush()
+                if self._gc_policy is not None:
+                    self._gc_policy.idle()
+
+    async def _dispatch(self, payload):
+        '''
+        Returns the reply of the handler registered for the Payload's command,
+        timing it, or the acknowledgement if none is.
+        '''
+        entry = self._handlers.get(payload.cmd)
+        if entry is None:
+            self._unhandled += 1
+            return self._ack
+        start = time.ticks_us()
+        try:
+            reply = await entry.handler(payload)
+        except Exception:
+            entry.errors += 1
+            raise
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        entry.count += 1
+        entry.total_us += elapsed
+        if elapsed > entry.max_us:
+            entry.max_us = elapsed
+        return self._ack if reply is None else reply
+
+    def _enable_rx_irq(self):
+        '''
+        Enable the UART's RX idle interrupt, which fires once bytes have landed
+        and the line has gone quiet, i.e., once per burst rather than per byte,
+        setting a ThreadSafeFlag to wake the receiving task. This is done on
+        the first receive, as the subclasses open their own UART. A UART
+        without the interrupt is polled instead.
+        '''
+        self._rx_irq = False # enabled, or not, once
+        trigger = getattr(self._uart, 'IRQ_RXIDLE', None)
+        if trigger is None or not hasattr(self._uart, 'irq'):
+            self._log.warning('UART has no RX idle interrupt: polling.')
+            return
+        self._rx_flag = asyncio.ThreadSafeFlag()
+        self._uart.irq(handler=self._on_rx, trigger=trigger, hard=True)
+        self._log.info('receiving on the UART RX idle interrupt.')
+
+    def _on_rx(self, uart):
+        # a hard interrupt handler: this mustn't allocate
+        self._rx_flag.set()
+
+    async def receive_packet(self):
+        '''
+        Returns the next frame received (for this slave, if it has an address)
+        as a Payload, or an Aggregate. Between reads this either yields to the
+        scheduler, polling the UART, or sleeps until the RX interrupt.
+        '''
+        if self._rx_irq:
+            self._enable_rx_irq()
+        while True:
+            self._loops += 1
+            # more is read only once the frames already buffered are consumed
+            _payload = self._next_frame()
+            if _payload is None:
+                available = self._uart.any()
+                if available:
+                    self._read(available)
+                    _payload = self._next_frame()
+                elif self._rx_end and time.ticks_diff(time.ticks_ms(), self._last_rx) > self._timeout_ms:
+                    # timeout: drop the partial frame, which won't now be completed
                     self._log.error("UART RX timeout; clearing buffer…")
-                    self._buffer = bytearray()
+                    self._rx_timeouts += 1
+                    self._rx_start = self._rx_end = self._rx_checked = 0
+            if _payload is not None:
+                if self._verbose:
+#                   self._log.info('valid payload received: ' + Fore.GREEN + '{}'.format(_payload))
+                    self._log.info('rx: ' + Fore.GREEN + '{}'.format(_payload))
+                self._led.on()
+                return _payload
+            if self._rx_flag is None:
                 await asyncio.sleep(0) # was 0.005
-                continue
-            # check if buffer starts with SYNC_HEADER (avoid .find if possible)
-            if self._buffer.startswith(Payload.SYNC_HEADER):
-                if len(self._buffer) >= Payload.PACKET_SIZE:
-                    packet = self._buffer[:Payload.PACKET_SIZE]
-                    self._buffer = self._buffer[Payload.PACKET_SIZE:]
-                    try:
-                        _payload = Payload.from_bytes(packet)
-                        if self._verbose:
-#                           self._log.info('valid payload received: ' + Fore.GREEN + '{}'.format(_payload))
-                            self._log.info('rx: ' + Fore.GREEN + '{}'.format(_payload))
-                        self._led.on()
-                        return _payload
-                    except Exception:
-                        # corrupt packet: remove SYNC_HEADER and resync
-                        self._log.error("packet decode error: {}. resyncing…".format(e))
-                        self._buffer = self._buffer[1:]
-                        continue
-                else:
-                    # not enough data yet for a full packet
-                    await asyncio.sleep(0)
-                    continue
+            elif self._rx_end:
+                # a partial frame: wake by the RX timeout to drop it, should no more arrive
+                remaining = self._timeout_ms + 1 - time.ticks_diff(time.ticks_ms(), self._last_rx)
+                try:
+                    await asyncio.wait_for_ms(self._rx_flag.wait(), max(1, remaining))
+                except asyncio.TimeoutError:
+                    pass
             else:
-                # slow-path: search for SYNC_HEADER
-                idx = self._buffer.find(Payload.SYNC_HEADER)
+                await self._rx_flag.wait()
+
+    async def receive_packets(self):
+        '''
+        Returns a list of the frames received, waiting for the first as
+        receive_packet() does, then decoding every complete frame already
+        buffered, or arrived in the meantime, up to MAX_BATCH, so that a
+        burst is handled in one pass rather than a scheduler round trip per
+        frame. The list is reused by the next call.
+        '''
+        batch = self._batch
+        batch.clear()
+        batch.append(await self.receive_packet())
+        if not self._rx_end and not self._uart.any():
+            # a lone request, the usual case: nothing more to decode
+            return batch
+        read = False # what's arrived since is read at most once
+        while len(batch) < self.MAX_BATCH:
+            _payload = self._next_frame()
+            if _payload is None:
+                available = 0 if read else self._uart.any()
+                if not available:
+                    break
+                self._read(available)
+                read = True
+                continue
+            if self._verbose:
+                self._log.info('rx: ' + Fore.GREEN + '{}'.format(_payload))
+            batch.append(_payload)
+        return batch
+
+    def _read(self, available):
+        '''
+        Read up to the available bytes from the UART straight into the RX
+        buffer, following the partial frame (if any) not yet consumed, which
+        is first moved to the front. As the buffer then holds at most one
+        partial frame, there are only so many offsets read into.
+        '''
+        buf = self._rx_buffer
+        start = self._rx_start
+        if start:
+            # move the partial frame to the front, byte by byte as a slice would be a copy
+            count = self._rx_end - start
+            for i in range(count):
+                buf[i] = buf[start + i]
+            self._rx_start = 0
+            self._rx_end = count
+            self._rx_checked = max(0, self._rx_checked - start)
+        end = self._rx_end
+        # a view from each offset is made once, as slicing a memoryview allocates a new one
+        view = self._rx_views.get(end)
+        if view is None:
+            view = self._rx_views[end] = self._rx_view[end:]
+        count = self._uart.readinto(view, available) # at most len(view)
+        if count:
+            self._rx_end = end + count
+            if self._rx_end > self._rx_high_water:
+                self._rx_high_water = self._rx_end
+            self._last_rx = time.ticks_ms()
+            if self._verbose:
+                self._log.debug("read {} bytes, buffer size now {}".format(count, self._rx_end))
+
+    def _next_frame(self):
+        '''
+        Returns the next complete frame in the RX buffer, decoded in place, or
+        None if there isn't one yet. The frame, and anything before it, is
+        consumed.
+        '''
+        buf = self._rx_buffer
+        header = Payload.SYNC_HEADER
+        _payload = None
+        while self._rx_start < self._rx_end:
+            start = self._rx_start
+            end = self._rx_end
+            if buf[start] != header[0] or (end - start > 1 and buf[start + 1] != header[1]):
+                # slow-path: search for SYNC_HEADER, discarding the bytes before it
+                idx = buf.find(header, start + 1, end)
                 if idx == -1:
-                    # keep only enough bytes to possibly contain the next header
-                    if len(self._buffer) > len(Payload.SYNC_HEADER):
-                        self._buffer = self._buffer[-(len(Payload.SYNC_HEADER) - 1):]
-                    await asyncio.sleep(0)
-                    continue
-                else:
-                    # discard bytes up to found SYNC_HEADER
-                    self._buffer = self._buffer[idx:]
-                    await asyncio.sleep(0)
+                    # keep only a last byte that may start the next header
+                    self._rx_start = end - 1 if buf[end - 1] == header[0] else end
+                    break
+                self._rx_start = idx
+                continue
+            try:
+                # the frame's length is known once its type byte (and any delta bitmap) has arrived
+                packet_size = Payload.frame_length(buf, start, end)
+                if packet_size is None or end - start < packet_size:
+                    if packet_size is None or end == self._rx_checked:
+                        break # not enough data yet for a full packet
+                    later = self._later_frame(start, end)
+                    if later == -1:
+                        break # not enough data yet for a full packet
+                    # a stray header, whose length would hold up the frame that follows
+                    self._log.error("stray sync header. resyncing…")
+                    self._resyncs += 1
+                    self._rx_start = later
+                    self._rx_checked = 0
                     continue
+                self._rx_start = start + packet_size
+                if self._address is not None:
+                    addr = Payload.frame_address(buf, start, packet_size)
+                    if addr != self._address and addr != schema.BROADCAST_ADDRESS:
+                        # for another slave, a reply, or unaddressed: skip it undecoded
+                        continue
+                _payload = Payload.unpack_from(buf, start, self._rx_delta)
+                self._frames += 1
+                break
+            except Exception as e:
+                # corrupt packet or unknown type: skip the first SYNC_HEADER byte and resync
+                self._log.error("packet decode error: {}. resyncing…".format(e))
+                self._resyncs += 1
+                if isinstance(e, CRCError):
+                    self._crc_failures += 1
+                self._rx_start = start + 1
+        if self._rx_start == self._rx_end:
+            self._rx_start = self._rx_end = self._rx_checked = 0
+        return _payload
+
+    def _later_frame(self, start, end):
+        '''
+        Returns the index of a complete, valid frame within the partial frame
+        at start, or -1 if there's none yet. A stray sync header, e.g., in
+        noise, may give a length far longer than the frame that follows it.
+        '''
+        self._rx_checked = end
+        buf = self._rx_buffer
+        header = Payload.SYNC_HEADER
+        later = buf.find(header, start + 1, end)
+        while later != -1:
+            try:
+                length = Payload.frame_length(buf, later, end)
+            except ValueError:
+                length = 0 # an unknown type: not a header
+            if length is None or end - later < length:
+                break # this one may yet be completed
+            if length and Payload.frame_valid(buf, later, length):
+                return later
+            later = buf.find(header, later + 1, end)
+        return -1
+
+    async def send_packet(self, payload: Payload, seq=None):
+        '''
+        Send the Payload, or an Aggregate in reply to an Aggregate, along with
+        any replies already queued. If provided, the sequence number of the
+        request being answered is echoed so the master can match the reply to
+        its request. A slave with an address replies from it.
+        '''
+        self.queue_packet(payload, seq)
+        self.flush()
 
-    async def send_packet(self, payload: Payload):
+    def queue_packet(self, payload: Payload, seq=None):
+        '''
+        Pack the Payload or Aggregate into the preallocated TX buffer following
+        the replies already queued, to be written by flush(), so a reply may
+        be reused from one transaction to the next. Should the buffer lack
+        room for the largest frame, the queued replies are first written.
+        '''
         try:
-            packet = payload.to_bytes()
-            if not packet.startswith(Payload.SYNC_HEADER):
-                packet = Payload.SYNC_HEADER + packet[len(Payload.SYNC_HEADER):]
-            self._uart.write(packet)
+            if self._tx_end > self._tx_limit:
+                self.flush()
+            if seq is not None:
+                payload.seq = seq
+            if self._address is not None:
+                payload.addr = self._address | schema.REPLY_FLAG
+            self._tx_end += payload.pack_into(self._tx_view, self._tx_end)
+            self._replies += 1
             if self._verbose:
                 self._log.info(Style.DIM + "tx: " + Fore.GREEN + 'AK')
 #               self._log.info(Style.DIM + "tx: " + Fore.GREEN + '{}'.format(payload))
+        except Exception as e:
+            self._log.error("failed to queue packet: {}".format(e))
+
+    def flush(self):
+        '''
+        Write the queued replies, if any, in a single write.
+        '''
+        count = self._tx_end
+        if not count:
+            return
+        self._tx_end = 0
+        try:
+            view = self._tx_views.get(count)
+            if view is None:
+                view = self._tx_views[count] = self._tx_view[:count]
+            self._uart.write(view)
             self._led.off()
         except Exception as e:
             self._log.error("failed to send packet: {}".format(e))